@@ -0,0 +1,69 @@
+"""add daily and monthly metric rollup tables
+
+Revision ID: 080696cd9c8f
+Revises: cb71f8a6193e
+Create Date: 2026-10-17 13:42:10.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '080696cd9c8f'
+down_revision: Union[str, None] = 'cb71f8a6193e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rollup_columns(period_column: str) -> list:
+    return [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('metric_id', sa.Integer(), sa.ForeignKey('metric_definitions.id'), nullable=False),
+        sa.Column(period_column, sa.Date(), nullable=False),
+        sa.Column('department_id', sa.Integer(), sa.ForeignKey('departments.id'), nullable=True),
+        sa.Column('metric_type', postgresql.ENUM(name='metric_type_enum', create_type=False), nullable=False),
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('value_count', sa.Integer(), nullable=False),
+        sa.Column('value_sum', sa.Float(), nullable=True),
+        sa.Column('value_min', sa.Float(), nullable=True),
+        sa.Column('value_max', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'metric_id', period_column),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('metric_daily_rollups', *_rollup_columns('day'))
+    op.create_index('ix_metric_daily_rollups_department_day', 'metric_daily_rollups', ['department_id', 'day'])
+    op.create_table('metric_monthly_rollups', *_rollup_columns('month'))
+    op.create_index('ix_metric_monthly_rollups_department_month', 'metric_monthly_rollups', ['department_id', 'month'])
+
+    # Initial fill; later writes keep the tables current (app/crud/rollup.py)
+    op.execute("""
+        INSERT INTO metric_daily_rollups (user_id, metric_id, day, department_id, metric_type,
+                                          record_count, value_count, value_sum, value_min, value_max)
+        SELECT r.user_id, r.metric_id, r.recorded_date, u.department_id, r.metric_type,
+               count(r.id), count(r.value_numeric), sum(r.value_numeric), min(r.value_numeric), max(r.value_numeric)
+        FROM metric_records r JOIN users u ON u.id = r.user_id
+        GROUP BY r.user_id, r.metric_id, r.recorded_date, u.department_id, r.metric_type
+    """)
+    op.execute("""
+        INSERT INTO metric_monthly_rollups (user_id, metric_id, month, department_id, metric_type,
+                                            record_count, value_count, value_sum, value_min, value_max)
+        SELECT user_id, metric_id, date_trunc('month', day)::date, department_id, metric_type,
+               sum(record_count), sum(value_count), sum(value_sum), min(value_min), max(value_max)
+        FROM metric_daily_rollups
+        GROUP BY user_id, metric_id, date_trunc('month', day)::date, department_id, metric_type
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_metric_monthly_rollups_department_month', table_name='metric_monthly_rollups')
+    op.drop_table('metric_monthly_rollups')
+    op.drop_index('ix_metric_daily_rollups_department_day', table_name='metric_daily_rollups')
+    op.drop_table('metric_daily_rollups')
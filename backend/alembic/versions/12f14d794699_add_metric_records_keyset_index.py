@@ -0,0 +1,29 @@
+"""add (user_id, recorded_at, id) index for keyset pagination
+
+Revision ID: 12f14d794699
+Revises: 080696cd9c8f
+Create Date: 2026-10-17 15:05:47.120934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '12f14d794699'
+down_revision: Union[str, None] = '080696cd9c8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_metric_records_user_recorded_at_id', 'metric_records',
+                    ['user_id', 'recorded_at', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_metric_records_user_recorded_at_id', table_name='metric_records')
@@ -0,0 +1,78 @@
+"""unique metric record per user, metric and day
+
+Revision ID: 131c79ed59ae
+Revises: 863da97b1217
+Create Date: 2026-10-17 10:03:21.554817
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# revision identifiers, used by Alembic.
+revision: str = '131c79ed59ae'
+down_revision: Union[str, None] = '863da97b1217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Records sharing a (user, metric, UTC day) are merged the way upsert_metric_records
+    # would have merged them: the first record (lowest id) keeps its id and recorded_at,
+    # and each value takes the latest non-null one. The other records are then removed.
+    bind = op.get_bind()
+    bind.execute(sa.text("""
+        CREATE TEMPORARY TABLE metric_record_merges AS
+        SELECT min(id) AS keep_id,
+               user_id, metric_id, (recorded_at AT TIME ZONE 'UTC')::date AS day,
+               count(*) AS record_count,
+               (array_agg(value_numeric ORDER BY id DESC) FILTER (WHERE value_numeric IS NOT NULL))[1] AS value_numeric,
+               (array_agg(value_text ORDER BY id DESC) FILTER (WHERE value_text IS NOT NULL))[1] AS value_text,
+               (array_agg(value_json ORDER BY id DESC) FILTER (WHERE value_json IS NOT NULL))[1] AS value_json,
+               (array_agg(notes ORDER BY id DESC) FILTER (WHERE notes IS NOT NULL))[1] AS notes
+        FROM metric_records
+        GROUP BY user_id, metric_id, (recorded_at AT TIME ZONE 'UTC')::date
+        HAVING count(*) > 1
+    """))
+    merges = bind.execute(sa.text(
+        "SELECT user_id, metric_id, day, record_count FROM metric_record_merges ORDER BY user_id, metric_id, day"
+    )).all()
+    if merges:
+        logger.warning(
+            "Merging %d duplicate metric records into %d (user_id, metric_id, day) keys: %s",
+            sum(row.record_count - 1 for row in merges), len(merges),
+            ", ".join(f"({row.user_id}, {row.metric_id}, {row.day})" for row in merges),
+        )
+        bind.execute(sa.text("""
+            UPDATE metric_records r
+            SET value_numeric = m.value_numeric, value_text = m.value_text,
+                value_json = m.value_json, notes = m.notes
+            FROM metric_record_merges m
+            WHERE r.id = m.keep_id
+        """))
+        bind.execute(sa.text("""
+            DELETE FROM metric_records r
+            USING metric_record_merges m
+            WHERE r.user_id = m.user_id
+              AND r.metric_id = m.metric_id
+              AND (r.recorded_at AT TIME ZONE 'UTC')::date = m.day
+              AND r.id <> m.keep_id
+        """))
+    bind.execute(sa.text("DROP TABLE metric_record_merges"))
+    op.create_index(
+        'uq_metric_records_user_metric_day',
+        'metric_records',
+        ['user_id', 'metric_id', sa.text("CAST(timezone('UTC', recorded_at) AS DATE)")],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_metric_records_user_metric_day', table_name='metric_records')
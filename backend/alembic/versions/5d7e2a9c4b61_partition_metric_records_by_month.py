@@ -0,0 +1,132 @@
+"""partition metric_records by month of recorded_date
+
+Revision ID: 5d7e2a9c4b61
+Revises: c088247ae05c
+Create Date: 2026-10-17 18:40:12.774310
+
+Rebuilds metric_records as a table range-partitioned by recorded_date with one
+partition per month (from the oldest record to three months ahead) and a default
+partition, and copies every row over in this transaction. Postgres cannot partition on
+a generated column, so recorded_date becomes a plain column that the application
+fills in, guarded by a check constraint; the primary key becomes (id, recorded_date).
+Run it in a maintenance window: metric_records is locked while rows are copied.
+Afterwards maintain_partitions.py keeps the partitions coming.
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7e2a9c4b61'
+down_revision: Union[str, None] = 'c088247ae05c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, user_id, metric_id, metric_type, value_numeric, value_json, value_text, recorded_at, recorded_date, notes"
+
+INDEXES = [
+    ('uq_metric_records_user_metric_day', ['user_id', 'metric_id', 'recorded_date'], True),
+    ('ix_metric_records_user_date', ['user_id', 'recorded_date'], False),
+    ('ix_metric_records_metric_date', ['metric_id', 'recorded_date'], False),
+    ('ix_metric_records_user_recorded_at_id', ['user_id', 'recorded_at', 'id'], False),
+    ('ix_metric_records_user_metric_latest',
+     ['user_id', 'metric_id', sa.text('recorded_at DESC NULLS LAST'), sa.text('id DESC')], False),
+    ('ix_metric_records_id', ['id'], False),
+]
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _move_aside(table: str):
+    # Free the names of the table's indexes and sequence-owning column for the new table
+    op.execute(f"ALTER TABLE metric_records RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT metric_records_pkey TO {table}_pkey")
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER SEQUENCE metric_records_id_seq OWNED BY NONE")
+
+
+def _create_indexes():
+    for name, columns, unique in INDEXES:
+        op.create_index(name, 'metric_records', columns, unique=unique)
+    op.execute("ALTER SEQUENCE metric_records_id_seq OWNED BY metric_records.id")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    undated = connection.scalar(sa.text("SELECT count(*) FROM metric_records WHERE recorded_at IS NULL"))
+    if undated:
+        raise RuntimeError(f"{undated} metric_records rows have no recorded_at; set or delete them first")
+
+    _move_aside('metric_records_unpartitioned')
+    op.execute("""
+        CREATE TABLE metric_records (
+            id integer NOT NULL DEFAULT nextval('metric_records_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id),
+            metric_id integer NOT NULL REFERENCES metric_definitions (id),
+            metric_type metric_type_enum NOT NULL,
+            value_numeric double precision,
+            value_json json,
+            value_text text,
+            recorded_at timestamp with time zone NOT NULL,
+            recorded_date date NOT NULL,
+            notes text,
+            CONSTRAINT metric_records_pkey PRIMARY KEY (id, recorded_date),
+            CONSTRAINT ck_metric_records_recorded_date
+                CHECK (recorded_date = (recorded_at AT TIME ZONE 'UTC')::date)
+        ) PARTITION BY RANGE (recorded_date)
+    """)
+    op.execute("CREATE TABLE metric_records_default PARTITION OF metric_records DEFAULT")
+
+    oldest = connection.scalar(sa.text("SELECT min(recorded_date) FROM metric_records_unpartitioned"))
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    month = min(oldest.replace(day=1), current) if oldest else current
+    last = current
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE metric_records_y{month.year:04d}m{month.month:02d} PARTITION OF metric_records "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+
+    op.execute(f"INSERT INTO metric_records ({COLUMNS}) SELECT {COLUMNS} FROM metric_records_unpartitioned")
+    op.execute("DROP TABLE metric_records_unpartitioned")
+    _create_indexes()
+    op.execute("ANALYZE metric_records")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Rows of detached partitions are not part of metric_records and are not copied back
+    _move_aside('metric_records_partitioned')
+    op.execute("""
+        CREATE TABLE metric_records (
+            id integer NOT NULL DEFAULT nextval('metric_records_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id),
+            metric_id integer NOT NULL REFERENCES metric_definitions (id),
+            metric_type metric_type_enum NOT NULL,
+            value_numeric double precision,
+            value_json json,
+            value_text text,
+            recorded_at timestamp with time zone,
+            recorded_date date GENERATED ALWAYS AS ((recorded_at AT TIME ZONE 'UTC')::date) STORED,
+            notes text,
+            CONSTRAINT metric_records_pkey PRIMARY KEY (id)
+        )
+    """)
+    columns = COLUMNS.replace(", recorded_date", "")
+    op.execute(f"INSERT INTO metric_records ({columns}) SELECT {columns} FROM metric_records_partitioned")
+    op.execute("DROP TABLE metric_records_partitioned")
+    _create_indexes()
@@ -0,0 +1,43 @@
+"""add job_runs
+
+Revision ID: a7c4e2f19b83
+Revises: e3a91f4c7d20
+Create Date: 2026-10-17 23:12:03.418277
+
+Run history of the in-process job scheduler (app/services/scheduler.py).
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2f19b83'
+down_revision: Union[str, None] = 'e3a91f4c7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'job_runs',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('job_name', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_runs_job_started', 'job_runs', ['job_name', 'started_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_runs_job_started', table_name='job_runs')
+    op.drop_table('job_runs')
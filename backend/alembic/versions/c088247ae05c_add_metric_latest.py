@@ -0,0 +1,51 @@
+"""add metric_latest and the latest-record index on metric_records
+
+Revision ID: c088247ae05c
+Revises: c51c1b6b3d13
+Create Date: 2026-10-17 17:02:36.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c088247ae05c'
+down_revision: Union[str, None] = 'c51c1b6b3d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_metric_records_user_metric_latest', 'metric_records',
+                    ['user_id', 'metric_id', sa.text('recorded_at DESC NULLS LAST'), sa.text('id DESC')])
+    op.create_table(
+        'metric_latest',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('metric_id', sa.Integer(), sa.ForeignKey('metric_definitions.id'), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('metric_type', postgresql.ENUM(name='metric_type_enum', create_type=False), nullable=False),
+        sa.Column('value_numeric', sa.Float(), nullable=True),
+        sa.Column('value_text', sa.Text(), nullable=True),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'metric_id'),
+    )
+
+    # Initial fill; later writes keep the table current (app/crud/rollup.py)
+    op.execute("""
+        INSERT INTO metric_latest (user_id, metric_id, record_id, metric_type, value_numeric, value_text, recorded_at)
+        SELECT DISTINCT ON (user_id, metric_id)
+               user_id, metric_id, id, metric_type, value_numeric, value_text, recorded_at
+        FROM metric_records
+        ORDER BY user_id, metric_id, recorded_at DESC NULLS LAST, id DESC
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('metric_latest')
+    op.drop_index('ix_metric_records_user_metric_latest', table_name='metric_records')
@@ -0,0 +1,48 @@
+"""add stored recorded_date and composite indexes to metric_records
+
+Revision ID: cb71f8a6193e
+Revises: 131c79ed59ae
+Create Date: 2026-10-17 11:20:05.902163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cb71f8a6193e'
+down_revision: Union[str, None] = '131c79ed59ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Adding a stored generated column rewrites the table once
+    op.add_column('metric_records', sa.Column(
+        'recorded_date', sa.Date(),
+        sa.Computed("(recorded_at AT TIME ZONE 'UTC')::date", persisted=True),
+        nullable=True,
+    ))
+    # Same uniqueness as before, now on the stored column
+    op.drop_index('uq_metric_records_user_metric_day', table_name='metric_records')
+    op.create_index('uq_metric_records_user_metric_day', 'metric_records',
+                    ['user_id', 'metric_id', 'recorded_date'], unique=True)
+    op.create_index('ix_metric_records_user_date', 'metric_records', ['user_id', 'recorded_date'])
+    op.create_index('ix_metric_records_metric_date', 'metric_records', ['metric_id', 'recorded_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_metric_records_metric_date', table_name='metric_records')
+    op.drop_index('ix_metric_records_user_date', table_name='metric_records')
+    op.drop_index('uq_metric_records_user_metric_day', table_name='metric_records')
+    op.create_index(
+        'uq_metric_records_user_metric_day',
+        'metric_records',
+        ['user_id', 'metric_id', sa.text("CAST(timezone('UTC', recorded_at) AS DATE)")],
+        unique=True,
+    )
+    op.drop_column('metric_records', 'recorded_date')
@@ -0,0 +1,48 @@
+"""add metric_record_archives
+
+Revision ID: e3a91f4c7d20
+Revises: 5d7e2a9c4b61
+Create Date: 2026-10-17 21:05:48.120934
+
+Archive of raw metric_records of past months, filled by archive_records.py. Rollups of
+archived months are kept, so trends and dashboards do not change.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91f4c7d20'
+down_revision: Union[str, None] = '5d7e2a9c4b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'metric_record_archives',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_metric_record_archives_user_month', 'metric_record_archives', ['user_id', 'month'])
+    op.create_index('ix_metric_record_archives_month', 'metric_record_archives', ['month'])
+    # The payload is zlib-compressed already
+    op.execute("ALTER TABLE metric_record_archives ALTER COLUMN payload SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived records are dropped with the table; restore them first if they are needed
+    op.drop_index('ix_metric_record_archives_month', table_name='metric_record_archives')
+    op.drop_index('ix_metric_record_archives_user_month', table_name='metric_record_archives')
+    op.drop_table('metric_record_archives')
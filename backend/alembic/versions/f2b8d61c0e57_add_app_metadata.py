@@ -0,0 +1,37 @@
+"""add app_metadata
+
+Revision ID: f2b8d61c0e57
+Revises: a7c4e2f19b83
+Create Date: 2026-10-18 00:41:27.905113
+
+Key/value facts about the database; holds the fingerprint of the seed data applied at
+startup (init_db.seed_on_startup). Without a fingerprint the next start seeds once.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d61c0e57'
+down_revision: Union[str, None] = 'a7c4e2f19b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'app_metadata',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('app_metadata')
@@ -1,72 +1,118 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.models.models import User
+from app.models.base import get_async_db, get_db
 from app.config import SECRET_KEY, ALGORITHM
-from passlib.context import CryptContext
 from app.models.models import RoleType
 from app.models.models import User
+from app.auth.user_cache import get_user_snapshot, get_user_snapshot_async, load_cached_user
 
-#Password hashing
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    print("get_current_user loaded..")
-    print("Raw token received:", token)  # Debug print
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+# A valid token for a deactivated account: 400, as get_current_active_user has always
+# answered, so callers can tell it apart from a revoked or expired token (401)
+inactive_exception = HTTPException(status_code=400, detail="Inactive user")
+
+# Decodes the bearer token. FastAPI caches dependency results for the duration of a
+# request, so get_current_user and get_current_user_role share a single decode.
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        username: str = payload.get("sub") 
-        #if user_id is None:
-            #raise HTTPException(
-            #    status_code=status.HTTP_401_UNAUTHORIZED,
-            #    detail="Invalid User Id",
-            #    headers={"WWW-Authenticate": "Bearer"},
-            #)
-        if username is None:
-            print("Username is Invalid!!! ")
-            raise credentials_exception
     except JWTError:
         print("JWT Token Error!!! ")
         raise credentials_exception
+    if payload.get("sub") is None:
+        print("Username is Invalid!!! ")
+        raise credentials_exception
+    # Refresh tokens are only valid at /auth/refresh
+    if payload.get("type") == "refresh":
+        raise credentials_exception
+    return payload
+
+async def get_current_user(payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)) -> User:
+    user_id: int = payload.get("user_id")
+    username: str = payload.get("sub")
 
+    user = None
     if user_id:
-        user = db.query(User).filter(User.id == user_id).first()
-    elif (username):
+        user = load_cached_user(db, user_id)
+    else:
+        # Tokens issued before user_id was added to the payload
         user = db.query(User).filter(User.username == username).first()
     if user is None:
         print("Couldn't even fetch USER!!!! ")
         raise credentials_exception
-    print(f"User: {user.username}, ID: {user.id}, role_id: {user.role_id}, department_id: {user.department_id}")
+    # Tokens issued before the "ver" claim existed match the initial version 0
+    if payload.get("ver", 0) != user.token_version:
+        raise credentials_exception
+    if not user.is_active:
+        raise inactive_exception
 
     return user
 
-async def get_current_user_role(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login"))):
-    try:
-        print("Token received:", token)  # Debug print
-        print(f"SECRET_KEY: {SECRET_KEY}")
-        print(f"ALGORITHM: {ALGORITHM}")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"Decoded payload:, {payload}")  # Debug print
-        role = payload.get("role")
-        if role is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid roletype")
-        return RoleType(role)
-    except JWTError:
-        print ("Invalid Token info - got JWTerror ")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    
+async def get_current_user_role(payload: dict = Depends(get_token_payload)):
+    role = payload.get("role")
+    if role is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid roletype")
+    return RoleType(role)
+
+# Identity and authorization data taken from the access token claims.
+class Principal(BaseModel):
+    user_id: int
+    username: str
+    role: RoleType
+    department_id: Optional[int] = None
+    role_id: Optional[int] = None
+
+def _principal(payload: dict, snapshot: Optional[dict]) -> Principal:
+    if snapshot is None or payload.get("ver", 0) != snapshot["token_version"]:
+        raise credentials_exception
+    if not snapshot["is_active"]:
+        raise inactive_exception
+    role = payload.get("role")
+    if role is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid roletype")
+    return Principal(
+        user_id=payload["user_id"],
+        username=payload["sub"],
+        role=RoleType(role),
+        department_id=payload.get("department_id", snapshot["department_id"]),
+        role_id=payload.get("role_id", snapshot["role_id"]),
+    )
+
+# Lightweight alternative to get_current_user for routes that only need the caller's
+# id, role and department. Those come from the token; the only lookup is the token
+# version and is_active check, served from the user cache with no query on a hit.
+# Declared sync so a cache miss runs in the threadpool instead of the event loop.
+def get_current_principal(payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)) -> Principal:
+    user_id = payload.get("user_id")
+    if user_id is None:
+        raise credentials_exception
+    return _principal(payload, get_user_snapshot(db, user_id))
+
+# The same for async routes: a cache miss goes through the route's own AsyncSession
+# (FastAPI hands both the same get_async_db session), so the request never also
+# holds a connection of the sync pool.
+async def get_async_principal(payload: dict = Depends(get_token_payload),
+                              db: AsyncSession = Depends(get_async_db)) -> Principal:
+    user_id = payload.get("user_id")
+    if user_id is None:
+        raise credentials_exception
+    return _principal(payload, await get_user_snapshot_async(db, user_id))
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
+        raise inactive_exception
     return current_user
 
 # Role-based authorization functions
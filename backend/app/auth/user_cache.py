@@ -0,0 +1,118 @@
+import logging
+import threading
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.config import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS
+from app.database import ChannelListener
+from app.models.models import User
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Resolved user principals keyed by user_id.
+# We cache a plain dict of the users row (not the ORM object) because ORM instances
+# are bound to the session of the request that loaded them.
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Every worker has its own user_cache. Code that changes a user (token version,
+# activation, role, deletion) calls publish_user_change() before committing: the
+# entry is dropped in this worker on commit, and the other workers hear about it
+# through Postgres NOTIFY (see UserChangeListener). While a started listener is
+# disconnected the cache is bypassed, since revocations could be missed.
+USER_CHANGES_CHANNEL = "user_changes"
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+# Bumped by every invalidation. A snapshot loaded while an invalidation arrived may
+# predate the change, so it is returned but not cached.
+_invalidations = 0
+_invalidations_lock = threading.Lock()
+
+
+def _snapshot(user: User) -> dict:
+    return {key: getattr(user, key) for key in _USER_COLUMNS}
+
+
+def get_user_snapshot(db: Session, user_id: int):
+    """Return the cached column values of a user, loading them on a miss."""
+    use_cache = user_change_listener.reliable()
+    snapshot = user_cache.get(user_id) if use_cache else None
+    if snapshot is None:
+        generation = _invalidations
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        snapshot = _snapshot(user)
+        if use_cache and generation == _invalidations:
+            user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+async def get_user_snapshot_async(db: AsyncSession, user_id: int):
+    """get_user_snapshot for async routes; a miss is loaded through their AsyncSession."""
+    use_cache = user_change_listener.reliable()
+    snapshot = user_cache.get(user_id) if use_cache else None
+    if snapshot is None:
+        generation = _invalidations
+        user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+        if user is None:
+            return None
+        snapshot = _snapshot(user)
+        if use_cache and generation == _invalidations:
+            user_cache.set(user_id, snapshot)
+    return snapshot
+
+
+def load_cached_user(db: Session, user_id: int):
+    """Return a User attached to `db`, built from the cache when possible.
+
+    On a hit the instance is merged with load=False, so no SELECT is issued;
+    relationships such as `department` still lazy-load on first access.
+    """
+    snapshot = get_user_snapshot(db, user_id)
+    if snapshot is None:
+        return None
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def invalidate_user(user_id: int = None):
+    """Drop a user (every user if None) from this worker's cache."""
+    global _invalidations
+    with _invalidations_lock:
+        _invalidations += 1
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.invalidate(user_id)
+
+
+def publish_user_change(db: Session, user_id: int):
+    """Drop the user from every worker's cache once db's transaction commits.
+
+    NOTIFY is transactional, so other workers only hear about the change on commit.
+    """
+    db.execute(select(func.pg_notify(USER_CHANGES_CHANNEL, str(user_id))))
+    event.listen(db, "after_commit", lambda session: invalidate_user(user_id), once=True)
+
+
+# Keeps one dedicated asyncpg connection LISTENing on USER_CHANGES_CHANNEL and drops
+# the users changed by the other workers. The cache is cleared on every (re)connect,
+# as changes made while disconnected were not heard.
+class UserChangeListener(ChannelListener):
+    name = "User change listener"
+    channel = USER_CHANGES_CHANNEL
+
+    def on_notify(self, payload: str):
+        try:
+            invalidate_user(int(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed %s message: %r", USER_CHANGES_CHANNEL, payload)
+
+    def on_reset(self):
+        invalidate_user()
+
+
+user_change_listener = UserChangeListener()
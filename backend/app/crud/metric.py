@@ -0,0 +1,164 @@
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import and_, extract, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.models import (MetricDailyRollup, MetricDefinition, MetricLatest, MetricMonthlyRollup, MetricRecord,
+                               RoleType, User, utc_day)
+from app.utils.time_window import TimeWindow
+
+VALUE_FIELDS = ("value_numeric", "value_text", "value_json")
+
+
+def monthly_metric_averages(db: Session, user_id: int, year: int) -> list:
+    """Average PERFORMANCE and WELLNESS values of one user for each month of a year.
+
+    Read from metric_monthly_rollups (one grouped query on its primary key), which
+    also covers months whose raw records were archived. Months without values
+    average to 0.
+    """
+    month = extract("month", MetricMonthlyRollup.month)
+
+    def average(metric_type):
+        selected = MetricMonthlyRollup.metric_type == metric_type
+        return func.sum(MetricMonthlyRollup.value_sum).filter(selected) / \
+            func.nullif(func.sum(MetricMonthlyRollup.value_count).filter(selected), 0)
+
+    rows = db.query(
+        month.label("month"),
+        average("PERFORMANCE").label("avg_performance"),
+        average("WELLNESS").label("avg_wellness"),
+    ).filter(
+        MetricMonthlyRollup.user_id == user_id,
+        *TimeWindow.year(year).predicates(MetricMonthlyRollup.month),
+    ).group_by(month).all()
+
+    by_month = {int(row.month): row for row in rows}
+    monthly = []
+    for number in range(1, 13):
+        row = by_month.get(number)
+        monthly.append({
+            "month": number,
+            "avg_performance": round(row.avg_performance or 0, 2) if row else 0,
+            "avg_wellness": round(row.avg_wellness or 0, 2) if row else 0,
+        })
+    return monthly
+
+
+def department_latest_values_query(department_id: int, as_of: date):
+    """Latest record of every (employee, metric) pair in a department, up to as_of.
+
+    Pairs whose latest value overall is dated on or before as_of (all of them when
+    as_of is today, unless a record was dated ahead) are read from metric_latest.
+    Only the other pairs go to metric_records, and only from the last month before
+    as_of's month that has values (per the monthly rollups) onwards, so the partitions
+    of older months are pruned. There DISTINCT ON keeps the first row of each pair in
+    the order of the ix_metric_records_user_metric_latest index, as
+    latest_records_select does.
+    """
+    end = as_of + timedelta(days=1)
+    employees = and_(User.department_id == department_id, User.role == RoleType.EMPLOYEE)
+    current = select(
+        MetricLatest.user_id,
+        MetricLatest.metric_id,
+        MetricDefinition.metric_name,
+        MetricLatest.metric_type,
+        MetricDefinition.unit,
+        MetricLatest.value_numeric,
+        MetricLatest.value_text,
+        MetricLatest.recorded_at,
+    ).join(User, User.id == MetricLatest.user_id)\
+     .join(MetricDefinition, MetricLatest.metric_id == MetricDefinition.id)\
+     .where(employees, MetricLatest.recorded_at < datetime.combine(end, time.min, tzinfo=timezone.utc))
+
+    # The latest value up to as_of of the remaining pairs is in as_of's month or, failing
+    # that, in the last earlier month with values
+    month = as_of.replace(day=1)
+    since = select(
+        MetricMonthlyRollup.user_id,
+        MetricMonthlyRollup.metric_id,
+        func.coalesce(func.max(MetricMonthlyRollup.month).filter(MetricMonthlyRollup.month < month), month).label("day"),
+    ).join(User, User.id == MetricMonthlyRollup.user_id)\
+     .join(MetricLatest, and_(MetricLatest.user_id == MetricMonthlyRollup.user_id,
+                              MetricLatest.metric_id == MetricMonthlyRollup.metric_id))\
+     .where(employees, MetricMonthlyRollup.month <= month,
+            MetricLatest.recorded_at >= datetime.combine(end, time.min, tzinfo=timezone.utc))\
+     .group_by(MetricMonthlyRollup.user_id, MetricMonthlyRollup.metric_id).cte("since")
+    earlier = select(
+        MetricRecord.user_id,
+        MetricRecord.metric_id,
+        MetricDefinition.metric_name,
+        MetricRecord.metric_type,
+        MetricDefinition.unit,
+        MetricRecord.value_numeric,
+        MetricRecord.value_text,
+        MetricRecord.recorded_at,
+    ).distinct(MetricRecord.user_id, MetricRecord.metric_id)\
+     .join(since, and_(MetricRecord.user_id == since.c.user_id, MetricRecord.metric_id == since.c.metric_id,
+                       MetricRecord.recorded_date >= since.c.day))\
+     .join(MetricDefinition, MetricRecord.metric_id == MetricDefinition.id)\
+     .where(
+        # The same bound for the whole query, which Postgres can prune partitions with
+        MetricRecord.recorded_date >= select(func.min(since.c.day)).scalar_subquery(),
+        *TimeWindow(end=end).predicates(),
+    ).order_by(MetricRecord.user_id, MetricRecord.metric_id,
+               MetricRecord.recorded_at.desc().nulls_last(), MetricRecord.id.desc()).subquery()
+    return union_all(current, select(earlier))
+
+
+def department_recent_averages_query(department_id: int, as_of: date, days=(7, 30)):
+    """Per (user, metric) averages over the last N days up to as_of, for each N in days.
+
+    Read from the daily rollups of the department (one index range scan of the
+    longest window); columns are labelled avg_<N>d and are null without values.
+    """
+    rollup = MetricDailyRollup
+    averages = []
+    for length in days:
+        recent = rollup.day > as_of - timedelta(days=length)
+        averages.append((
+            func.sum(rollup.value_sum).filter(recent)
+            / func.nullif(func.sum(rollup.value_count).filter(recent), 0)
+        ).label(f"avg_{length}d"))
+    window = TimeWindow(as_of - timedelta(days=max(days) - 1), as_of + timedelta(days=1))
+    return select(rollup.user_id, rollup.metric_id, *averages)\
+        .where(rollup.department_id == department_id, *window.predicates(rollup.day))\
+        .group_by(rollup.user_id, rollup.metric_id)
+
+
+def merge_metric_items(items, key=lambda item: item.metric_id) -> dict:
+    """Collapse submitted items to one set of values per key (metric_id by default).
+
+    A single INSERT ... ON CONFLICT cannot touch the same row twice, so repeated
+    keys are merged the way the old per-item loop applied them: in order,
+    with later non-null values overwriting earlier ones.
+    """
+    merged = {}
+    for item in items:
+        values = merged.setdefault(key(item), dict.fromkeys(VALUE_FIELDS))
+        for field in VALUE_FIELDS:
+            value = getattr(item, field)
+            if value is not None:
+                values[field] = value
+    return merged
+
+
+def upsert_metric_records(db: Session, rows: list):
+    """Insert or update one record per (user_id, metric_id, day) in a single statement.
+
+    Each row needs user_id, metric_id, metric_type, recorded_at and the value fields.
+    On conflict only non-null values overwrite the stored ones, and the original
+    recorded_at is kept. The caller owns the transaction.
+    """
+    if not rows:
+        return
+    # recorded_date is the partition key and part of the conflict target
+    statement = insert(MetricRecord).values([{**row, "recorded_date": utc_day(row["recorded_at"])} for row in rows])
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[MetricRecord.user_id, MetricRecord.metric_id, MetricRecord.recorded_date],
+        set_={
+            field: func.coalesce(getattr(excluded, field), getattr(MetricRecord, field))
+            for field in VALUE_FIELDS
+        },
+    )
+    db.execute(statement)
@@ -0,0 +1,200 @@
+from datetime import datetime, time, timezone
+from sqlalchemy import Date, cast, delete, distinct, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.models import MetricDailyRollup, MetricLatest, MetricMonthlyRollup, MetricRecord, MetricRecordArchive, User
+from app.services.dashboard_cache import publish_dashboard_changes
+from app.utils.time_window import first_of_next_month
+
+# First key of the two-key pg_advisory_xact_lock(int, int) taken per user while its
+# rollups are recomputed; the second key is the user id.
+ROLLUP_LOCK_CLASS = 7301
+
+ROLLUP_COLUMNS = ("department_id", "user_id", "metric_id", "metric_type",
+                  "record_count", "value_count", "value_sum", "value_min", "value_max")
+
+
+def lock_users(db: Session, user_ids):
+    # Taken by every writer of a user's records or rollups (including the archival job).
+    # Sorted so two transactions touching the same users cannot deadlock. The lock is
+    # held until commit, so the next writer recomputes from a snapshot that already
+    # contains this transaction's rows instead of overwriting them.
+    for user_id in sorted(user_ids):
+        db.execute(text("SELECT pg_advisory_xact_lock(:lock_class, :user_id)"),
+                   {"lock_class": ROLLUP_LOCK_CLASS, "user_id": user_id})
+
+
+def _upsert_from_select(db: Session, model, period_column: str, statement, returning=()):
+    columns = list(ROLLUP_COLUMNS) + [period_column]
+    insert_statement = insert(model).from_select(columns, statement)
+    excluded = insert_statement.excluded
+    upsert = insert_statement.on_conflict_do_update(
+        index_elements=[model.user_id, model.metric_id, getattr(model, period_column)],
+        set_={column: getattr(excluded, column) for column in columns},
+    )
+    if returning:
+        return db.execute(upsert.returning(*returning)).all()
+    db.execute(upsert)
+
+
+def _daily_rollup_select():
+    value = MetricRecord.value_numeric
+    return select(
+        User.department_id,
+        MetricRecord.user_id,
+        MetricRecord.metric_id,
+        MetricRecord.metric_type,
+        func.count(MetricRecord.id),
+        func.count(value),
+        func.sum(value),
+        func.min(value),
+        func.max(value),
+        MetricRecord.recorded_date,
+    ).join(User, User.id == MetricRecord.user_id).group_by(
+        User.department_id, MetricRecord.user_id, MetricRecord.metric_id,
+        MetricRecord.metric_type, MetricRecord.recorded_date,
+    )
+
+
+def _monthly_rollup_select():
+    month = cast(func.date_trunc("month", MetricDailyRollup.day), Date)
+    return select(
+        MetricDailyRollup.department_id,
+        MetricDailyRollup.user_id,
+        MetricDailyRollup.metric_id,
+        MetricDailyRollup.metric_type,
+        func.sum(MetricDailyRollup.record_count),
+        func.sum(MetricDailyRollup.value_count),
+        func.sum(MetricDailyRollup.value_sum),
+        func.min(MetricDailyRollup.value_min),
+        func.max(MetricDailyRollup.value_max),
+        month,
+    ).group_by(
+        MetricDailyRollup.department_id, MetricDailyRollup.user_id, MetricDailyRollup.metric_id,
+        MetricDailyRollup.metric_type, month,
+    )
+
+
+def latest_records_select():
+    """Latest record of every (user, metric) pair: one row per pair via DISTINCT ON.
+
+    Ordered recorded_at DESC NULLS LAST, id DESC, matching the
+    ix_metric_records_user_metric_latest index, so records sharing a timestamp resolve
+    to the most recently written one and records without a timestamp never win over
+    dated ones.
+    """
+    return select(
+        MetricRecord.user_id,
+        MetricRecord.metric_id,
+        MetricRecord.id,
+        MetricRecord.metric_type,
+        MetricRecord.value_numeric,
+        MetricRecord.value_text,
+        MetricRecord.recorded_at,
+    ).distinct(MetricRecord.user_id, MetricRecord.metric_id).order_by(
+        MetricRecord.user_id, MetricRecord.metric_id,
+        MetricRecord.recorded_at.desc().nulls_last(), MetricRecord.id.desc(),
+    )
+
+
+def _upsert_latest(db: Session, statement):
+    columns = ["user_id", "metric_id", "record_id", "metric_type", "value_numeric", "value_text", "recorded_at"]
+    insert_statement = insert(MetricLatest).from_select(columns, statement)
+    excluded = insert_statement.excluded
+    db.execute(insert_statement.on_conflict_do_update(
+        index_elements=[MetricLatest.user_id, MetricLatest.metric_id],
+        set_={column: getattr(excluded, column) for column in columns[2:]},
+    ))
+
+
+def refresh_rollups(db: Session, keys):
+    """Recompute the rollups and latest values touched by a write to metric_records.
+
+    keys are (user_id, metric_id, day) tuples of the records just inserted or updated.
+    Call it after the write and before commit so rollups and records commit together.
+    Records are never deleted by the write paths, so an upsert per key is enough.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    lock_users(db, {user_id for user_id, _, _ in keys})
+
+    touched = _upsert_from_select(db, MetricDailyRollup, "day", _daily_rollup_select().where(
+        tuple_(MetricRecord.user_id, MetricRecord.metric_id, MetricRecord.recorded_date).in_(keys)
+    ), returning=(MetricDailyRollup.department_id, MetricDailyRollup.day))
+
+    # Months are rebuilt from their (at most 31) daily rows rather than adjusted in
+    # place, since a changed value can move the month's min/max either way.
+    days = [day for _, _, day in keys]
+    pairs = {(user_id, metric_id) for user_id, metric_id, _ in keys}
+    _upsert_from_select(db, MetricMonthlyRollup, "month", _monthly_rollup_select().where(
+        tuple_(MetricDailyRollup.user_id, MetricDailyRollup.metric_id).in_(pairs),
+        MetricDailyRollup.day >= min(days).replace(day=1),
+        MetricDailyRollup.day < first_of_next_month(max(days)),
+    ))
+
+    # Recomputed rather than overwritten, since a backdated submission is not the
+    # latest value of its metric
+    _upsert_latest(db, latest_records_select().where(
+        tuple_(MetricRecord.user_id, MetricRecord.metric_id).in_(pairs)
+    ))
+
+    # Cached dashboards of those departments and days are dropped on commit
+    changes = {}
+    for department_id, day in touched:
+        changes.setdefault(department_id, set()).add(day)
+    publish_dashboard_changes(db, changes)
+
+
+def archived_before(db: Session):
+    """First day whose records are all still in metric_records, or None before any archival.
+
+    Records of earlier months were moved to metric_record_archives (app/services/archive.py)
+    and only their rollups remain, so those rollups must not be rebuilt and no record
+    may be written into those months.
+    """
+    month = db.scalar(select(func.max(MetricRecordArchive.month)))
+    return first_of_next_month(month) if month else None
+
+
+def rebuild_user_rollups(db: Session, user_ids: list):
+    """Rebuild every rollup and latest-value row of the given users from metric_records (backfill).
+
+    Rollups of archived months, and latest values whose record was archived, are kept
+    as they are. The caller owns the transaction; see backfill_rollups.py for the
+    parallel driver.
+    """
+    if not user_ids:
+        return
+    lock_users(db, user_ids)
+    boundary = archived_before(db)
+    daily = [MetricDailyRollup.user_id.in_(user_ids)]
+    monthly = [MetricMonthlyRollup.user_id.in_(user_ids)]
+    records = [MetricRecord.user_id.in_(user_ids)]
+    latest = [MetricLatest.user_id.in_(user_ids)]
+    if boundary:
+        daily.append(MetricDailyRollup.day >= boundary)
+        monthly.append(MetricMonthlyRollup.month >= boundary)
+        records.append(MetricRecord.recorded_date >= boundary)
+        latest.append(MetricLatest.recorded_at >= datetime.combine(boundary, time.min, tzinfo=timezone.utc))
+    db.execute(delete(MetricMonthlyRollup).where(*monthly))
+    db.execute(delete(MetricDailyRollup).where(*daily))
+    db.execute(delete(MetricLatest).where(*latest))
+    _upsert_from_select(db, MetricDailyRollup, "day", _daily_rollup_select().where(*records))
+    _upsert_from_select(db, MetricMonthlyRollup, "month", _monthly_rollup_select().where(*daily))
+    _upsert_latest(db, latest_records_select().where(*records))
+    publish_dashboard_changes(db, None)
+
+
+def move_user_rollups(db: Session, user_id: int, department_id: int):
+    """Re-attribute a user's rollups after the user changed department.
+
+    Dashboards aggregate rollups by department_id, the same way the raw-record
+    query joined on the user's current department.
+    """
+    previous = set(db.scalars(select(distinct(MetricDailyRollup.department_id)).where(
+        MetricDailyRollup.user_id == user_id
+    )))
+    for model in (MetricDailyRollup, MetricMonthlyRollup):
+        db.execute(update(model).where(model.user_id == user_id).values(department_id=department_id))
+    publish_dashboard_changes(db, {dept: None for dept in previous | {department_id}})
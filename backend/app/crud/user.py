@@ -0,0 +1,15 @@
+from app.models.models import User
+
+# Columns whose change must revoke the tokens already issued to a user.
+# Tokens embed department_id, role_id and the role, and a password change or
+# deactivation should log the user out everywhere.
+TOKEN_SENSITIVE_FIELDS = ("hashed_password", "role", "role_id", "department_id", "department_role", "is_active")
+
+
+def token_sensitive_state(user: User) -> tuple:
+    return tuple(getattr(user, field) for field in TOKEN_SENSITIVE_FIELDS)
+
+
+def bump_token_version(user: User):
+    """Invalidate every access and refresh token issued to `user` so far."""
+    user.token_version = (user.token_version or 0) + 1
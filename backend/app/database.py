@@ -1,9 +1,241 @@
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
 from sqlalchemy import create_engine
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from app.config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+from app.config import DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW
+from app.config import DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+
+# Checkout counters of a kind of pool (a pool is replaced on engine.dispose(), so the
+# numbers live here rather than on the pool instance).
+class PoolCheckoutStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_checkout_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+checkout_stats = PoolCheckoutStats()
+async_checkout_stats = PoolCheckoutStats()
+# A context variable rather than a thread local: async checkouts of concurrent
+# requests interleave on the event loop thread, each in a greenlet of its own
+_in_checkout = ContextVar("in_checkout", default=False)
+
+
+# Queue pools that measure how long a caller waits for a connection. The wait includes
+# opening a new connection when the pool grows, which is what a request experiences.
+class _InstrumentedCheckout:
+    stats = None  # the PoolCheckoutStats of the subclass
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; only time the outermost call
+        if _in_checkout.get():
+            return super()._do_get()
+        token = _in_checkout.set(True)
+        start = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        finally:
+            _in_checkout.reset(token)
+        self.stats.record(time.perf_counter() - start)
+        return entry
+
+
+class InstrumentedQueuePool(_InstrumentedCheckout, QueuePool):
+    stats = checkout_stats
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedCheckout, AsyncAdaptedQueuePool):
+    stats = async_checkout_stats
+
+
+# The single place engines are built. Every module shares `engine` below; tools that
+# need a differently tuned engine (e.g. long-running maintenance jobs) pass overrides.
+def create_db_engine(url: str = DATABASE_URL, **overrides):
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    statement_timeout_ms = overrides.pop("statement_timeout_ms", DB_STATEMENT_TIMEOUT_MS)
+    if statement_timeout_ms and make_url(url).get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    options.update(overrides)
+    return create_engine(url, **options)
+
 
 # Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine()
 
 # Create a session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# Async counterpart of create_db_engine (SQLAlchemy asyncio + asyncpg), used by
+# `async def` routes so their queries do not block the event loop. Defaults to the
+# same database as DATABASE_URL with the asyncpg driver. Its pool is sized on its own
+# (DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW); async routes authorize through
+# get_async_principal, so a request holds a connection of one pool only.
+def create_async_db_engine(url: str = None, **overrides):
+    url = url or ASYNC_DATABASE_URL or make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": DB_ASYNC_POOL_SIZE,
+        "max_overflow": DB_ASYNC_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    statement_timeout_ms = overrides.pop("statement_timeout_ms", DB_STATEMENT_TIMEOUT_MS)
+    if statement_timeout_ms:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout_ms)}}
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+async_engine = create_async_db_engine()
+
+# expire_on_commit=False: attributes cannot lazy-load after a commit in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def _pool_snapshot(pool, max_overflow: int, stats: PoolCheckoutStats) -> dict:
+    capacity = pool.size() + max(max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": max_overflow,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+        **stats.snapshot(),
+    }
+
+
+def pool_stats() -> dict:
+    """The sync pool's numbers, the async pool's under "async", and the worker's connection cap."""
+    sync = _pool_snapshot(engine.pool, DB_MAX_OVERFLOW, checkout_stats)
+    async_ = _pool_snapshot(async_engine.sync_engine.pool, DB_ASYNC_MAX_OVERFLOW, async_checkout_stats)
+    return {
+        **sync,
+        "async": async_,
+        "max_connections": sync["pool_size"] + max(DB_MAX_OVERFLOW, 0)
+                           + async_["pool_size"] + max(DB_ASYNC_MAX_OVERFLOW, 0),
+    }
+
+
+def asyncpg_dsn() -> str:
+    """The database of ASYNC_DATABASE_URL (else DATABASE_URL) as a plain asyncpg DSN."""
+    url = make_url(ASYNC_DATABASE_URL or DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+# A background task holding one dedicated asyncpg connection, outside both pools, for
+# LISTEN or session-level advisory locks. The connection is reopened retry_seconds
+# after it fails or is lost. Subclasses implement on_connect(); `connected` is set
+# once it returns and cleared as soon as the connection is gone.
+class DedicatedConnection:
+    name = "Dedicated connection"
+
+    def __init__(self, retry_seconds: float = 5.0):
+        self.retry_seconds = retry_seconds
+        self.connected = asyncio.Event()
+        self._task = None
+
+    def reliable(self) -> bool:
+        """Whether nothing can have been missed: not started (single process) or connected."""
+        return self._task is None or self.connected.is_set()
+
+    async def on_connect(self, connection):
+        raise NotImplementedError
+
+    async def _run(self):
+        import asyncpg
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(asyncpg_dsn())
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await self.on_connect(connection)
+                self.connected.set()
+                await lost.wait()
+                logger.warning("%s lost; reconnecting", self.name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning("%s failed: %s", self.name, error)
+            finally:
+                self.connected.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# LISTENs on one channel. Whatever was sent while disconnected is never heard, so
+# on_reset() runs on every (re)connect, before `connected` is set.
+class ChannelListener(DedicatedConnection):
+    channel = None
+
+    def on_notify(self, payload: str):
+        raise NotImplementedError
+
+    def on_reset(self):
+        pass
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.on_notify(payload)
+
+    async def on_connect(self, connection):
+        await connection.add_listener(self.channel, self._on_notify)
+        self.on_reset()
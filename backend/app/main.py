@@ -1,23 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import uvicorn
 from app.routes import users, metrics, metric_records,departments, auth, dashboards
 from app.models.base import Base
-#from database import engine
-from init_db import *
+from app.database import engine, SessionLocal
+from init_db import seed_on_startup
 from app.models.models import Department
-from app.config import DATABASE_URL
-from sqlalchemy import create_engine
-from app.models.base import SessionLocal
 from app.auth.deps import get_current_user
 from app.routes import profile
+from app.routes import admin
+from app.services.dashboard_cache import dashboard_change_listener
+from app.auth.user_cache import user_change_listener
+from app.services.metric_catalog import metric_catalog
+from app.services.partitions import missing_partitions
+from app.services.jobs import register_default_jobs
+from app.services.scheduler import scheduler
+from app.config import SCHEDULER_ENABLED
 
-import sys
-print(sys.path)
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Nothing touches the database at import; tables are created (when missing) by the
+# startup seeding below, or by init_db.py and the alembic migrations
 app = FastAPI(
     title="Employee Wellness & Performance Tracker",
     description="API for tracking employee wellness indicators and performance metrics",
@@ -42,30 +49,52 @@ app.include_router(departments.router)
 app.include_router(metric_records.router)
 app.include_router(dashboards.router)
 app.include_router(profile.router)
+app.include_router(admin.router)
 
-@app.on_event("startup")
-async def startup_event():
-    """Run tasks on application startup."""
+def prepare_database():
+    """Synchronous part of the startup: seeding, the partition check and the metric catalog."""
     db = SessionLocal()
     try:
-        # Construct the absolute path to metric_definitions.json
-        reset_metric_id_sequence(db)
         json_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "metric_definitions.json")
-        # Seed metric definitions
-        seed_departments(db)
-        seed_roles(db) 
-        seed_admin_user(db)
-        seed_supervisor_user(db)
-        seed_employee_user(db)
-        seed_metric_definitions(db, json_file_path)
-        seed_metric_definition_roles(db)
+        # Creates missing tables and seeds only when the seed inputs changed since the
+        # last seeding; otherwise this is two cheap queries (see STARTUP_SEED_MODE)
+        seed_on_startup(db, json_file_path)
+        # Partition DDL is left to the maintain_partitions job and maintain_partitions.py,
+        # so workers starting together do not queue on metric_records' locks; only report
+        # months that would land in the default partition
+        missing = missing_partitions(db)
+        if missing:
+            logger.warning("metric_records has no partition for %s; run maintain_partitions.py "
+                           "or let the scheduler's maintain_partitions job create them",
+                           ", ".join(month.strftime("%Y-%m") for month in missing))
+        db.commit()
+        # Load the metric catalog now rather than on the first request
+        metric_catalog.invalidate()
+        metric_catalog.get(db)
     finally:
         db.close()
+
+@app.on_event("startup")
+async def startup_event():
+    """Run tasks on application startup."""
+    prepare_database()
+    # Hear about dashboard invalidations from the other workers
+    dashboard_change_listener.start()
+    # ...and about users whose tokens or account changed
+    user_change_listener.start()
+    # Periodic maintenance; only the worker elected leader runs the jobs
+    if SCHEDULER_ENABLED:
+        register_default_jobs(scheduler)
+        scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scheduler.stop()
+    await dashboard_change_listener.stop()
+    await user_change_listener.stop()
         
 @app.get("/")
 async def root():
     return {"message": "Welcome to Employee Wellness & Performance Tracker"}
-for route in app.routes:
-    print(route.path, route.name)
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,16 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, DateTime
+from sqlalchemy import Column, Integer, DateTime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import func
-from app.config import DATABASE_URL
-
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.database import engine, SessionLocal, AsyncSessionLocal
 
 # Create declarative base
 Base = declarative_base()
-print("Base loaded")
 # Base model with common fields
 class BaseModel(Base):
     __abstract__ = True
@@ -25,4 +19,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async database dependency for `async def` routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
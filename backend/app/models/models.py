@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Date, Text, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Date, Text, DateTime, BigInteger, LargeBinary
+from sqlalchemy import DDL, CheckConstraint, Index, PrimaryKeyConstraint, event, func
+from datetime import timezone
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import Enum as SQLEnum  # Correct enum for SQLAlchemy
 import enum  # Python enum
@@ -94,6 +96,10 @@ class User(Base):
     department_id = Column(Integer, ForeignKey("departments.id"))
     
     is_active = Column(Boolean, default=True)
+
+    # Bumped whenever a change must revoke the user's issued tokens (password,
+    # department, role or activation). Tokens carry it in the "ver" claim.
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     #Add this foreign key to link to EmployeeRole
     role_id = Column(Integer, ForeignKey("employee_roles.role_id"))
@@ -142,10 +148,23 @@ class MetricDefinition(Base):
     records = relationship("MetricRecord", back_populates="metric_definition")
     employee_roles = relationship("MetricDefinitionRole", back_populates="metric_definition")  # Add this relationship
 
+def utc_day(recorded_at):
+    """metric_records.recorded_date of a recorded_at value (naive values are taken as UTC)."""
+    if recorded_at is None:
+        return None
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    return recorded_at.astimezone(timezone.utc).date()
+
+
+def _recorded_date_default(context):
+    return utc_day(context.get_current_parameters().get("recorded_at"))
+
+
 class MetricRecord(Base):
     __tablename__ = "metric_records"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     metric_id = Column(Integer, ForeignKey("metric_definitions.id"), nullable=False)
     
@@ -155,13 +174,133 @@ class MetricRecord(Base):
     value_text = Column(Text, nullable=True)
     #value_json = Column(Text, nullable=True)  # for complex structures (optional)
 
-    recorded_at = Column(DateTime(timezone=True))
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    # UTC calendar day of recorded_at. Date filters compare this column against half-open
+    # ranges so they can use the indexes below, and it is the key of the monthly range
+    # partitions (app/services/partitions.py), so those filters also prune partitions.
+    # Postgres cannot partition on a generated column: it is filled in on insert (ORM
+    # inserts default it, bulk inserts pass utc_day(recorded_at)) and the check
+    # constraint keeps it equal to the day of recorded_at.
+    recorded_date = Column(Date, primary_key=True, default=_recorded_date_default)
     notes = Column(Text)
 
     # Relationships
     user = relationship("User", back_populates="metric_records")
     metric_definition = relationship("MetricDefinition", back_populates="records")
+
+    __table_args__ = (
+        CheckConstraint("recorded_date = (recorded_at AT TIME ZONE 'UTC')::date",
+                        name="ck_metric_records_recorded_date"),
+        # One record per user, metric and day. This is the conflict target of the
+        # INSERT ... ON CONFLICT upserts in app/crud/metric.py.
+        Index("uq_metric_records_user_metric_day", user_id, metric_id, recorded_date, unique=True),
+        Index("ix_metric_records_user_date", user_id, recorded_date),
+        Index("ix_metric_records_metric_date", metric_id, recorded_date),
+        # Keyset pagination of a user's history: ORDER BY recorded_at DESC, id DESC
+        Index("ix_metric_records_user_recorded_at_id", user_id, recorded_at, id),
+        # Latest record per (user, metric): DISTINCT ON / ORDER BY recorded_at DESC NULLS
+        # LAST, id DESC reads the first index entry of each pair
+        Index("ix_metric_records_user_metric_latest", user_id, metric_id,
+              recorded_at.desc().nulls_last(), id.desc()),
+        {"postgresql_partition_by": "RANGE (recorded_date)"},
+    )
+
+
+# A table created by create_all starts with only the default partition; monthly
+# partitions are added by maintain_partitions.py and the scheduler's maintain_partitions job
+event.listen(MetricRecord.__table__, "after_create", DDL(
+    "CREATE TABLE IF NOT EXISTS metric_records_default PARTITION OF metric_records DEFAULT"
+))
     
+# Pre-aggregated numeric values per (department, user, metric, day) and per month.
+# Kept in step with metric_records by app/crud/rollup.py in the same transaction as
+# every write; rebuild from scratch with backfill_rollups.py. avg = value_sum / value_count,
+# record_count also counts records that only carry text/json values.
+class MetricDailyRollup(Base):
+    __tablename__ = "metric_daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    metric_id = Column(Integer, ForeignKey("metric_definitions.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id"))
+    metric_type = Column(SQLEnum(MetricTypeEnum, name="metric_type_enum"), nullable=False)
+    record_count = Column(Integer, nullable=False, default=0)
+    value_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float)
+    value_min = Column(Float)
+    value_max = Column(Float)
+
+    __table_args__ = (
+        PrimaryKeyConstraint(user_id, metric_id, day),
+        Index("ix_metric_daily_rollups_department_day", department_id, day),
+    )
+
+
+class MetricMonthlyRollup(Base):
+    __tablename__ = "metric_monthly_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    metric_id = Column(Integer, ForeignKey("metric_definitions.id"), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    department_id = Column(Integer, ForeignKey("departments.id"))
+    metric_type = Column(SQLEnum(MetricTypeEnum, name="metric_type_enum"), nullable=False)
+    record_count = Column(Integer, nullable=False, default=0)
+    value_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float)
+    value_min = Column(Float)
+    value_max = Column(Float)
+
+    __table_args__ = (
+        PrimaryKeyConstraint(user_id, metric_id, month),
+        Index("ix_metric_monthly_rollups_department_month", department_id, month),
+    )
+
+
+# The latest record of every (user, metric) pair, copied from metric_records by
+# app/crud/rollup.py in the same transaction as every write, so "latest value" reads
+# are a primary key lookup. Latest means greatest recorded_at, then greatest id.
+class MetricLatest(Base):
+    __tablename__ = "metric_latest"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    metric_id = Column(Integer, ForeignKey("metric_definitions.id"), nullable=False)
+    record_id = Column(Integer, nullable=False)
+    metric_type = Column(SQLEnum(MetricTypeEnum, name="metric_type_enum"), nullable=False)
+    value_numeric = Column(Float)
+    value_text = Column(Text)
+    recorded_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        PrimaryKeyConstraint(user_id, metric_id),
+    )
+
+
+# Raw records of past months moved out of metric_records by app/services/archive.py:
+# one row per user, month and archival batch, holding the records as a zlib-compressed
+# JSON array. The rollups of those months are kept, so monthly trends stay queryable.
+class MetricRecordArchive(Base):
+    __tablename__ = "metric_record_archives"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    record_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_metric_record_archives_user_month", user_id, month),
+        # max(month) is the archived_before() boundary checked by every backdated write
+        Index("ix_metric_record_archives_month", month),
+    )
+
+
+# The payload is compressed already; EXTERNAL stores it out of line without having
+# Postgres try to compress it again
+event.listen(MetricRecordArchive.__table__, "after_create", DDL(
+    "ALTER TABLE metric_record_archives ALTER COLUMN payload SET STORAGE EXTERNAL"
+))
+
 """
 CREATE TABLE employee_roles (
     role_id SERIAL PRIMARY KEY,
@@ -203,4 +342,42 @@ class MetricDefinitionRole(Base):
     employee_role = relationship("EmployeeRole", back_populates="metrics")
     # This relationship allows you to access all metrics associated with a specific role.
     # For example, if you have a role "Manager", you can get all metrics that are relevant to that role.
-    # This is useful for filtering metrics based on the user's role.
\ No newline at end of file
+    # This is useful for filtering metrics based on the user's role.
+
+# Change counters for data that the app workers cache in memory. A writer increments
+# the row in the same transaction as its change; each worker compares its cached
+# version with this one to know when to reload. See app/services/metric_catalog.py.
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Facts about the database itself, by key; e.g. the fingerprint of the seed data the
+# last startup applied (init_db.seed_on_startup)
+class AppMetadata(Base):
+    __tablename__ = "app_metadata"
+
+    key = Column(String(100), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# One row per run of a background job (app/services/scheduler.py), written by the
+# worker that ran it, so any worker can report durations and failures of all of them.
+# status: running, succeeded, failed or timed_out.
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    job_name = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True))
+    duration_ms = Column(Float)
+    error = Column(Text)
+    worker = Column(String(100))  # host:pid
+
+    __table_args__ = (
+        Index("ix_job_runs_job_started", job_name, started_at),
+    )
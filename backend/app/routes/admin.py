@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy.orm import Session
+from app.config import PARQUET_EXPORT_DIR
+from app.models.base import get_db
+from app.models.models import User
+from app.auth.deps import is_admin
+from app.auth.user_cache import user_cache, user_change_listener
+from app.database import pool_stats
+from app.services.dashboard_cache import dashboard_cache
+from app.services.metric_catalog import bump_catalog_version, metric_catalog
+from app.services.parquet_export import export_metric_snapshot
+from app.services.scheduler import job_run_summary, list_job_runs, scheduler
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+# Operational counters for the in-process caches of this worker.
+# Each uvicorn worker keeps its own caches, so numbers are per process. The auth
+# cache is bypassed while "listening" is false (see app/auth/user_cache.py).
+@router.get("/auth-cache")
+def get_auth_cache_stats(admin_user: User = Depends(is_admin)):
+    return {**user_cache.stats(), "listening": user_change_listener.reliable()}
+
+# Connection pool usage of this worker: checked-out connections, saturation
+# (checked out / (pool_size + max_overflow)) and how long checkouts waited, for the
+# sync pool and, under "async", the async routes' pool.
+@router.get("/db-pool")
+def get_db_pool_stats(admin_user: User = Depends(is_admin)):
+    return pool_stats()
+
+# Dashboard result cache of this worker: hit ratio, evictions, invalidations and the
+# keys with the most compute time (hits, computes, avg/last compute ms)
+@router.get("/dashboard-cache")
+def get_dashboard_cache_stats(top: int = 20, admin_user: User = Depends(is_admin)):
+    return dashboard_cache.stats(top)
+
+# Version and size of this worker's in-memory metric catalog
+@router.get("/metric-catalog")
+def get_metric_catalog_stats(admin_user: User = Depends(is_admin)):
+    return metric_catalog.stats()
+
+# After editing metric_definitions or metric_definition_roles directly in the database:
+# bumps the catalog version so every worker reloads within METRIC_CATALOG_CHECK_SECONDS.
+@router.post("/metric-catalog/reload")
+def reload_metric_catalog(db: Session = Depends(get_db), admin_user: User = Depends(is_admin)):
+    bump_catalog_version(db)
+    db.commit()
+    metric_catalog.invalidate()
+    metric_catalog.get(db)
+    return metric_catalog.stats()
+
+class ParquetExportRequest(BaseModel):
+    incremental: bool = True
+    since: Optional[str] = Field(default=None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="YYYY-MM")
+
+_parquet_export_lock = threading.Lock()
+
+# Writes the Parquet snapshot under PARQUET_EXPORT_DIR on this server (see
+# export_parquet.py for the CLI) and returns rows, files, bytes and rows/s.
+# Runs in the threadpool; a second request while one is running gets 409.
+@router.post("/exports/parquet")
+def export_parquet_snapshot(
+    request: ParquetExportRequest,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin)
+):
+    if not _parquet_export_lock.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A Parquet export is already running.")
+    try:
+        return export_metric_snapshot(db, PARQUET_EXPORT_DIR, since=request.since, incremental=request.incremental)
+    finally:
+        _parquet_export_lock.release()
+
+# Background jobs: this worker's view of the scheduler (leader or not, triggers, next
+# runs) and, from job_runs, the runs, failures and durations of every job on any worker
+@router.get("/jobs")
+def get_scheduled_jobs(db: Session = Depends(get_db), admin_user: User = Depends(is_admin)):
+    summary = job_run_summary(db)
+    stats = scheduler.stats()
+    for job in stats["jobs"]:
+        job.update(summary.pop(job["name"], {}))
+    stats["other_jobs"] = summary  # jobs no longer registered on this worker
+    return stats
+
+class JobRunResponse(BaseModel):
+    id: int
+    job_name: str
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+    worker: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Most recent runs first; ?failed=true lists failed and timed out runs only
+@router.get("/jobs/runs", response_model=List[JobRunResponse])
+def get_job_runs(
+    job: Optional[str] = None,
+    failed: bool = False,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin)
+):
+    return list_job_runs(db, job=job, failed_only=failed, limit=limit)
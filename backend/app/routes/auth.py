@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.utils.security import create_access_token, verify_password  # Corrected the module path if 'utils' is the correct folder
+from pydantic import BaseModel
+from app.utils.security import build_token_claims, create_access_token, create_refresh_token
 from app.services.auth_service import authenticate_user
 from app.models.base import get_db
+from app.models.models import User
+from app.config import SECRET_KEY, ALGORITHM
 from datetime import datetime, timedelta
-from jose import jwt
+from jose import JWTError, jwt
 
 #router = APIRouter()
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
@@ -18,19 +21,41 @@ router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 # This is a basic implementation and can be extended with features like token expiration,
 # refresh tokens, and more.
 
+# authenticate_user verifies the password once, in the bounded bcrypt pool, so the
+# handler is async and never blocks the event loop on hashing.
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    print("inside login....")
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    # Include the user's role in the token payload
-    # Include the user's role in the token payload
-    token_data = {"sub": user.username, "role": user.role.value, "user_id": user.id}
+    # Include the user's role, department and token version in the token payload
+    token_data = build_token_claims(user)
     print("Token payload:", token_data)  # Debug print
     token = create_access_token(data=token_data)
+    refresh_token = create_refresh_token(data=token_data)
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# Exchanges a refresh token for a new short-lived access token.
+# The user row is re-read here (not from the auth cache) so the new claims reflect the
+# current department/role, and a bumped token_version rejects the refresh token.
+@router.post("/refresh")
+def refresh_access_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    invalid_token = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    try:
+        payload = jwt.decode(request.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid_token
+    if payload.get("type") != "refresh" or payload.get("user_id") is None:
+        raise invalid_token
+
+    user = db.query(User).filter(User.id == payload["user_id"]).first()
+    if not user or not user.is_active or payload.get("ver") != user.token_version:
+        raise invalid_token
+
+    token = create_access_token(data=build_token_claims(user))
     return {"access_token": token, "token_type": "bearer"}
 # backend/app/auth/auth_handler.py
 
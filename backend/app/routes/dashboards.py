@@ -1,66 +1,73 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.models.base import get_db
+from app.models.base import get_async_db
 from app.models.models import MetricTypeEnum, User, RoleType, MetricDefinition, MetricRecord
-from app.models.models import MetricDefinitionRole, EmployeeRole
-from app.auth.deps import get_current_user, get_current_user_role
-from app.models.base import get_db
+from app.models.models import MetricDefinitionRole, EmployeeRole, MetricDailyRollup, MetricMonthlyRollup
+from app.auth.deps import Principal, get_async_principal
+from app.services.dashboard_cache import dashboard_cache, dashboard_key
+from app.utils.time_window import parse_time_window
 from datetime import datetime, date
-from sqlalchemy import func, extract
+import time
+from sqlalchemy import func, extract, select
 
 router = APIRouter(prefix="/api/v1/dashboard", tags=["dashboard"])
 
+# Builds the department aggregate query. Kept separate from the route so the same
+# statement can be executed by a sync Session or an AsyncSession (see
+# benchmarks/dashboard_benchmark.py). Raises ValueError for a malformed date_filter.
+# Totals come from the rollup tables: windows of whole months (month, quarter, year)
+# read metric_monthly_rollups, days, weeks and ranges read metric_daily_rollups.
+def build_aggregated_metrics_query(department_id: int, type: str, date_filter: str):
+    window = parse_time_window(date_filter)
+    if window.month_aligned:
+        rollup, period = MetricMonthlyRollup, MetricMonthlyRollup.month
+    else:
+        rollup, period = MetricDailyRollup, MetricDailyRollup.day
+
+    query = select(
+        MetricDefinition.metric_type,
+        MetricDefinition.metric_name,
+        func.sum(rollup.value_sum).label("total")
+    ).join(MetricDefinition, rollup.metric_id == MetricDefinition.id)\
+     .where(rollup.department_id == department_id, *window.predicates(period))
+
+    # Filter by metric type
+    if type:
+        query = query.where(MetricDefinition.metric_type == type)
+
+    return query.group_by(MetricDefinition.metric_type, MetricDefinition.metric_name)
+
 @router.get("/view-aggregate-metrics")
 async def get_aggregated_metrics(
-    type: str = Query(default=None, regex="^(PERFORMANCE|WELLNESS)?$"),
-    date_filter: str = Query(default=None, description="Use YYYY-MM-DD or YYYY-MM or YYYY"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)
+    type: str = Query(default=None, pattern="^(PERFORMANCE|WELLNESS)?$"),
+    date_filter: str = Query(default=None, description="Use YYYY-MM-DD, YYYY-Www, YYYY-MM, YYYY-Qn, YYYY or YYYY-MM-DD..YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)
 ):
-    if role != RoleType.SUPERVISOR:
+    if principal.role != RoleType.SUPERVISOR:
         raise HTTPException(status_code=403, detail="Only supervisors can view dashboards.")
 
     if not date_filter:
         raise HTTPException(status_code=400, detail="You must provide a date, month, or year.")
 
-    query = db.query(
-        MetricDefinition.metric_type,
-        MetricDefinition.metric_name,
-        func.sum(MetricRecord.value_numeric).label("total")
-    ).join(MetricDefinition, MetricRecord.metric_id == MetricDefinition.id)\
-     .join(User, User.id == MetricRecord.user_id)\
-     .filter(User.department_id == current_user.department_id)
-
-    # Filter by metric type
-    if type:
-        query = query.filter(MetricDefinition.metric_type == type)
-
-    # Apply time filtering
     try:
-        if len(date_filter) == 10:  # YYYY-MM-DD
-            dt = datetime.strptime(date_filter, "%Y-%m-%d").date()
-            query = query.filter(func.DATE(MetricRecord.recorded_at) == dt)
-        elif len(date_filter) == 7:  # YYYY-MM
-            dt = datetime.strptime(date_filter, "%Y-%m")
-            query = query.filter(
-                extract("year", MetricRecord.recorded_at) == dt.year,
-                extract("month", MetricRecord.recorded_at) == dt.month
-            )
-        elif len(date_filter) == 4:  # YYYY
-            dt = int(date_filter)
-            query = query.filter(extract("year", MetricRecord.recorded_at) == dt)
-        else:
-            raise ValueError("Invalid date format")
+        window = parse_time_window(date_filter)
+        query = build_aggregated_metrics_query(principal.department_id, type, date_filter)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid date_filter: {str(e)}")
 
-    query = query.group_by(MetricDefinition.metric_type, MetricDefinition.metric_name)
+    # Supervisors of a department mostly look at the same days and months; serve
+    # repeats from the result cache until a write touches the department and window
+    key = dashboard_key(principal.department_id, type, window)
+    cached, token = dashboard_cache.get(key)
+    if cached is not None:
+        return cached
 
-    results = query.all()
+    started = time.perf_counter()
+    results = (await db.execute(query)).all()
 
-    return [
+    response = [
         {
             "metric_type": r.metric_type,
             "metric_name": r.metric_name,
@@ -68,3 +75,5 @@ async def get_aggregated_metrics(
         }
         for r in results
     ]
+    dashboard_cache.set(key, response, token, time.perf_counter() - started)
+    return response
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.models.models import Department
 from app.models.base import get_db
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from app.models.models import DepartmentType  # if needed for typing
 from app.auth.deps import is_admin
+from app.utils.etag import CACHE_PUBLIC_REFERENCE, conditional_json, make_etag, table_version
 from enum import Enum
 
 router = APIRouter(prefix="/api/v1/departments", tags=["departments"])
@@ -30,13 +31,8 @@ class DepartmentResponse(BaseModel):
     type: DepartmentType
     description: str = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
     
-@router.get("/view")
-async def get_metrics():
-    return {"message": "Departments endpoint"}
-
 @router.post("/create_department", status_code=status.HTTP_201_CREATED)
 def create_department(
     department: DepartmentCreate,
@@ -59,8 +55,11 @@ def create_department(
 
     return {"message": f"Department '{new_department.name}' created successfully!", "department_id": new_department.id}
 
-# Get all departments
+# Get all departments. The ETag follows the row versions of the departments table, so
+# clients polling the list get a 304 until a department is added or changed.
 @router.get("/view", response_model=List[DepartmentResponse])
-def get_departments(db: Session = Depends(get_db)):
-    departments = db.query(Department).all()
-    return departments
+def get_departments(request: Request, db: Session = Depends(get_db)):
+    etag = make_etag("departments", table_version(db, Department.__tablename__))
+    return conditional_json(request, etag, CACHE_PUBLIC_REFERENCE,
+                            lambda: db.query(Department).order_by(Department.id).all(),
+                            List[DepartmentResponse])
@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, cast, Date, and_
-from datetime import datetime, timezone, date, timedelta 
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, extract, cast, Date, and_, select, tuple_
+from datetime import datetime, timezone, date, timedelta, time
+from typing import List, Optional, Union
 from pydantic import model_validator
 
-from pydantic import BaseModel
-from app.models.base import get_db
+from pydantic import BaseModel, ConfigDict
+from app.models.base import get_db, get_async_db
 from app.models.models import MetricTypeEnum, User, RoleType, MetricDefinition, MetricRecord, Department
 from app.models.models import MetricDefinitionRole, EmployeeRole
 from app.auth.deps import get_current_user, get_current_user_role
+from app.auth.deps import Principal, get_async_principal
+from app.crud.metric import merge_metric_items, monthly_metric_averages, upsert_metric_records
+from app.crud.metric import department_latest_values_query, department_recent_averages_query
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.crud.rollup import archived_before, refresh_rollups
+from app.services.metric_catalog import metric_catalog
+from app.services.export_service import department_export_query, stream_csv, stream_ndjson
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.etag import CACHE_PRIVATE_CATALOG, conditional_json, make_etag
+from app.utils.serialization import fast_json_response
+from app.utils.time_window import TimeWindow
 from collections import defaultdict
 from sqlalchemy import extract, cast
 from fastapi import Query
@@ -58,6 +71,12 @@ class SupervisorMetricItem(BaseModel):
 
 class SupervisorBulkMetricUpdate(BaseModel):
     metrics: list[SupervisorMetricItem]
+
+class SupervisorEmployeeMetricItem(SupervisorMetricItem):
+    employee_id: int
+
+class SupervisorBatchMetricUpdate(BaseModel):
+    entries: list[SupervisorEmployeeMetricItem]
     
 class MetricDefinitionResponse(BaseModel):
     id: int
@@ -65,8 +84,7 @@ class MetricDefinitionResponse(BaseModel):
     metric_type: MetricTypeEnum
     unit: str | None = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 class EmployeeMetricResponse(BaseModel):
     metric_name: str
@@ -75,8 +93,7 @@ class EmployeeMetricResponse(BaseModel):
     value_text: Optional[str]
     recorded_at: date
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 class EmployeeSearchResponse(BaseModel):
     employee_id: str
@@ -86,8 +103,7 @@ class EmployeeSearchResponse(BaseModel):
     performance_metrics: List[EmployeeMetricResponse]
     wellness_metrics: List[EmployeeMetricResponse]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 class EmployeeMetricWithDate(BaseModel):
     metric_id: int
@@ -98,8 +114,7 @@ class EmployeeMetricWithDate(BaseModel):
     recorded_at: date
     unit: Optional[str]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class EmployeeWithMetrics(BaseModel):
     employee_id: str
@@ -107,8 +122,39 @@ class EmployeeWithMetrics(BaseModel):
     last_name: str
     metrics: List[EmployeeMetricWithDate]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# One page of the department history. A page holds a run of records (newest first)
+# grouped by employee, so an employee can appear again on the next page.
+class EmployeeMetricsPage(BaseModel):
+    items: List[EmployeeWithMetrics]
+    next_cursor: Optional[str] = None
+
+# Supervisor team view: every employee's latest value per metric with 7- and 30-day
+# averages, as of one day
+class MetricOverview(BaseModel):
+    metric_id: int
+    metric_name: str
+    metric_type: str
+    unit: Optional[str] = None
+    latest_value: Optional[float] = None
+    latest_text_value: Optional[str] = None
+    latest_recorded_at: date
+    avg_7d: Optional[float] = None
+    avg_30d: Optional[float] = None
+
+class EmployeeOverview(BaseModel):
+    employee_id: str
+    first_name: str
+    last_name: str
+    department_role: str
+    last_submission: Optional[date] = None
+    metrics: List[MetricOverview]
+
+class DepartmentOverviewResponse(BaseModel):
+    department_id: int
+    as_of: date
+    employees: List[EmployeeOverview]
 
 class MetricDetailResponse(BaseModel):
     id: int
@@ -119,16 +165,14 @@ class MetricDetailResponse(BaseModel):
     recorded_at: date
     unit: Optional[str]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MonthlyMetricResponse(BaseModel):
     month: int
     avg_performance: float
     avg_wellness: float
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class EmployeeDetailsResponse(BaseModel):
     employee_id: str
@@ -141,80 +185,57 @@ class EmployeeDetailsResponse(BaseModel):
     wellness_metrics: List[MetricDetailResponse]
     monthly_metrics: List[MonthlyMetricResponse]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 @router.get("/employee/available-metrics", response_model=list[MetricDefinitionResponse])
 def get_available_metrics(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)
 ):
     if role != RoleType.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view metrics.")
+    return get_metrics_by_type(None, request, db, current_user)
 
-    # Fetch metric IDs allowed for this employee's role
-    print("User Role:", current_user.role_id)
-    print("User Department:", current_user.department_id)
-    role_metric_ids = db.query(MetricDefinitionRole.metric_id).filter(
-        MetricDefinitionRole.role_id == current_user.role_id
-    ).all()
-    metric_ids = [m[0] for m in role_metric_ids]
-
-    if not metric_ids:
-        return []
-
-    # Fetch matching metrics from the employee's department
-    metrics = db.query(MetricDefinition).filter(
-        MetricDefinition.id.in_(metric_ids),
-        MetricDefinition.department_id == current_user.department_id
-    ).all()
-
-    return metrics
-
+# Served from the in-memory catalog; no catalog queries per request. The ETag follows
+# the catalog version, so a client that has the list gets a 304 until it changes.
 def get_metrics_by_type(
-    metric_type: str,
+    metric_type: Optional[str],
+    request: Request,
     db: Session,
     current_user: User
-) -> list[MetricDefinition]:
-    # Fetch metric IDs allowed for this employee's role
-    role_metric_ids = db.query(MetricDefinitionRole.metric_id).filter(
-        MetricDefinitionRole.role_id == current_user.role_id
-    ).all()
-    metric_ids = [m[0] for m in role_metric_ids]
-
-    if not metric_ids:
-        return []
-
-    # Fetch matching metrics of specific type and department
-    metrics = db.query(MetricDefinition).filter(
-        MetricDefinition.id.in_(metric_ids),
-        MetricDefinition.department_id == current_user.department_id,
-        MetricDefinition.metric_type == metric_type
-    ).all()
-
-    return metrics
+):
+    catalog = metric_catalog.get(db)
+    etag = make_etag("role-metrics", catalog.version, current_user.department_id, current_user.role_id, metric_type)
+    return conditional_json(
+        request, etag, CACHE_PRIVATE_CATALOG,
+        lambda: catalog.definitions_for(current_user.department_id, current_user.role_id, metric_type),
+        list[MetricDefinitionResponse],
+    )
 
 @router.get("/employee/performance-metrics", response_model=list[MetricDefinitionResponse])
 def get_performance_metrics(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)
 ):
     if role != RoleType.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view metrics.")
-    return get_metrics_by_type("PERFORMANCE", db, current_user)
+    return get_metrics_by_type("PERFORMANCE", request, db, current_user)
 
 
 @router.get("/employee/wellness-metrics", response_model=list[MetricDefinitionResponse])
 def get_wellness_metrics(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)
 ):
     if role != RoleType.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view metrics.")
-    return get_metrics_by_type("WELLNESS", db, current_user)
+    return get_metrics_by_type("WELLNESS", request, db, current_user)
 
 
 @router.post("/employee-submit-metrics")
@@ -227,110 +248,128 @@ def employee_submit_metrics(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can submit metrics.")
 
     submission_date = request.date  # date field from payload
-    
-    employee_department = current_user.department.type.value
-    for metric_item in request.metrics:
-        # Optional: validate access to metric_id
-        metric = db.query(MetricDefinition).filter(
-            MetricDefinition.id == metric_item.metric_id,
-            MetricDefinition.department_id == current_user.department_id
-        ).first()
+    submitted = merge_metric_items(request.metrics)
 
-        if not metric:
-            raise HTTPException(404, detail=f"Metric ID {metric_item.metric_id} not found.")
-
-        # Upsert record for that date
-        record = db.query(MetricRecord).filter(
-            MetricRecord.user_id == current_user.id,
-            MetricRecord.metric_id == metric.id,
-            MetricRecord.recorded_at.cast(Date) == submission_date
-        ).first()
-
-        if not record:
-            record = MetricRecord(
-                user_id=current_user.id,
-                metric_id=metric.id,
-                metric_type=metric.metric_type,
-                recorded_at=submission_date
-            )
-            db.add(record)
+    # Months whose records were archived only live on as rollups
+    archived = archived_before(db)
+    if archived and submission_date < archived:
+        raise HTTPException(status_code=400, detail=f"Metrics before {archived} are archived and can no longer be submitted.")
 
+    # Validate every metric id against the in-memory catalog
+    definitions = metric_catalog.get(db).metric_types(current_user.department_id, submitted)
+    for metric_item in request.metrics:
+        if metric_item.metric_id not in definitions:
+            raise HTTPException(404, detail=f"Metric ID {metric_item.metric_id} not found.")
 
-        # Set values
-        if metric_item.value_numeric is not None:
-            record.value_numeric = metric_item.value_numeric
-        if metric_item.value_text is not None:
-            record.value_text = metric_item.value_text
-        if metric_item.value_json is not None:
-            record.value_json = metric_item.value_json
+    # Upsert every value for that date in a single INSERT ... ON CONFLICT
+    recorded_at = datetime.combine(submission_date, time.min, tzinfo=timezone.utc)
+    upsert_metric_records(db, [
+        {
+            "user_id": current_user.id,
+            "metric_id": metric_id,
+            "metric_type": definitions[metric_id],
+            "recorded_at": recorded_at,
+            **values,
+        }
+        for metric_id, values in submitted.items()
+    ])
+    refresh_rollups(db, [(current_user.id, metric_id, submission_date) for metric_id in submitted])
 
     db.commit()
     return {"message": f"Metrics submitted for {submission_date}"}
 
 
-@router.post("/supervisor-update-metric")
-def supervisor_bulk_update_employee_metric(
-    update_request: SupervisorBulkMetricUpdate,
-    employee_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)):
-    #  Only SUPERVISORS allowed
-    if role != RoleType.SUPERVISOR:
-        raise HTTPException(status_code=403, detail="Only supervisors can update employee metrics.")
-
-    supervisor_department = current_user.department.type.value 
-
+# Applies supervisor-entered values for any number of (employee, metric) entries.
+# Department membership (one query), SUPERVISOR_EDITABLE_METRICS and the metric
+# definitions (in-memory catalog) are checked for all entries up front, then every value
+# is written with a single upsert, so the whole batch succeeds or fails in one transaction.
+def apply_supervisor_metric_updates(db: Session, current_user: User, entries: list):
+    supervisor_department = current_user.department.type.value
     allowed_metrics = SUPERVISOR_EDITABLE_METRICS.get(supervisor_department, [])
 
-    employee = db.query(User).filter(User.id == employee_id).first()
-    if not employee or employee.department_id != current_user.department_id:
-        raise HTTPException(status_code=403, detail="You are not allowed to update metrics of employees outside your department.")
-
-    today = datetime.now(timezone.utc).date()
+    employee_ids = {entry.employee_id for entry in entries}
+    employee_departments = dict(db.query(User.id, User.department_id).filter(
+        User.id.in_(employee_ids)
+    ).all())
+    for employee_id in employee_ids:
+        if employee_departments.get(employee_id) != current_user.department_id:
+            raise HTTPException(status_code=403, detail="You are not allowed to update metrics of employees outside your department.")
 
-    for metric_item in update_request.metrics:
-        if metric_item.metric_id not in allowed_metrics:
+    for entry in entries:
+        if entry.metric_id not in allowed_metrics:
             raise HTTPException(
                 status_code=403,
-                detail=f"You are not allowed to edit metric_id {metric_item.metric_id}"
+                detail=f"You are not allowed to edit metric_id {entry.metric_id}"
             )
 
-        metric_def = db.query(MetricDefinition).filter(
-            MetricDefinition.id == metric_item.metric_id,
-            MetricDefinition.department_id == current_user.department_id
-        ).first()
-        if not metric_def:
+    metric_types = metric_catalog.get(db).metric_types(
+        current_user.department_id, {entry.metric_id for entry in entries}
+    )
+    for entry in entries:
+        if entry.metric_id not in metric_types:
             raise HTTPException(
                 status_code=404,
-                detail=f"Metric ID {metric_item.metric_id} not found or not authorized."
+                detail=f"Metric ID {entry.metric_id} not found or not authorized."
             )
 
-        record = db.query(MetricRecord).filter(
-            MetricRecord.user_id == employee.id,
-            MetricRecord.metric_id == metric_item.metric_id,
-            MetricRecord.recorded_at.cast(Date) == today
-        ).first()
-
-        if not record:
-            record = MetricRecord(
-                user_id=employee.id,
-                metric_id=metric_item.metric_id,
-                metric_type=metric_def.metric_type,
-                recorded_at=datetime.now(timezone.utc)
-            )
-            db.add(record)
+    now = datetime.now(timezone.utc)
+    submitted = merge_metric_items(entries, key=lambda entry: (entry.employee_id, entry.metric_id))
+    upsert_metric_records(db, [
+        {
+            "user_id": employee_id,
+            "metric_id": metric_id,
+            "metric_type": metric_types[metric_id],
+            "recorded_at": now,
+            **values,
+        }
+        for (employee_id, metric_id), values in submitted.items()
+    ])
+    refresh_rollups(db, [(employee_id, metric_id, now.date()) for employee_id, metric_id in submitted])
+    db.commit()
 
-        if metric_item.value_numeric is not None:
-            record.value_numeric = metric_item.value_numeric
-        if metric_item.value_text is not None:
-            record.value_text = metric_item.value_text
-        if metric_item.value_json is not None:
-            record.value_json = metric_item.value_json
 
-    db.commit()
+@router.post("/supervisor-update-metric")
+def supervisor_bulk_update_employee_metric(
+    update_request: SupervisorBulkMetricUpdate,
+    employee_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    role: RoleType = Depends(get_current_user_role)):
+    #  Only SUPERVISORS allowed
+    if role != RoleType.SUPERVISOR:
+        raise HTTPException(status_code=403, detail="Only supervisors can update employee metrics.")
+
+    entries = [
+        SupervisorEmployeeMetricItem(employee_id=employee_id, **metric_item.model_dump())
+        for metric_item in update_request.metrics
+    ]
+    if not entries:
+        # Still reject employees outside the supervisor's department
+        employee = db.query(User).filter(User.id == employee_id).first()
+        if not employee or employee.department_id != current_user.department_id:
+            raise HTTPException(status_code=403, detail="You are not allowed to update metrics of employees outside your department.")
+    else:
+        apply_supervisor_metric_updates(db, current_user, entries)
     return {"message": "Metrics updated successfully by Supervisor."}
 
+# Batch variant of /supervisor-update-metric: values for many employees in one request,
+# e.g. customer-satisfaction scores for a whole route team.
+@router.post("/supervisor-bulk-update-metrics")
+def supervisor_batch_update_employee_metrics(
+    update_request: SupervisorBatchMetricUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    role: RoleType = Depends(get_current_user_role)):
+    if role != RoleType.SUPERVISOR:
+        raise HTTPException(status_code=403, detail="Only supervisors can update employee metrics.")
+
+    if update_request.entries:
+        apply_supervisor_metric_updates(db, current_user, update_request.entries)
+    return {
+        "message": "Metrics updated successfully by Supervisor.",
+        "updated": len({(entry.employee_id, entry.metric_id) for entry in update_request.entries})
+    }
+
 # As a supervisor , view employee metrics by employee ID
 @router.get("/employee/{employee_id}/metrics")
 def view_employee_metrics(
@@ -356,6 +395,7 @@ def view_employee_metrics(
 @router.get("/employee/{employee_id}/details", response_model=EmployeeDetailsResponse)
 def get_employee_details(
     employee_id: str,
+    year: Optional[int] = Query(default=None, ge=1, le=9999, description="Year of the monthly trend, defaults to the current year"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)):
@@ -385,7 +425,9 @@ def get_employee_details(
         MetricRecord.metric_id == MetricDefinition.id
     ).filter(
         MetricRecord.user_id == employee.id,
-        MetricRecord.recorded_at >= thirty_days_ago
+        MetricRecord.recorded_at >= thirty_days_ago,
+        # Redundant with the line above, but on the partition key
+        MetricRecord.recorded_date >= thirty_days_ago.date()
     ).order_by(
         MetricRecord.recorded_at.desc()
     )
@@ -409,34 +451,9 @@ def get_employee_details(
         elif record.metric_type.upper() == "WELLNESS":
             wellness_metrics.append(metric_data)
     
-    # Get metrics by month for trend data
-    current_year = datetime.now().year
-    monthly_metrics = []
-    
-    for month in range(1, 13):
-        # Get average performance and wellness for this month
-        month_performance = db.query(func.avg(MetricRecord.value_numeric)).filter(
-            MetricRecord.user_id == employee.id,
-            MetricRecord.metric_type == "PERFORMANCE",
-            extract('month', MetricRecord.recorded_at) == month,
-            extract('year', MetricRecord.recorded_at) == current_year,
-            MetricRecord.value_numeric != None
-        ).scalar() or 0
-        
-        month_wellness = db.query(func.avg(MetricRecord.value_numeric)).filter(
-            MetricRecord.user_id == employee.id,
-            MetricRecord.metric_type == "WELLNESS",
-            extract('month', MetricRecord.recorded_at) == month,
-            extract('year', MetricRecord.recorded_at) == current_year,
-            MetricRecord.value_numeric != None
-        ).scalar() or 0
-        
-        monthly_metrics.append({
-            "month": month,
-            "avg_performance": round(month_performance, 2),
-            "avg_wellness": round(month_wellness, 2)
-        })
-    
+    # Monthly trend for the requested year (defaults to the current one)
+    monthly_metrics = monthly_metric_averages(db, employee.id, year or datetime.now().year)
+
     return {
         "employee_id": employee.employee_id,
         "first_name": employee.first_name,
@@ -475,56 +492,59 @@ def search_employee_by_id(
     wellness_metrics = []
 
     for record, definition in records:
-        entry = EmployeeMetricResponse(
-            metric_name=definition.metric_name,
-            metric_type=record.metric_type,
-            value_numeric=record.value_numeric,
-            value_text=record.value_text,
-            recorded_at=record.recorded_at.date()
-        )
+        entry = {
+            "metric_name": definition.metric_name,
+            "metric_type": record.metric_type,
+            "value_numeric": record.value_numeric,
+            "value_text": record.value_text,
+            "recorded_at": record.recorded_at.date()
+        }
         if record.metric_type.upper() == "PERFORMANCE":
             performance_metrics.append(entry)
         elif record.metric_type.upper() == "WELLNESS":
             wellness_metrics.append(entry)
 
-    return EmployeeSearchResponse(
-        employee_id=employee.employee_id,
-        full_name=f"{employee.first_name} {employee.last_name}",
-        email=employee.email,
-        department_id=employee.department_id,
-        performance_metrics=performance_metrics,
-        wellness_metrics=wellness_metrics
-    )
+    return fast_json_response({
+        "employee_id": employee.employee_id,
+        "full_name": f"{employee.first_name} {employee.last_name}",
+        "email": employee.email,
+        "department_id": employee.department_id,
+        "performance_metrics": performance_metrics,
+        "wellness_metrics": wellness_metrics
+    }, EmployeeSearchResponse)
     
 # Supervisor can list all the employees of his department - based on date range 
-@router.get("/department/employee-metrics", response_model=List[EmployeeWithMetrics])
-def get_department_employee_metrics(
+@router.get("/department/employee-metrics", response_model=Union[EmployeeMetricsPage, List[EmployeeWithMetrics]])
+async def get_department_employee_metrics(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     month: Optional[int] = Query(None),
     year: Optional[int] = Query(None),
     metric_type: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)):
-    print("Current Role_Type is " ,role)
-    if role != RoleType.SUPERVISOR:
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Records per page"),
+    unpaginated: bool = Query(False, description="Return every matching record, without paging"),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)):
+    # Authorized from the token claims alone; no need to load the supervisor's row
+    if principal.role != RoleType.SUPERVISOR:
         raise HTTPException(status_code=403, detail="Only supervisors can access this data.")
 
     # Get employees in the supervisor’s department
-    employees = db.query(User).filter(
-        User.department_id == current_user.department_id,
+    employees = (await db.execute(select(User).where(
+        User.department_id == principal.department_id,
         User.role == RoleType.EMPLOYEE
-    ).all()
+    ))).scalars().all()
 
     if not employees:
-        return []
+        return [] if unpaginated else {"items": [], "next_cursor": None}
 
     employee_ids = [e.id for e in employees]
     employee_lookup = {e.id: e for e in employees}
 
     # Build query
-    query = db.query(
+    query = select(
+        MetricRecord.id,
         MetricRecord.user_id,
         MetricRecord.metric_id,
         MetricDefinition.metric_name,
@@ -535,51 +555,145 @@ def get_department_employee_metrics(
         MetricDefinition.unit
     ).join(
         MetricDefinition, MetricRecord.metric_id == MetricDefinition.id
-    ).filter(
+    ).where(
         MetricRecord.user_id.in_(employee_ids)
     )
 
     # Apply filters
-    if start_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) >= start_date)
-    if end_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) <= end_date)
-    if month:
-        query = query.filter(extract("month", MetricRecord.recorded_at) == month)
-    if year:
-        query = query.filter(extract("year", MetricRecord.recorded_at) == year)
+    query = query.where(*TimeWindow.from_params(start_date, end_date, month, year).predicates())
     if metric_type:
-        query = query.filter(MetricRecord.metric_type == metric_type.upper())
+        query = query.where(MetricRecord.metric_type == metric_type.upper())
+
+    # Newest first; id breaks ties so the order (and the keyset) is stable
+    query = query.order_by(MetricRecord.recorded_at.desc(), MetricRecord.id.desc())
+    if not unpaginated:
+        if cursor:
+            after = decode_cursor(cursor, datetime, int)
+            query = query.where(tuple_(MetricRecord.recorded_at, MetricRecord.id) < tuple_(*after))
+        # One extra row tells whether another page follows
+        query = query.limit(limit + 1)
 
     # Run query
-    records = query.order_by(MetricRecord.recorded_at.desc()).all()
+    records = (await db.execute(query)).all()
+    next_cursor = None
+    if not unpaginated and len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].recorded_at, records[-1].id)
 
     # Group results by employee
-    from collections import defaultdict
     result = defaultdict(list)
     for r in records:
-        result[r.user_id].append(EmployeeMetricWithDate(
-            metric_id=r.metric_id,
-            metric_name=r.metric_name,
-            metric_type=r.metric_type,
-            value_numeric=r.value_numeric,
-            value_text=r.value_text,
-            recorded_at=r.recorded_at.date(), 
-            unit=r.unit
-        ))
+        result[r.user_id].append({
+            "metric_id": r.metric_id,
+            "metric_name": r.metric_name,
+            "metric_type": r.metric_type,
+            "value_numeric": r.value_numeric,
+            "value_text": r.value_text,
+            "recorded_at": r.recorded_at.date(),
+            "unit": r.unit
+        })
 
     # Build final response
     response = []
     for user_id, metrics in result.items():
         emp = employee_lookup[user_id]
-        response.append(EmployeeWithMetrics(
-            employee_id=emp.employee_id,
-            first_name=emp.first_name,
-            last_name=emp.last_name,
-            metrics=metrics
-        ))
-
-    return response
+        response.append({
+            "employee_id": emp.employee_id,
+            "first_name": emp.first_name,
+            "last_name": emp.last_name,
+            "metrics": metrics
+        })
+
+    # Plain dicts straight from the rows, encoded once by orjson (see fast_json_response)
+    if unpaginated:
+        return fast_json_response(response, List[EmployeeWithMetrics])
+    return fast_json_response({"items": response, "next_cursor": next_cursor}, EmployeeMetricsPage)
+
+# The whole team on one page, replacing one /employee/{id}/details call per employee.
+# Three queries whatever the headcount: the employees, the latest record per
+# (employee, metric) from metric_latest (see department_latest_values_query for an
+# earlier as_of), and the 7/30-day averages from the daily rollups.
+@router.get("/department/overview", response_model=DepartmentOverviewResponse)
+async def get_department_overview(
+    as_of: Optional[date] = Query(None, description="Report as of this day (UTC); defaults to today"),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)):
+    if principal.role != RoleType.SUPERVISOR:
+        raise HTTPException(status_code=403, detail="Only supervisors can access this data.")
+
+    as_of = as_of or datetime.now(timezone.utc).date()
+    employees = (await db.execute(select(
+        User.id, User.employee_id, User.first_name, User.last_name, User.department_role
+    ).where(
+        User.department_id == principal.department_id,
+        User.role == RoleType.EMPLOYEE
+    ).order_by(User.last_name, User.first_name, User.id))).all()
+    latest = (await db.execute(department_latest_values_query(principal.department_id, as_of))).all()
+    averages = {
+        (r.user_id, r.metric_id): r
+        for r in (await db.execute(department_recent_averages_query(principal.department_id, as_of))).all()
+    }
+
+    metrics = defaultdict(list)
+    for r in latest:
+        average = averages.get((r.user_id, r.metric_id))
+        metrics[r.user_id].append({
+            "metric_id": r.metric_id,
+            "metric_name": r.metric_name,
+            "metric_type": r.metric_type,
+            "unit": r.unit,
+            "latest_value": r.value_numeric,
+            "latest_text_value": r.value_text,
+            "latest_recorded_at": r.recorded_at.date(),
+            "avg_7d": average.avg_7d if average else None,
+            "avg_30d": average.avg_30d if average else None,
+        })
+
+    return fast_json_response({
+        "department_id": principal.department_id,
+        "as_of": as_of,
+        "employees": [
+            {
+                "employee_id": e.employee_id,
+                "first_name": e.first_name,
+                "last_name": e.last_name,
+                "department_role": e.department_role,
+                "last_submission": max((m["latest_recorded_at"] for m in metrics[e.id]), default=None),
+                "metrics": metrics[e.id],
+            }
+            for e in employees
+        ],
+    }, DepartmentOverviewResponse)
+
+# Streams the same history as /department/employee-metrics for downloading, e.g. a
+# whole year: one NDJSON object or CSV line per record, grouped by employee and oldest
+# first. Rows are read through a server-side cursor, so memory stays flat with the range.
+@router.get("/department/employee-metrics/export")
+async def export_department_employee_metrics(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    month: Optional[int] = Query(None),
+    year: Optional[int] = Query(None),
+    metric_type: Optional[str] = Query(None),
+    metric_id: Optional[List[int]] = Query(None, description="Repeat to export several metrics"),
+    principal: Principal = Depends(get_async_principal)):
+    if principal.role != RoleType.SUPERVISOR:
+        raise HTTPException(status_code=403, detail="Only supervisors can access this data.")
+
+    statement = department_export_query(
+        principal.department_id,
+        TimeWindow.from_params(start_date, end_date, month, year),
+        metric_type,
+        metric_id,
+    )
+    if format == "csv":
+        body, media_type = stream_csv(statement), "text/csv"
+    else:
+        body, media_type = stream_ndjson(statement), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="department-metrics.{format}"'
+    })
 
 
 
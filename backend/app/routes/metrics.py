@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional, Union
 from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.models.models import User, RoleType, MetricDefinition, MetricRecord
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_db, get_async_db
+from app.models.models import User, RoleType, MetricDefinition, MetricRecord, utc_day
+from app.models.models import MetricDailyRollup, MetricLatest, MetricMonthlyRollup
 from app.auth.deps import get_current_user  # Assumes you're using OAuth2/JWT
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, ConfigDict
 from datetime import datetime
 from enum import Enum
 from app.auth.deps import get_current_user_role
+from app.auth.deps import Principal, get_async_principal
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.services.metric_catalog import metric_catalog
+from app.utils.etag import CACHE_PRIVATE_CATALOG, conditional_json, make_etag
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.serialization import fast_json_response
+from app.utils.time_window import TimeWindow
 from datetime import datetime, timezone
 from sqlalchemy import Date
 from fastapi import Query, Path
 from datetime import date
-from sqlalchemy import func, extract, cast, String, and_, or_
+from sqlalchemy import func, extract, cast, String, and_, or_, select, tuple_
 
 
 router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
@@ -41,8 +50,7 @@ class MetricResponse(BaseModel):
     is_aggregated: bool
     value: Optional[dict]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
         
 
         
@@ -51,16 +59,20 @@ class MetricResponse(BaseModel):
 # Example usage from frontend -  GET /api/v1/metrics?metric_type=wellness&department_id=1
 # Example usage from frontend -  GET /api/v1/metrics?metric_type=performance&department_id=1
 
+# The department's definitions of one type, from the in-memory catalog, with an ETag
+# that follows the catalog version
+def department_definitions_response(request: Request, db: Session, current_user: User, metric_type: str):
+    catalog = metric_catalog.get(db)
+    etag = make_etag("department-metrics", catalog.version, current_user.department_id, metric_type)
+    return conditional_json(request, etag, CACHE_PRIVATE_CATALOG,
+                            lambda: catalog.department_definitions(current_user.department_id, metric_type))
+
 # View my performance metrics 
 @router.get("/performance-metrics")
-def get_performance_metrics(db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
+def get_performance_metrics(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)):
     if role == RoleType.EMPLOYEE:
-        metrics = db.query(MetricDefinition).filter(
-            MetricDefinition.metric_type == MetricTypeEnum.performance.value,
-            MetricDefinition.department_id == current_user.department_id
-        ).all()
-        return metrics
+        return department_definitions_response(request, db, current_user, "PERFORMANCE")
         #return {"message": "Fetching performance metrics for the logged in Employee"}
     elif role == RoleType.SUPERVISOR:
         # Supervisor: Fetch all performance metrics for their department
@@ -71,14 +83,10 @@ def get_performance_metrics(db: Session = Depends(get_db), current_user: User =
     
 # View my wellness metrics
 @router.get("/wellness-metrics")
-def get_wellness_metrics(db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
+def get_wellness_metrics(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
     role: RoleType = Depends(get_current_user_role)):
     if role == RoleType.EMPLOYEE:
-        metrics = db.query(MetricDefinition).filter(
-            MetricDefinition.metric_type == MetricTypeEnum.wellness.value,
-            MetricDefinition.department_id == current_user.department_id
-        ).all()
-        return metrics
+        return department_definitions_response(request, db, current_user, "WELLNESS")
         #return {"message": "Fetching performance metrics for the logged in Employee"}
     elif role == RoleType.SUPERVISOR:
         # Supervisor: Fetch all performance metrics for their department
@@ -99,8 +107,13 @@ class MetricRecordResponse(BaseModel):
     recorded_at: date
     unit: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# One page of a keyset-paginated history; pass next_cursor back as ?cursor= for the
+# following page. next_cursor is null on the last page.
+class MetricRecordPage(BaseModel):
+    items: List[MetricRecordResponse]
+    next_cursor: Optional[str] = None
 
 # Response for aggregated metrics
 class AggregatedMetricResponse(BaseModel):
@@ -115,25 +128,40 @@ class AggregatedMetricResponse(BaseModel):
     latest_value: Optional[float] = None
     latest_text_value: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-@router.get("/employee/my-metrics", response_model=List[MetricRecordResponse])
-def get_my_metrics(
-    metric_type: Optional[str] = Query(None, description="Filter by metric type (PERFORMANCE or WELLNESS)"),
-    start_date: Optional[date] = Query(None, description="Filter metrics from this date"),
-    end_date: Optional[date] = Query(None, description="Filter metrics until this date"),
-    month: Optional[int] = Query(None, description="Filter by month (1-12)"),
-    year: Optional[int] = Query(None, description="Filter by year"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)
-):
-    if role != RoleType.EMPLOYEE:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view their own metrics.")
+# The employee history queries are built apart from their routes so tests can inspect
+# their plans. Their date filters are half-open ranges on recorded_date, which the
+# (user_id, recorded_date) indexes serve and which restrict the scan to the monthly
+# partitions of metric_records inside the window; only a month without a year
+# (extract(month ...)) has to visit every partition.
+def build_my_metrics_query(user_id: int, metric_type: Optional[str], window: TimeWindow):
+    query = select(
+        MetricRecord.id,
+        MetricRecord.metric_id,
+        MetricDefinition.metric_name,
+        MetricRecord.metric_type,
+        MetricRecord.value_numeric,
+        MetricRecord.value_text,
+        MetricRecord.recorded_at,
+        MetricDefinition.unit
+    ).join(
+        MetricDefinition, 
+        MetricRecord.metric_id == MetricDefinition.id
+    ).where(
+        MetricRecord.user_id == user_id,
+        *window.predicates()
+    )
+
+    if metric_type:
+        query = query.where(MetricRecord.metric_type == metric_type.upper())
 
-    # Start with a base query
-    query = db.query(
+    # Newest first; id breaks ties so the order (and the keyset) is stable
+    return query.order_by(MetricRecord.recorded_at.desc(), MetricRecord.id.desc())
+
+
+def build_metrics_by_date_query(user_id: int, record_date: date, metric_type: Optional[str]):
+    query = select(
         MetricRecord.id,
         MetricRecord.metric_id,
         MetricDefinition.metric_name,
@@ -145,31 +173,51 @@ def get_my_metrics(
     ).join(
         MetricDefinition, 
         MetricRecord.metric_id == MetricDefinition.id
-    ).filter(
-        MetricRecord.user_id == current_user.id
+    ).where(
+        MetricRecord.user_id == user_id,
+        MetricRecord.recorded_date == record_date
     )
 
-    # Apply filters
     if metric_type:
-        query = query.filter(MetricRecord.metric_type == metric_type.upper())
-    
-    if start_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) >= start_date)
-    
-    if end_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) <= end_date)
-    
-    if month:
-        query = query.filter(extract('month', MetricRecord.recorded_at) == month)
-    
-    if year:
-        query = query.filter(extract('year', MetricRecord.recorded_at) == year)
-    
-    # Order by recorded_at descending
-    query = query.order_by(MetricRecord.recorded_at.desc())
+        query = query.where(MetricRecord.metric_type == metric_type.upper())
+    return query
+
+# The employee history routes below are read-only and run on the async session,
+# authorizing from the token claims (get_async_principal).
+@router.get("/employee/my-metrics", response_model=Union[MetricRecordPage, List[MetricRecordResponse]])
+async def get_my_metrics(
+    metric_type: Optional[str] = Query(None, description="Filter by metric type (PERFORMANCE or WELLNESS)"),
+    start_date: Optional[date] = Query(None, description="Filter metrics from this date"),
+    end_date: Optional[date] = Query(None, description="Filter metrics until this date"),
+    month: Optional[int] = Query(None, description="Filter by month (1-12)"),
+    year: Optional[int] = Query(None, description="Filter by year"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Page size"),
+    unpaginated: bool = Query(False, description="Return every matching record as a plain list"),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)
+):
+    if principal.role != RoleType.EMPLOYEE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view their own metrics.")
+
+    query = build_my_metrics_query(principal.user_id, metric_type, TimeWindow.from_params(start_date, end_date, month, year))
+
+    if not unpaginated:
+        if cursor:
+            after = decode_cursor(cursor, datetime, int)
+            # The recorded_date bound is implied by the keyset one but, unlike it, lets
+            # Postgres skip the monthly partitions newer than the cursor
+            query = query.where(tuple_(MetricRecord.recorded_at, MetricRecord.id) < tuple_(*after),
+                                MetricRecord.recorded_date <= utc_day(after[0]))
+        # One extra row tells whether another page follows
+        query = query.limit(limit + 1)
     
     # Execute query
-    results = query.all()
+    results = (await db.execute(query)).all()
+    next_cursor = None
+    if not unpaginated and len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1].recorded_at, results[-1].id)
     
     # Format response
     response = []
@@ -181,101 +229,77 @@ def get_my_metrics(
             "metric_type": r.metric_type,
             "value_numeric": r.value_numeric,
             "value_text": r.value_text,
-            "recorded_at": r.recorded_at,
+            "recorded_at": r.recorded_at.date(),
             "unit": r.unit
         })
     
-    return response
+    if unpaginated:
+        return fast_json_response(response, List[MetricRecordResponse])
+    return fast_json_response({"items": response, "next_cursor": next_cursor}, MetricRecordPage)
 
 @router.get("/employee/my-aggregated-metrics", response_model=List[AggregatedMetricResponse])
-def get_my_aggregated_metrics(
+async def get_my_aggregated_metrics(
     metric_type: Optional[str] = Query(None, description="Filter by metric type (PERFORMANCE or WELLNESS)"),
     start_date: Optional[date] = Query(None, description="Filter metrics from this date"),
     end_date: Optional[date] = Query(None, description="Filter metrics until this date"),
     month: Optional[int] = Query(None, description="Filter by month (1-12)"),
     year: Optional[int] = Query(None, description="Filter by year"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)
 ):
-    if role != RoleType.EMPLOYEE:
+    if principal.role != RoleType.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view their own metrics.")
 
-    # Subquery to get the latest record for each metric
-    latest_records_subquery = db.query(
-        MetricRecord.metric_id,
-        func.max(MetricRecord.recorded_at).label('latest_date')
-    ).filter(
-        MetricRecord.user_id == current_user.id
-    ).group_by(
-        MetricRecord.metric_id
-    ).subquery()
-    
-    # Get the latest values
-    latest_values = db.query(
-        MetricRecord.metric_id,
-        MetricRecord.value_numeric,
-        MetricRecord.value_text
-    ).join(
-        latest_records_subquery,
-        and_(
-            MetricRecord.metric_id == latest_records_subquery.c.metric_id,
-            MetricRecord.recorded_at == latest_records_subquery.c.latest_date
-        )
-    ).filter(
-        MetricRecord.user_id == current_user.id
-    ).subquery()
+    # Aggregates come from the rollup tables instead of scanning metric_records:
+    # windows made of whole months read the monthly grain, anything else the daily one
+    window = TimeWindow.from_params(start_date, end_date, month, year)
+    if window.month_aligned:
+        rollup, period = MetricMonthlyRollup, MetricMonthlyRollup.month
+    else:
+        rollup, period = MetricDailyRollup, MetricDailyRollup.day
 
     # Base query for aggregation
-    query = db.query(
-        MetricRecord.metric_id,
+    query = select(
+        rollup.metric_id,
         MetricDefinition.metric_name,
-        MetricRecord.metric_type,
-        func.avg(MetricRecord.value_numeric).label('avg_value'),
-        func.min(MetricRecord.value_numeric).label('min_value'),
-        func.max(MetricRecord.value_numeric).label('max_value'),
-        func.count(MetricRecord.id).label('count'),
+        rollup.metric_type,
+        (func.sum(rollup.value_sum) / func.nullif(func.sum(rollup.value_count), 0)).label('avg_value'),
+        func.min(rollup.value_min).label('min_value'),
+        func.max(rollup.value_max).label('max_value'),
+        func.sum(rollup.record_count).label('count'),
         MetricDefinition.unit,
-        latest_values.c.value_numeric.label('latest_value'),
-        latest_values.c.value_text.label('latest_text_value')
+        MetricLatest.value_numeric.label('latest_value'),
+        MetricLatest.value_text.label('latest_text_value')
     ).join(
         MetricDefinition, 
-        MetricRecord.metric_id == MetricDefinition.id
+        rollup.metric_id == MetricDefinition.id
     ).outerjoin(
-        latest_values,
-        MetricRecord.metric_id == latest_values.c.metric_id
-    ).filter(
-        MetricRecord.user_id == current_user.id
+        # Latest value of each metric (over all time), kept current by the write paths
+        MetricLatest,
+        and_(MetricLatest.user_id == rollup.user_id, MetricLatest.metric_id == rollup.metric_id)
+    ).where(
+        rollup.user_id == principal.user_id
     )
 
     # Apply filters
     if metric_type:
-        query = query.filter(MetricRecord.metric_type == metric_type.upper())
-    
-    if start_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) >= start_date)
-    
-    if end_date:
-        query = query.filter(cast(MetricRecord.recorded_at, Date) <= end_date)
-    
-    if month:
-        query = query.filter(extract('month', MetricRecord.recorded_at) == month)
+        query = query.where(rollup.metric_type == metric_type.upper())
     
-    if year:
-        query = query.filter(extract('year', MetricRecord.recorded_at) == year)
+    # Half-open ranges on the rollup's day/month column
+    query = query.where(*window.predicates(period))
     
     # Group by necessary columns
     query = query.group_by(
-        MetricRecord.metric_id,
+        rollup.metric_id,
         MetricDefinition.metric_name,
-        MetricRecord.metric_type,
+        rollup.metric_type,
         MetricDefinition.unit,
-        latest_values.c.value_numeric,
-        latest_values.c.value_text
+        MetricLatest.value_numeric,
+        MetricLatest.value_text
     )
     
     # Execute query
-    results = query.all()
+    results = (await db.execute(query)).all()
     
     # Format response
     response = []
@@ -296,37 +320,17 @@ def get_my_aggregated_metrics(
     return response
 
 @router.get("/employee/metrics-by-date/{record_date}", response_model=List[MetricRecordResponse])
-def get_metrics_by_date(
+async def get_metrics_by_date(
     record_date: date = Path(..., description="Get metrics for specific date"),
     metric_type: Optional[str] = Query(None, description="Filter by metric type (PERFORMANCE or WELLNESS)"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    role: RoleType = Depends(get_current_user_role)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_async_principal)
 ):
-    if role != RoleType.EMPLOYEE:
+    if principal.role != RoleType.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only employees can view their own metrics.")
 
-    query = db.query(
-        MetricRecord.id,
-        MetricRecord.metric_id,
-        MetricDefinition.metric_name,
-        MetricRecord.metric_type,
-        MetricRecord.value_numeric,
-        MetricRecord.value_text,
-        MetricRecord.recorded_at,
-        MetricDefinition.unit
-    ).join(
-        MetricDefinition, 
-        MetricRecord.metric_id == MetricDefinition.id
-    ).filter(
-        MetricRecord.user_id == current_user.id,
-        cast(MetricRecord.recorded_at, Date) == record_date
-    )
-
-    if metric_type:
-        query = query.filter(MetricRecord.metric_type == metric_type.upper())
-    
-    results = query.all()
+    query = build_metrics_by_date_query(principal.user_id, record_date, metric_type)
+    results = (await db.execute(query)).all()
     
     response = []
     for r in results:
@@ -337,7 +341,7 @@ def get_metrics_by_date(
             "metric_type": r.metric_type,
             "value_numeric": r.value_numeric,
             "value_text": r.value_text,
-            "recorded_at": r.recorded_at,
+            "recorded_at": r.recorded_at.date(),
             "unit": r.unit
         })
     
@@ -1,13 +1,15 @@
 from typing import Optional
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import literal_column, select
+from pydantic import BaseModel, ConfigDict
 from app.models.models import User, RoleType
 from app.auth.deps import get_current_user
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import Session
-from app.models.models import User
+from app.models.models import Department, User
 from app.models.base import get_db
 from app.routes.departments import DepartmentResponse
+from app.utils.etag import CACHE_PRIVATE_REVALIDATE, conditional_json, make_etag
 
 router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 #DEMO-TESTED
@@ -21,17 +23,28 @@ class UserProfileResponse(BaseModel):
     department: Optional[DepartmentResponse]  # ✅ Add this
     employee_id: Optional[str]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 @router.get("/me", response_model=UserProfileResponse)
 def get_my_profile(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    user = db.query(User)\
-        .options(joinedload(User.department))\
-        .filter(User.id == current_user.id)\
-        .first()
+    # Row versions (xmin) of the user and their department; the profile is only
+    # loaded and serialized when the client does not have this version yet
+    versions = db.execute(
+        select(literal_column("users.xmin::text"), literal_column("departments.xmin::text"))
+        .select_from(User)
+        .outerjoin(Department, Department.id == User.department_id)
+        .where(User.id == current_user.id)
+    ).one_or_none()
+    etag = make_etag("profile", current_user.id, *(versions or ()))
 
-    return user
\ No newline at end of file
+    def build():
+        return db.query(User)\
+            .options(joinedload(User.department))\
+            .filter(User.id == current_user.id)\
+            .first()
+
+    return conditional_json(request, etag, CACHE_PRIVATE_REVALIDATE, build, UserProfileResponse)
\ No newline at end of file
@@ -1,14 +1,19 @@
 # backend/app/routes/users.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from app.models.base import get_db
 from app.models.models import User, RoleType, Department, DepartmentRoleType, DepartmentType
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, ConfigDict
 from datetime import datetime
 from app.auth.deps import get_current_user_role, get_current_user
 from app.auth.deps import is_admin, is_supervisor
+from app.auth.user_cache import publish_user_change
+from app.crud.rollup import move_user_rollups
+from app.crud.user import bump_token_version, token_sensitive_state
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.utils.pagination import decode_cursor, encode_cursor
 from app.utils.security import get_password_hash
 from app.routes.departments import DepartmentCreate, DepartmentResponse
 from sqlalchemy import and_, or_
@@ -57,8 +62,11 @@ class UserResponse(UserBase):
     department: Optional[DepartmentResponse]  # ✅ Nested department info
     created_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
 
 class EmployeeCreate(BaseModel):
     username: str
@@ -103,10 +111,24 @@ def check_user_exists(db: Session, username: str, email: str) -> bool:
 # ======= Routes =======
 
 # General routes
-@router.get("/", response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+# Keyset-paginated by id: pass next_cursor back as ?cursor= for the following page.
+# ?unpaginated=true returns every user as the plain list this route used to answer.
+@router.get("/", response_model=Union[UserPage, List[UserResponse]])
+def get_users(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    unpaginated: bool = Query(False, description="Return every user as a plain list"),
+    db: Session = Depends(get_db)
+):
+    query = db.query(User).order_by(User.id)
+    if unpaginated:
+        return query.all()
+    if cursor:
+        after_id, = decode_cursor(cursor, int)
+        query = query.filter(User.id > after_id)
+    users = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(users[limit - 1].id) if len(users) > limit else None
+    return {"items": users[:limit], "next_cursor": next_cursor}
 
 # Department routes
 @router.get("/departments", response_model=List[DepartmentResponse])
@@ -212,6 +234,8 @@ def update_supervisor(
     if not supervisor:
         raise HTTPException(status_code=404, detail="Supervisor not found")
 
+    tokens_before = token_sensitive_state(supervisor)
+
     # Update fields if provided
     if user_update.username is not None:
         supervisor.username = user_update.username
@@ -221,8 +245,9 @@ def update_supervisor(
         supervisor.first_name = user_update.first_name
     if user_update.last_name is not None:
         supervisor.last_name = user_update.last_name
-    if user_update.department_id is not None:
+    if user_update.department_id is not None and user_update.department_id != supervisor.department_id:
         supervisor.department_id = user_update.department_id
+        move_user_rollups(db, supervisor.id, supervisor.department_id)
     if user_update.department_role is not None:
         supervisor.department_role = user_update.department_role
     if user_update.is_active is not None:
@@ -230,6 +255,10 @@ def update_supervisor(
     if user_update.password is not None:
         supervisor.hashed_password = get_password_hash(user_update.password)
 
+    if token_sensitive_state(supervisor) != tokens_before:
+        bump_token_version(supervisor)
+
+    publish_user_change(db, supervisor.id)
     db.commit()
     db.refresh(supervisor)
     return supervisor
@@ -252,6 +281,7 @@ def delete_supervisor(
         )
 
     db.delete(supervisor)
+    publish_user_change(db, supervisor_id)
     db.commit()
 
     return {"message": f"Supervisor {supervisor.username} deleted successfully."}
@@ -310,6 +340,8 @@ def update_employee(
     if employee.department_id != current_user.department_id:
         raise HTTPException(status_code=403, detail="Supervisors can only update employees in their own department.")
 
+    tokens_before = token_sensitive_state(employee)
+
     # Update fields if provided
     if employee_update.username is not None:
         employee.username = employee_update.username
@@ -326,6 +358,10 @@ def update_employee(
     if employee_update.is_active is not None:
         employee.is_active = employee_update.is_active
 
+    if token_sensitive_state(employee) != tokens_before:
+        bump_token_version(employee)
+
+    publish_user_change(db, employee.id)
     db.commit()
     db.refresh(employee)
     return employee
@@ -411,6 +447,7 @@ def delete_employee(
         raise HTTPException(status_code=403, detail="Supervisors can only delete employees from their own department.")
 
     db.delete(employee)
+    publish_user_change(db, employee_id)
     db.commit()
 
     return {"message": f"Employee {employee.username} deleted successfully."}
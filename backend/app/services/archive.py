@@ -0,0 +1,125 @@
+import zlib
+from dataclasses import dataclass, field
+from datetime import date
+import orjson
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.config import METRIC_ARCHIVE_BATCH_ROWS, METRIC_ARCHIVE_COMPRESSION_LEVEL
+from app.crud.rollup import lock_users
+from app.models.models import MetricRecord, MetricRecordArchive
+from app.services.partitions import add_months
+from app.utils.time_window import first_of_next_month
+
+# Raw records of whole past months are moved from metric_records into
+# metric_record_archives, one row per (user, month) and batch:
+#
+#   payload = zlib(JSON array of the records, every column, ordered by recorded_date, id)
+#
+# Each batch deletes the records of a few users for one month with DELETE ... RETURNING
+# and inserts their archive rows in the same short transaction, so an interrupted run
+# leaves every record either archived or still in metric_records and the next run
+# simply continues with what is left. Rollups and latest values are not touched: they
+# remain the queryable history of archived months (see archived_before() in
+# app/crud/rollup.py, which also keeps writes and rebuilds out of those months).
+RECORDS = MetricRecord.__table__
+
+
+@dataclass
+class ArchiveReport:
+    batches: int = 0
+    records: int = 0
+    months: dict = field(default_factory=dict)  # month -> records archived in this run
+    complete: bool = True  # False when max_batches stopped the run early
+
+
+def encode_records(rows) -> bytes:
+    return zlib.compress(orjson.dumps([
+        {**row, "metric_type": row["metric_type"].name} for row in rows
+    ]), METRIC_ARCHIVE_COMPRESSION_LEVEL)
+
+
+def decode_records(payload: bytes) -> list:
+    """The records of an archive payload as JSON values (dates as ISO strings)."""
+    return orjson.loads(zlib.decompress(payload))
+
+
+def load_archived_records(db: Session, user_id: int, month: date) -> list:
+    """Every archived record of a user in one month, ordered by recorded_date and id."""
+    payloads = db.scalars(select(MetricRecordArchive.payload).where(
+        MetricRecordArchive.user_id == user_id,
+        MetricRecordArchive.month == month.replace(day=1),
+    ).order_by(MetricRecordArchive.id))
+    records = [record for payload in payloads for record in decode_records(payload)]
+    return sorted(records, key=lambda record: (record["recorded_date"], record["id"]))
+
+
+def _user_batches(counts, batch_rows: int):
+    # Whole users per batch, so a user's month is archived in a single transaction
+    batch, size = [], 0
+    for user_id, count in counts:
+        if batch and size + count > batch_rows:
+            yield batch
+            batch, size = [], 0
+        batch.append(user_id)
+        size += count
+    if batch:
+        yield batch
+
+
+def archive_month_batch(db: Session, month: date, user_ids: list) -> int:
+    """Move the records of some users in one month into the archive. Returns the count.
+
+    The caller owns the transaction. The users' rollup locks are held until commit, so a
+    concurrent write of these users cannot slip a record in between.
+    """
+    lock_users(db, user_ids)
+    rows = db.execute(
+        delete(RECORDS).where(
+            RECORDS.c.user_id.in_(user_ids),
+            RECORDS.c.recorded_date >= month,
+            RECORDS.c.recorded_date < first_of_next_month(month),
+        ).returning(*RECORDS.c)
+    ).mappings().all()
+    by_user = {}
+    for row in sorted(rows, key=lambda row: (row["recorded_date"], row["id"])):
+        by_user.setdefault(row["user_id"], []).append(row)
+    if by_user:
+        db.execute(insert(MetricRecordArchive), [
+            {"user_id": user_id, "month": month, "record_count": len(records),
+             "payload": encode_records(records)}
+            for user_id, records in by_user.items()
+        ])
+    return len(rows)
+
+
+def archive_records(db: Session, before: date, batch_rows: int = METRIC_ARCHIVE_BATCH_ROWS,
+                    max_batches: int = None) -> ArchiveReport:
+    """Archive every record of the months before `before`, oldest month first.
+
+    Commits after every batch of about batch_rows records (never less than one user's
+    month), so no transaction outlives a batch; max_batches bounds a single run.
+    """
+    before = before.replace(day=1)
+    report = ArchiveReport()
+    oldest = db.scalar(select(func.min(RECORDS.c.recorded_date)).where(RECORDS.c.recorded_date < before))
+    db.commit()
+    month = oldest.replace(day=1) if oldest else before
+    while month < before:
+        counts = db.execute(
+            select(RECORDS.c.user_id, func.count()).where(
+                RECORDS.c.recorded_date >= month,
+                RECORDS.c.recorded_date < first_of_next_month(month),
+            ).group_by(RECORDS.c.user_id).order_by(RECORDS.c.user_id)
+        ).all()
+        db.commit()
+        for user_ids in _user_batches(counts, batch_rows):
+            if max_batches is not None and report.batches >= max_batches:
+                report.complete = False
+                return report
+            archived = archive_month_batch(db, month, user_ids)
+            db.commit()
+            report.batches += 1
+            report.records += archived
+            report.months[month] = report.months.get(month, 0) + archived
+        month = add_months(month, 1)
+    return report
@@ -1,22 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.auth.user_cache import publish_user_change
+from app.config import BCRYPT_MAX_WORKERS
 from app.models.models import User
-from app.utils.security import verify_password
+from app.utils.security import verify_and_update_password
 
-# This function authenticates a user by checking the provided email and password against the database.
+# bcrypt is CPU bound but releases the GIL, so a small dedicated thread pool keeps it
+# off the event loop and caps how many hashes run at once. Logins beyond the cap wait
+# in the pool queue instead of occupying the threads that serve every other request.
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def run_in_hash_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, func, *args)
+
+
+def _get_user_by_username(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+
+def _store_rehashed_password(db: Session, user: User, new_hash: str):
+    user.hashed_password = new_hash
+    publish_user_change(db, user.id)
+    db.commit()
+
+# This function authenticates a user by checking the provided username and password against the database.
 # If the credentials are valid, it returns the user object; otherwise, it returns None.
-# This is useful for login functionality in web applications.
-# It uses SQLAlchemy to query the database for the user with the given email.
-# The password is verified using a utility function (verify_password) that checks the hashed password.
-# The function is designed to be used in conjunction with FastAPI's dependency injection system.
-# It takes a SQLAlchemy session, email, and password as parameters.
-
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+# The password is verified exactly once, in the bcrypt pool. If the stored hash was created
+# with outdated cost parameters it is replaced with a fresh hash as part of the same check.
+# Database calls run in the regular threadpool because the session is synchronous.
+async def authenticate_user(db: Session, username: str, password: str):
+    user = await run_in_threadpool(_get_user_by_username, db, username)
     if not user:
         print("User not found")
         return None
-    if not verify_password(password, user.hashed_password):
-        print  ("Incorrect password")
+    valid, new_hash = await run_in_hash_pool(verify_and_update_password, password, user.hashed_password)
+    if not valid:
+        print("Incorrect password")
         return None
-    print("user Valid.. I am retyurning you reqd payload ")
-    return user
\ No newline at end of file
+    if new_hash:
+        await run_in_threadpool(_store_rehashed_password, db, user, new_hash)
+    return user
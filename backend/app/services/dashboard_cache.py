@@ -0,0 +1,217 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.config import DASHBOARD_CACHE_MAX_ENTRIES, DASHBOARD_CACHE_TTL_SECONDS
+from app.database import ChannelListener
+from app.utils.time_window import TimeWindow
+
+logger = logging.getLogger(__name__)
+
+# Results of /dashboard/view-aggregate-metrics, keyed by department, metric type and
+# the normalized time window (so "2024-06" and "2024-06-01..2024-06-30" share an
+# entry). Writes to the rollups announce the (department, day) pairs they touched with
+# publish_dashboard_changes(); on commit the entries whose window contains one of those
+# days are dropped in this worker, and the same message reaches the other workers via
+# Postgres NOTIFY (see DashboardChangeListener).
+CHANGES_CHANNEL = "dashboard_changes"
+MAX_DAYS_PER_MESSAGE = 200  # NOTIFY payloads are limited to 8000 bytes
+
+DashboardKey = namedtuple("DashboardKey", "department_id metric_type start end month_of_year")
+
+
+def dashboard_key(department_id: int, metric_type: str, window: TimeWindow) -> DashboardKey:
+    return DashboardKey(department_id, metric_type or None, window.start, window.end, window.month_of_year)
+
+
+def _window_contains(key: DashboardKey, day) -> bool:
+    return ((key.start is None or day >= key.start)
+            and (key.end is None or day < key.end)
+            and (key.month_of_year is None or day.month == key.month_of_year))
+
+
+class _KeyStats:
+    __slots__ = ("hits", "computes", "total_compute", "last_compute")
+
+    def __init__(self):
+        self.hits = 0
+        self.computes = 0
+        self.total_compute = 0.0
+        self.last_compute = 0.0
+
+
+class DashboardCache:
+    def __init__(self, maxsize: int = DASHBOARD_CACHE_MAX_ENTRIES, ttl: float = DASHBOARD_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._key_stats = OrderedDict()
+        self._generations = {}       # department_id -> count of invalidations
+        self._generation_all = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, department_id):
+        return self._generation_all, self._generations.get(department_id, 0)
+
+    def get(self, key: DashboardKey):
+        """Return (value, token). On a miss value is None; pass token to set()."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                self._stats_for(key).hits += 1
+                return entry[1], None
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None, self._generation(key.department_id)
+
+    def set(self, key: DashboardKey, value, token, compute_seconds: float):
+        with self._lock:
+            stats = self._stats_for(key)
+            stats.computes += 1
+            stats.total_compute += compute_seconds
+            stats.last_compute = compute_seconds
+            # A write that committed while the value was computed may not be in it
+            if token != self._generation(key.department_id):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _stats_for(self, key):
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = _KeyStats()
+            while len(self._key_stats) > 2 * self.maxsize:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        return stats
+
+    def invalidate(self, department_id, days=None):
+        """Drop the department's entries whose window contains any of days (all if None)."""
+        with self._lock:
+            self._generations[department_id] = self._generations.get(department_id, 0) + 1
+            stale = [
+                key for key in self._data
+                if key.department_id == department_id
+                and (days is None or any(_window_contains(key, day) for day in days))
+            ]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation_all += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def apply(self, changes):
+        """Apply the changes of publish_dashboard_changes(); None clears everything."""
+        if changes is None:
+            self.clear()
+            return
+        for department_id, days in changes.items():
+            self.invalidate(department_id, days)
+
+    def stats(self, top: int = 20) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            keys = sorted(self._key_stats.items(), key=lambda item: item[1].total_compute, reverse=True)[:top]
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "keys": [
+                    {
+                        "department_id": key.department_id,
+                        "type": key.metric_type,
+                        "start": key.start.isoformat() if key.start else None,
+                        "end": key.end.isoformat() if key.end else None,
+                        "month_of_year": key.month_of_year,
+                        "cached": key in self._data,
+                        "hits": stats.hits,
+                        "computes": stats.computes,
+                        "avg_compute_ms": round(stats.total_compute / stats.computes * 1000, 3) if stats.computes else 0.0,
+                        "last_compute_ms": round(stats.last_compute * 1000, 3),
+                    }
+                    for key, stats in keys
+                ],
+            }
+
+
+dashboard_cache = DashboardCache()
+
+
+def _messages(changes):
+    if changes is None:
+        yield {"all": True}
+        return
+    for department_id, days in changes.items():
+        days = None if days is None or len(days) > MAX_DAYS_PER_MESSAGE else sorted(day.isoformat() for day in days)
+        yield {"department_id": department_id, "days": days}
+
+
+def _parse_message(payload: str):
+    message = json.loads(payload)
+    if message.get("all"):
+        return None
+    days = message["days"]
+    return {message["department_id"]: None if days is None else {date.fromisoformat(day) for day in days}}
+
+
+def publish_dashboard_changes(db: Session, changes):
+    """Invalidate dashboards for changes once db's transaction commits.
+
+    changes maps department_id -> set of days (or None for every day); changes=None
+    invalidates every department. NOTIFY is transactional, so other workers only hear
+    about the change on commit, and not at all on rollback.
+    """
+    if changes == {}:
+        return
+    for message in _messages(changes):
+        db.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(message))))
+    event.listen(db, "after_commit", lambda session: dashboard_cache.apply(changes), once=True)
+
+
+# Keeps one dedicated asyncpg connection LISTENing on CHANGES_CHANNEL and applies the
+# changes announced by the other workers (and scripts such as backfill_rollups.py).
+# While it is disconnected nothing is heard, so the cache is cleared on every
+# (re)connect.
+class DashboardChangeListener(ChannelListener):
+    name = "Dashboard change listener"
+    channel = CHANGES_CHANNEL
+
+    def __init__(self, cache: DashboardCache = dashboard_cache, retry_seconds: float = 5.0):
+        super().__init__(retry_seconds)
+        self.cache = cache
+
+    def on_notify(self, payload: str):
+        try:
+            self.cache.apply(_parse_message(payload))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s message: %r", CHANGES_CHANNEL, payload)
+
+    def on_reset(self):
+        self.cache.clear()
+
+
+dashboard_change_listener = DashboardChangeListener()
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from app.config import EXPORT_FETCH_SIZE
+from app.database import AsyncSessionLocal
+from app.models.models import MetricDefinition, MetricRecord, RoleType, User
+from app.utils.time_window import TimeWindow
+
+EXPORT_COLUMNS = (
+    "employee_id", "first_name", "last_name", "metric_id", "metric_name",
+    "metric_type", "value_numeric", "value_text", "recorded_at", "unit",
+)
+
+
+def department_export_query(department_id: int, window: TimeWindow, metric_type: str = None,
+                            metric_ids: list = None):
+    """Every record of the department's employees in the window, one row per record.
+
+    Ordered by (user_id, recorded_at, id) so Postgres can walk the
+    (user_id, recorded_at, id) index instead of sorting the whole range.
+    """
+    query = select(
+        User.employee_id,
+        User.first_name,
+        User.last_name,
+        MetricRecord.metric_id,
+        MetricDefinition.metric_name,
+        MetricRecord.metric_type,
+        MetricRecord.value_numeric,
+        MetricRecord.value_text,
+        MetricRecord.recorded_at,
+        MetricDefinition.unit,
+    ).join(User, User.id == MetricRecord.user_id)\
+     .join(MetricDefinition, MetricRecord.metric_id == MetricDefinition.id)\
+     .where(
+        User.department_id == department_id,
+        User.role == RoleType.EMPLOYEE,
+        *window.predicates(),
+    )
+    if metric_type:
+        query = query.where(MetricRecord.metric_type == metric_type.upper())
+    if metric_ids:
+        query = query.where(MetricRecord.metric_id.in_(metric_ids))
+    return query.order_by(MetricRecord.user_id, MetricRecord.recorded_at, MetricRecord.id)
+
+
+def _export_values(row) -> list:
+    values = list(row)
+    values[5] = row.metric_type.value
+    values[8] = row.recorded_at.isoformat() if row.recorded_at else None
+    return values
+
+
+# The export owns its session: FastAPI closes request-scoped dependencies before a
+# StreamingResponse body is sent. db.stream() runs the query on a server-side cursor and
+# partitions() hands over EXPORT_FETCH_SIZE rows at a time, so only one batch of rows and
+# one encoded chunk are held in memory however long the range is.
+async def _stream_batches(statement):
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        async for batch in result.partitions():
+            yield batch
+
+
+async def stream_ndjson(statement):
+    async for batch in _stream_batches(statement):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _export_values(row)))) + "\n" for row in batch
+        )
+
+
+async def stream_csv(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    async for batch in _stream_batches(statement):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_export_values(row) for row in batch)
+        yield buffer.getvalue()
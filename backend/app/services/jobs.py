@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from app.config import JOB_RUN_PRUNE_CRON, METRIC_ARCHIVE_AFTER_MONTHS, METRIC_ARCHIVE_CRON
+from app.config import METRIC_PARTITION_RETENTION_MONTHS, PARTITION_MAINTENANCE_CRON
+from app.services.archive import archive_records
+from app.services.partitions import detach_partitions, ensure_partitions, retention_cutoff
+from app.services.scheduler import CronTrigger, Scheduler, prune_job_runs
+
+# Built-in jobs of the in-process scheduler. They do what the maintenance scripts
+# (maintain_partitions.py, archive_records.py) do, which remain available for cron
+# setups that run the API with SCHEDULER_ENABLED=false.
+
+
+def maintain_partitions(db: Session):
+    ensure_partitions(db)
+    db.commit()
+    cutoff = retention_cutoff(datetime.now(timezone.utc).date(), METRIC_PARTITION_RETENTION_MONTHS)
+    if cutoff:
+        detach_partitions(db, cutoff)
+        db.commit()
+
+
+def archive_old_records(db: Session):
+    before = retention_cutoff(datetime.now(timezone.utc).date(), METRIC_ARCHIVE_AFTER_MONTHS)
+    if before:
+        archive_records(db, before)  # commits per batch
+
+
+def register_default_jobs(scheduler: Scheduler):
+    for name, func, cron in [
+        ("maintain_partitions", maintain_partitions, PARTITION_MAINTENANCE_CRON),
+        ("archive_records", archive_old_records, METRIC_ARCHIVE_CRON),
+        ("prune_job_runs", prune_job_runs, JOB_RUN_PRUNE_CRON),
+    ]:
+        if cron:
+            scheduler.add_job(name, func, CronTrigger(cron))
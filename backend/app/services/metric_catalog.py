@@ -0,0 +1,226 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import METRIC_CATALOG_CHECK_SECONDS
+from app.models.models import CatalogVersion, MetricDefinition, MetricDefinitionRole, MetricTypeEnum
+
+# The metric catalog (metric_definitions plus metric_definition_roles, a few dozen rows)
+# is read on every metrics page and submission but only changes when it is seeded or
+# edited by an admin. Each worker keeps it in memory as an immutable snapshot tagged
+# with the catalog_versions row it was loaded at. Anything that changes the catalog
+# calls bump_catalog_version() in the same transaction; workers notice the new version
+# within METRIC_CATALOG_CHECK_SECONDS and reload on their next request.
+CATALOG_NAME = "metric_catalog"
+
+_DEFINITION_COLUMNS = [attr.key for attr in inspect(MetricDefinition).column_attrs]
+
+
+@dataclass(frozen=True)
+class MetricCatalogSnapshot:
+    version: int
+    definitions: dict            # metric id -> column values of the metric_definitions row
+    department_metric_ids: dict  # department id -> metric ids, ascending
+    role_metric_ids: dict        # role id -> frozenset of metric ids
+
+    def department_definitions(self, department_id: int, metric_type: str = None) -> list:
+        """Definitions of a department, optionally of one type (PERFORMANCE or WELLNESS)."""
+        return [
+            self.definitions[metric_id]
+            for metric_id in self.department_metric_ids.get(department_id, ())
+            if metric_type is None or self.definitions[metric_id]["metric_type"].name == metric_type
+        ]
+
+    def definitions_for(self, department_id: int, role_id: int, metric_type: str = None) -> list:
+        """Definitions of a department that the role may submit, optionally of one type."""
+        allowed = self.role_metric_ids.get(role_id, frozenset())
+        return [
+            definition for definition in self.department_definitions(department_id, metric_type)
+            if definition["id"] in allowed
+        ]
+
+    def metric_types(self, department_id: int, metric_ids) -> dict:
+        """metric_type of each of metric_ids that belongs to the department."""
+        return {
+            metric_id: self.definitions[metric_id]["metric_type"]
+            for metric_id in metric_ids
+            if metric_id in self.definitions and self.definitions[metric_id]["department_id"] == department_id
+        }
+
+
+def current_version(db: Session) -> int:
+    version = db.scalar(select(CatalogVersion.version).where(CatalogVersion.name == CATALOG_NAME))
+    return version or 0
+
+
+def bump_catalog_version(db: Session):
+    """Mark the catalog as changed; call inside the transaction that changes it."""
+    db.execute(insert(CatalogVersion).values(name=CATALOG_NAME, version=1).on_conflict_do_update(
+        index_elements=[CatalogVersion.name],
+        set_={"version": CatalogVersion.version + 1, "updated_at": func.now()},
+    ))
+
+
+def load_snapshot(db: Session) -> MetricCatalogSnapshot:
+    # The version is read first, so the rows loaded after it are at least that new
+    version = current_version(db)
+    definitions = {
+        definition.id: {key: getattr(definition, key) for key in _DEFINITION_COLUMNS}
+        for definition in db.query(MetricDefinition).order_by(MetricDefinition.id)
+    }
+    department_metric_ids = {}
+    for metric_id, definition in definitions.items():
+        department_metric_ids.setdefault(definition["department_id"], []).append(metric_id)
+    role_metric_ids = {}
+    for metric_id, role_id in db.query(MetricDefinitionRole.metric_id, MetricDefinitionRole.role_id):
+        role_metric_ids.setdefault(role_id, set()).add(metric_id)
+    return MetricCatalogSnapshot(
+        version=version,
+        definitions=definitions,
+        department_metric_ids={key: tuple(ids) for key, ids in department_metric_ids.items()},
+        role_metric_ids={key: frozenset(ids) for key, ids in role_metric_ids.items()},
+    )
+
+
+# Seeding provisions the catalog in bulk (sync_catalog): the input definitions are
+# diffed against metric_definitions by metric_name, new ones are inserted and changed
+# ones rewritten with multi-row INSERT ... ON CONFLICT (id) DO UPDATE, and role
+# mappings are added with INSERT ... ON CONFLICT DO NOTHING. That is a few statements
+# per CATALOG_SYNC_CHUNK_ROWS definitions, all in one transaction, whatever the size
+# of the catalog. The advisory lock keeps concurrent seeders from inserting the same
+# name twice. Definitions and mappings absent from the input are left alone.
+CATALOG_SYNC_LOCK_CLASS = 7304
+
+# Rows per multi-row INSERT, which keeps single statements at a few hundred kilobytes
+CATALOG_SYNC_CHUNK_ROWS = 1000
+
+_SYNC_COLUMNS = [key for key in _DEFINITION_COLUMNS if key != "id"]
+
+
+@dataclass(frozen=True)
+class CatalogSyncReport:
+    added: list    # names of the inserted definitions
+    updated: list  # names of the definitions whose columns changed
+    unchanged: int
+    mapped: int    # role mappings added
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.mapped)
+
+
+def definition_row(entry: dict) -> dict:
+    """Column values of a metric_definitions.json entry; metric_type is given by name."""
+    row = {key: entry.get(key) for key in _SYNC_COLUMNS}
+    row["metric_type"] = MetricTypeEnum[entry["metric_type"].upper()]
+    return row
+
+
+def _chunks(rows: list):
+    for start in range(0, len(rows), CATALOG_SYNC_CHUNK_ROWS):
+        yield rows[start:start + CATALOG_SYNC_CHUNK_ROWS]
+
+
+def sync_catalog(db: Session, definitions=(), role_mappings=()) -> CatalogSyncReport:
+    """Apply definition entries and (metric_id, role_id) pairs in one transaction and commit.
+
+    The catalog version is only bumped when a row was added or changed.
+    """
+    db.execute(text("SELECT pg_advisory_xact_lock(:lock_class, 0)"), {"lock_class": CATALOG_SYNC_LOCK_CLASS})
+    table = MetricDefinition.__table__
+    wanted = {}
+    for entry in definitions:
+        row = definition_row(entry)
+        wanted[row["metric_name"]] = row  # a repeated name: the last entry wins
+    existing = {}
+    if wanted:
+        # Descending, so the oldest row of a name that exists more than once is the one kept in sync
+        for row in db.execute(select(table).order_by(table.c.id.desc())).mappings():
+            existing[row["metric_name"]] = row
+
+    added, updated, unchanged = [], [], 0
+    for name, row in wanted.items():
+        current = existing.get(name)
+        if current is None:
+            added.append(row)
+        elif any(current[key] != row[key] for key in _SYNC_COLUMNS):
+            updated.append({"id": current["id"], **row})
+        else:
+            unchanged += 1
+
+    for chunk in _chunks(added):
+        db.execute(insert(table).values(chunk))
+    for chunk in _chunks(updated):
+        statement = insert(table).values(chunk)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={key: statement.excluded[key] for key in _SYNC_COLUMNS},
+        ))
+    mapped = 0
+    pairs = [{"metric_id": metric_id, "role_id": role_id} for metric_id, role_id in sorted(set(role_mappings))]
+    for chunk in _chunks(pairs):
+        mapped += db.execute(insert(MetricDefinitionRole).values(chunk).on_conflict_do_nothing()).rowcount
+
+    report = CatalogSyncReport(
+        added=[row["metric_name"] for row in added],
+        updated=[row["metric_name"] for row in updated],
+        unchanged=unchanged,
+        mapped=mapped,
+    )
+    if report.changed:
+        bump_catalog_version(db)
+    db.commit()
+    return report
+
+
+# Process-wide holder of the current snapshot. Route handlers run in FastAPI's
+# threadpool, so version checks and reloads happen under a lock; reads of a fresh
+# snapshot do not take it.
+class MetricCatalog:
+    def __init__(self, check_interval: float = METRIC_CATALOG_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.version_checks = 0
+        self.loaded_at = None
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    def get(self, db: Session) -> MetricCatalogSnapshot:
+        if self._fresh():
+            return self._snapshot
+        with self._lock:
+            if not self._fresh():
+                self.version_checks += 1
+                if self._snapshot is None or current_version(db) != self._snapshot.version:
+                    self._snapshot = load_snapshot(db)
+                    self.reloads += 1
+                    self.loaded_at = datetime.now(timezone.utc)
+                self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Check the version again on the next get(), e.g. right after a local change."""
+        with self._lock:
+            self._checked_at = None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "definitions": len(snapshot.definitions) if snapshot else 0,
+            "roles": len(snapshot.role_metric_ids) if snapshot else 0,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "reloads": self.reloads,
+            "version_checks": self.version_checks,
+            "check_interval_seconds": self.check_interval,
+        }
+
+
+metric_catalog = MetricCatalog()
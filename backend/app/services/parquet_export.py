@@ -0,0 +1,268 @@
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+from datetime import date, datetime, timedelta, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import PARQUET_EXPORT_CHUNK_ROWS
+from app.crud.rollup import archived_before
+from app.models.models import MetricDefinition, MetricRecord, MetricRecordArchive, MetricTypeEnum, User
+from app.services.archive import decode_records
+from app.utils.time_window import TimeWindow, first_of_next_month
+
+# Snapshot layout, readable by pyarrow.dataset, DuckDB or Spark as a hive-partitioned
+# dataset:
+#
+#   <root>/department_id=<id>/month=<YYYY-MM>/part-0.parquet
+#   <root>/_manifest.json        {"exported_through": "YYYY-MM", ...}
+#
+# Only complete months (before the current UTC month) are written, so a written month
+# never changes afterwards and an incremental run only has to append the months after
+# "exported_through". Records of users without a department go to the hive default
+# partition. Months archived into metric_record_archives (app/services/archive.py) are
+# read from there, ordered by user; a month whose archival was interrupted has its
+# remaining metric_records in a second file, part-1.parquet.
+MANIFEST = "_manifest.json"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+SCHEMA = pa.schema([
+    ("record_id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("employee_id", pa.string()),
+    ("metric_id", pa.int64()),
+    ("metric_name", pa.string()),
+    ("metric_type", pa.string()),
+    ("unit", pa.string()),
+    ("value_numeric", pa.float64()),
+    ("value_text", pa.string()),
+    ("value_json", pa.string()),
+    ("recorded_at", pa.timestamp("us", tz="UTC")),
+    ("recorded_date", pa.date32()),
+])
+
+# Archive rows (one user's month each) fetched per round trip
+ARCHIVE_FETCH_ROWS = 50
+
+_PARTITION_DIR = re.compile(r"month=(\d{4})-(\d{2})")
+
+
+def _month_label(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def read_manifest(root: str) -> dict:
+    try:
+        with open(os.path.join(root, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_manifest(root: str, manifest: dict):
+    path = os.path.join(root, MANIFEST)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_months(root: str, window: TimeWindow):
+    # A re-exported month is rewritten from scratch, including departments that no
+    # longer have records in it
+    if not os.path.isdir(root):
+        return
+    for department_dir in os.listdir(root):
+        department_path = os.path.join(root, department_dir)
+        if not department_dir.startswith("department_id=") or not os.path.isdir(department_path):
+            continue
+        for month_dir in os.listdir(department_path):
+            match = _PARTITION_DIR.fullmatch(month_dir)
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if (window.start is None or month >= window.start) and month < window.end:
+                shutil.rmtree(os.path.join(department_path, month_dir))
+
+
+def snapshot_query(window: TimeWindow):
+    # Ordered by partition so each (department, month) file is written start to finish
+    # before the next one is opened
+    return select(
+        User.department_id,
+        MetricRecord.id,
+        MetricRecord.user_id,
+        User.employee_id,
+        MetricRecord.metric_id,
+        MetricDefinition.metric_name,
+        MetricRecord.metric_type,
+        MetricDefinition.unit,
+        MetricRecord.value_numeric,
+        MetricRecord.value_text,
+        MetricRecord.value_json,
+        MetricRecord.recorded_at,
+        MetricRecord.recorded_date,
+    ).join(User, User.id == MetricRecord.user_id)\
+     .join(MetricDefinition, MetricRecord.metric_id == MetricDefinition.id)\
+     .where(*window.predicates())\
+     .order_by(User.department_id, MetricRecord.recorded_date, MetricRecord.id)
+
+
+def _record_chunks(db: Session, window: TimeWindow, chunk_rows: int):
+    result = db.execute(snapshot_query(window).execution_options(stream_results=True, yield_per=chunk_rows))
+    for chunk in result.partitions():
+        yield [
+            ((row.department_id, _month_label(row.recorded_date)), (
+                row.id, row.user_id, row.employee_id, row.metric_id, row.metric_name,
+                row.metric_type.value, row.unit, row.value_numeric, row.value_text,
+                json.dumps(row.value_json) if row.value_json is not None else None,
+                row.recorded_at, row.recorded_date,
+            ))
+            for row in chunk
+        ]
+
+
+def _archived_chunks(db: Session, window: TimeWindow, before: date):
+    # The window's months before `before` from metric_record_archives, one archive row
+    # (a user's month) per chunk, in (department, month) order like snapshot_query
+    if before is None or (window.start and window.start >= before):
+        return
+    definitions = {row.id: row for row in db.execute(
+        select(MetricDefinition.id, MetricDefinition.metric_name, MetricDefinition.unit))}
+    statement = select(
+        User.department_id,
+        User.employee_id,
+        MetricRecordArchive.user_id,
+        MetricRecordArchive.month,
+        MetricRecordArchive.payload,
+    ).join(User, User.id == MetricRecordArchive.user_id)\
+     .where(MetricRecordArchive.month < min(window.end, before))\
+     .order_by(User.department_id, MetricRecordArchive.month, MetricRecordArchive.user_id, MetricRecordArchive.id)
+    if window.start:
+        statement = statement.where(MetricRecordArchive.month >= window.start)
+    for row in db.execute(statement.execution_options(stream_results=True, yield_per=ARCHIVE_FETCH_ROWS)):
+        key = (row.department_id, _month_label(row.month))
+        yield [
+            (key, (
+                record["id"], row.user_id, row.employee_id, record["metric_id"],
+                definitions[record["metric_id"]].metric_name, MetricTypeEnum[record["metric_type"]].value,
+                definitions[record["metric_id"]].unit, record["value_numeric"], record["value_text"],
+                json.dumps(record["value_json"]) if record["value_json"] is not None else None,
+                datetime.fromisoformat(record["recorded_at"]), date.fromisoformat(record["recorded_date"]),
+            ))
+            for record in decode_records(row.payload)
+            if record["metric_id"] in definitions  # as snapshot_query's join
+        ]
+
+
+class _PartitionWriter:
+    def __init__(self, root: str):
+        self.root = root
+        self.key = None
+        self.writer = None
+        self.path = None
+        self.files = 0
+        self.bytes = 0
+        self.parts = {}  # key -> files written for it in this run
+
+    def write(self, key, rows: list):
+        if key != self.key:
+            self.close()
+            department_id, month = key
+            directory = os.path.join(
+                self.root,
+                f"department_id={NULL_PARTITION if department_id is None else department_id}",
+                f"month={month}",
+            )
+            os.makedirs(directory, exist_ok=True)
+            part = self.parts.get(key, 0)
+            self.parts[key] = part + 1
+            self.key = key
+            self.path = os.path.join(directory, f"part-{part}.parquet")
+            self.writer = pq.ParquetWriter(self.path + ".tmp", SCHEMA, compression="zstd")
+        columns = list(zip(*rows))
+        self.writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)],
+            schema=SCHEMA,
+        ))
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        os.replace(self.path + ".tmp", self.path)
+        self.files += 1
+        self.bytes += os.path.getsize(self.path)
+        self.writer = None
+        self.key = None
+
+
+def export_metric_snapshot(db: Session, root: str, since: str = None, incremental: bool = False,
+                           chunk_rows: int = PARQUET_EXPORT_CHUNK_ROWS) -> dict:
+    """Write complete months of metric_records to a partitioned Parquet snapshot.
+
+    since ("YYYY-MM") limits the export to that month onwards. incremental starts after
+    the manifest's exported_through month instead. Archived months are read from
+    metric_record_archives, so rewriting them keeps their records. Rows are read
+    chunk_rows at a time from a server-side cursor and written as one row group per
+    chunk. Returns the row count, files, bytes written and rows per second.
+    """
+    manifest = read_manifest(root)
+    end = datetime.now(timezone.utc).date().replace(day=1)
+    start = _parse_month(since) if since else None
+    if incremental and manifest.get("exported_through"):
+        start = max(start or date.min, first_of_next_month(_parse_month(manifest["exported_through"])))
+
+    report = {"rows": 0, "files": 0, "bytes": 0, "seconds": 0.0, "rows_per_second": 0.0,
+              "from_month": _month_label(start) if start else None,
+              "exported_through": _month_label(end - timedelta(days=1))}
+    if start and start >= end:
+        report["exported_through"] = manifest.get("exported_through")
+        return report
+
+    window = TimeWindow(start, end)
+    started = time.perf_counter()
+    os.makedirs(root, exist_ok=True)
+    _remove_months(root, window)
+
+    writer = _PartitionWriter(root)
+    try:
+        chunks = itertools.chain(_archived_chunks(db, window, archived_before(db)),
+                                 _record_chunks(db, window, chunk_rows))
+        for chunk in chunks:
+            # A chunk can span partitions; cut it wherever (department, month) changes
+            batch, batch_key = [], None
+            for key, values in chunk:
+                if key != batch_key and batch:
+                    writer.write(batch_key, batch)
+                    batch = []
+                batch_key = key
+                batch.append(values)
+            if batch:
+                writer.write(batch_key, batch)
+            report["rows"] += len(chunk)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    report.update({
+        "files": writer.files,
+        "bytes": writer.bytes,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(report["rows"] / elapsed, 1) if elapsed else 0.0,
+    })
+    # exported_through means every month up to it is in the snapshot; it only advances
+    # when this run continued from it (or covered everything) without leaving a gap
+    previous = manifest.get("exported_through")
+    if start is None or (previous and start <= first_of_next_month(_parse_month(previous))):
+        manifest["exported_through"] = report["exported_through"]
+    manifest["last_run"] = {**report, "finished_at": datetime.now(timezone.utc).isoformat()}
+    _write_manifest(root, manifest)
+    return report
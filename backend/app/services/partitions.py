@@ -0,0 +1,192 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import METRIC_PARTITION_LOCK_TIMEOUT_MS, METRIC_PARTITION_RETENTION_MONTHS, METRIC_PARTITIONS_AHEAD
+from app.utils.time_window import first_of_next_month
+
+# metric_records is range-partitioned by recorded_date, one partition per calendar month:
+#
+#   metric_records_y2024m06   FOR VALUES FROM ('2024-06-01') TO ('2024-07-01')
+#   metric_records_default    DEFAULT (rows of months without a partition of their own)
+#
+# ensure_partitions() keeps METRIC_PARTITIONS_AHEAD months ahead of the current one in
+# place and splits months that collected rows in the default partition (submissions
+# dated before or after the partitioned months) out into partitions of their own.
+# detach_partitions() detaches months older than the retention period; a detached
+# partition stays as a plain table, so its rows leave the application's queries but
+# are not deleted.
+PARENT = "metric_records"
+DEFAULT_PARTITION = "metric_records_default"
+
+# First key of the pg_advisory_xact_lock(int, int) serializing maintenance runs
+PARTITION_LOCK_CLASS = 7302
+
+_BOUNDS = re.compile(r"FOR VALUES FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: Optional[date]  # None for the default partition
+    end: Optional[date]
+
+    @property
+    def default(self) -> bool:
+        return self.start is None
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(db: Session) -> bool:
+    # False before the partitioning migration has run
+    return db.scalar(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+                     {"name": PARENT}) == "p"
+
+
+def list_partitions(db: Session) -> list:
+    rows = db.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = CAST(:name AS regclass)
+    """), {"name": PARENT}).all()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUNDS.fullmatch(bound)
+        if match:
+            partitions.append(Partition(name, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))))
+        else:
+            partitions.append(Partition(name, None, None))
+    return sorted(partitions, key=lambda partition: (partition.start is not None, partition.start))
+
+
+def _prepare(db: Session):
+    db.execute(text("SELECT pg_advisory_xact_lock(:lock_class, 0)"), {"lock_class": PARTITION_LOCK_CLASS})
+    # DDL on the parent queues behind running queries and blocks every query behind it;
+    # give up instead of stalling the API
+    db.execute(text(f"SET LOCAL lock_timeout = {int(METRIC_PARTITION_LOCK_TIMEOUT_MS)}"))
+
+
+def create_month_partition(db: Session, month: date, has_default: bool = True) -> str:
+    """Create and attach the partition of one month; the caller owns the transaction.
+
+    The table is created on its own and attached afterwards, which only needs a SHARE
+    UPDATE EXCLUSIVE lock on metric_records (CREATE TABLE ... PARTITION OF needs an
+    exclusive one). Rows of that month waiting in the default partition are moved in
+    first, and a matching check constraint lets ATTACH skip validating the new table.
+    """
+    start, end = month, first_of_next_month(month)
+    name = partition_name(month)
+    bounds = {"start": start, "end": end}
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        ALTER TABLE {name} ADD CONSTRAINT {name}_bounds
+        CHECK (recorded_date >= DATE '{start.isoformat()}' AND recorded_date < DATE '{end.isoformat()}')
+    """))
+    if has_default:
+        db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE recorded_date >= :start AND recorded_date < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), bounds)
+    db.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+    return name
+
+
+def retention_cutoff(today: date, retain_months: int) -> Optional[date]:
+    """First month kept when the current and the retain_months previous months are kept."""
+    if not retain_months:
+        return None
+    return add_months(today.replace(day=1), -retain_months)
+
+
+def _month_range(first: date, last: date) -> list:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def ensure_partitions(db: Session, today: date = None, ahead: int = METRIC_PARTITIONS_AHEAD,
+                      retain_months: int = METRIC_PARTITION_RETENTION_MONTHS) -> list:
+    """Create the missing monthly partitions and return their names.
+
+    Months are kept contiguous from the oldest partitioned (or defaulted) month to
+    `ahead` months after the current one, so any window inside that range prunes the
+    default partition too. Months with rows in the default partition get a partition
+    and their rows are moved into it, except months before the retention cutoff. The
+    caller owns the transaction; does nothing while metric_records is not partitioned.
+    """
+    if not is_partitioned(db):
+        return []
+    _prepare(db)
+    today = today or datetime.now(timezone.utc).date()
+    existing = list_partitions(db)
+    covered = {partition.start for partition in existing if not partition.default}
+    has_default = any(partition.default for partition in existing)
+    defaulted = set()
+    if has_default:
+        defaulted = set(db.scalars(text(
+            f"SELECT DISTINCT CAST(date_trunc('month', recorded_date) AS date) FROM {DEFAULT_PARTITION}"
+        )))
+
+    current = today.replace(day=1)
+    first = min(covered | defaulted | {current})
+    last = max(defaulted | {add_months(current, ahead)})
+    cutoff = retention_cutoff(today, retain_months)
+    if cutoff:
+        first = max(first, cutoff)
+    return [
+        create_month_partition(db, month, has_default)
+        for month in _month_range(first, last)
+        if month not in covered
+    ]
+
+
+def missing_partitions(db: Session, today: date = None, ahead: int = METRIC_PARTITIONS_AHEAD) -> list:
+    """Months from the current one to `ahead` months after it without a partition of their own.
+
+    Reads the catalog only (no lock, no DDL), so every worker can run it at startup;
+    ensure_partitions() is what creates them.
+    """
+    if not is_partitioned(db):
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    covered = {partition.start for partition in list_partitions(db) if not partition.default}
+    current = today.replace(day=1)
+    return [month for month in _month_range(current, add_months(current, ahead)) if month not in covered]
+
+
+def detach_partitions(db: Session, before: date) -> list:
+    """Detach the monthly partitions that end on or before `before`. Returns their names.
+
+    The caller owns the transaction. Detached tables keep their rows and can be
+    archived, dropped or attached again by hand.
+    """
+    if not is_partitioned(db):
+        return []
+    _prepare(db)
+    detached = []
+    for partition in list_partitions(db):
+        if not partition.default and partition.end <= before:
+            db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {partition.name}"))
+            detached.append(partition.name)
+    return detached
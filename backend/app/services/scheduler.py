@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.orm import Session
+from app.config import SCHEDULER_JOB_TIMEOUT_SECONDS, SCHEDULER_LEADER_RETRY_SECONDS, SCHEDULER_MAX_WORKERS
+from app.config import SCHEDULER_RUN_HISTORY_DAYS
+from app.database import DedicatedConnection, SessionLocal
+from app.models.models import JobRun
+
+logger = logging.getLogger(__name__)
+
+# Periodic maintenance inside the API process. Every worker starts the scheduler, but
+# jobs only run on the leader: the worker whose dedicated connection holds the
+# session-level advisory lock below. When the leader exits or loses its connection,
+# Postgres releases the lock and another worker takes over within
+# SCHEDULER_LEADER_RETRY_SECONDS.
+#
+# Each job is a plain function taking a Session. It runs on the scheduler's own thread
+# pool (neither the event loop nor the threadpool serving sync routes) and is given up
+# after its timeout; statement_timeout on its connection makes Postgres cancel whatever
+# it was still running. Every run is recorded in job_runs.
+SCHEDULER_LOCK_CLASS = 7303
+
+FAILED_STATUSES = ("failed", "timed_out")
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f"every {self.seconds:g}s"
+
+
+def _parse_cron_field(value: str, low: int, high: int) -> set:
+    values = set()
+    for part in value.split(","):
+        span, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if span == "*":
+            first, last = low, high
+        elif "-" in span:
+            first, last = (int(bound) for bound in span.split("-", 1))
+        else:
+            first = last = int(span)
+            if step != 1:
+                last = high
+        if step < 1 or first < low or last > high or first > last:
+            raise ValueError(f"invalid cron field {value!r}")
+        values.update(range(first, last + 1, step))
+    return values
+
+
+class CronTrigger:
+    """Standard five-field cron expression (minute hour day month weekday), in UTC.
+
+    Fields accept *, numbers, ranges (1-5), lists (1,15) and steps (*/10, 0-30/5);
+    weekday 0 and 7 are Sunday. As in cron, when both day and weekday are restricted
+    a day matching either fires.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_cron_field(fields[4], 0, 7)}
+        self._either_day = fields[2] != "*" and fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self._either_day else (day and weekday)
+
+    def next_after(self, moment: datetime) -> datetime:
+        moment = moment.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Skips whole months, days and hours, so even "0 0 29 2 *" takes a few hundred steps
+        limit = moment + timedelta(days=8 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron expression never fires: {self.expression!r}")
+
+    def __str__(self):
+        return f"cron {self.expression}"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable  # func(db: Session); commits its own work
+    trigger: object  # IntervalTrigger or CronTrigger
+    timeout: float = SCHEDULER_JOB_TIMEOUT_SECONDS
+
+
+def _record_start(name: str, worker: str) -> int:
+    db = SessionLocal()
+    try:
+        run = JobRun(job_name=name, status="running", started_at=datetime.now(timezone.utc), worker=worker)
+        db.add(run)
+        db.commit()
+        return run.id
+    finally:
+        db.close()
+
+
+def _record_finish(run_id: int, status: str, error: Optional[str], duration_ms: float):
+    db = SessionLocal()
+    try:
+        # A run given up on timeout stays timed_out when its thread finishes later
+        db.execute(update(JobRun).where(JobRun.id == run_id, JobRun.status == "running").values(
+            status=status, error=error, duration_ms=duration_ms, finished_at=datetime.now(timezone.utc),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+# The scheduler's dedicated connection: connected (this worker leads) once it holds the
+# session-level advisory lock, which Postgres releases when the connection goes away.
+class LeaderLock(DedicatedConnection):
+    name = "Scheduler leader connection"
+
+    def __init__(self, lock_key: int, worker: str, retry_seconds: float):
+        super().__init__(retry_seconds)
+        self.lock_key = lock_key
+        self.worker = worker
+
+    async def on_connect(self, connection):
+        while not await connection.fetchval("SELECT pg_try_advisory_lock($1, $2)",
+                                            SCHEDULER_LOCK_CLASS, self.lock_key):
+            await asyncio.sleep(self.retry_seconds)
+        logger.info("Scheduler leader is %s", self.worker)
+
+
+class Scheduler:
+    def __init__(self, lock_key: int = 0, max_workers: int = SCHEDULER_MAX_WORKERS,
+                 leader_retry_seconds: float = SCHEDULER_LEADER_RETRY_SECONDS):
+        self.lock_key = lock_key
+        self.max_workers = max_workers
+        self.leader_retry_seconds = leader_retry_seconds
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs = {}
+        self.next_runs = {}
+        self.leader = LeaderLock(lock_key, self.worker, leader_retry_seconds)
+        self._executor = None
+        self._running = {}  # job name -> concurrent.futures.Future of its current run
+        self._tasks = []
+
+    def add_job(self, name: str, func: Callable, trigger, timeout: float = None):
+        """Register (or replace) a job; jobs added after start() run from the next start."""
+        self.jobs[name] = Job(name, func, trigger, timeout or SCHEDULER_JOB_TIMEOUT_SECONDS)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader.connected.is_set()
+
+    def _call(self, job: Job):
+        db = SessionLocal()
+        try:
+            db.execute(text(f"SET statement_timeout = {max(int(job.timeout * 1000), 1)}"))
+            db.commit()
+            job.func(db)
+        finally:
+            try:
+                db.rollback()
+                db.execute(text("RESET statement_timeout"))
+                db.commit()
+            finally:
+                db.close()
+
+    async def run_job(self, job: Job) -> str:
+        """Run a job now on this worker and record it; returns the run's status."""
+        previous = self._running.get(job.name)
+        if previous is not None and not previous.done():
+            logger.warning("Skipping job %s: its previous run has not finished", job.name)
+            return "skipped"
+        run_id = await asyncio.to_thread(_record_start, job.name, self.worker)
+        started = time.perf_counter()
+        future = self._executor.submit(self._call, job)
+        self._running[job.name] = future
+        waiter = asyncio.wrap_future(future)
+        status, error = "succeeded", None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), job.timeout)
+        except asyncio.TimeoutError:
+            status, error = "timed_out", f"did not finish within {job.timeout:g}s"
+            waiter.add_done_callback(lambda done: logger.warning(
+                "Job %s ended after timing out: %r", job.name, done.cancelled() or done.exception()
+            ))
+        except Exception as exc:
+            status, error = "failed", "".join(traceback.format_exception_only(exc)).strip()
+        duration_ms = (time.perf_counter() - started) * 1000
+        if status != "succeeded":
+            logger.warning("Job %s %s after %.0f ms: %s", job.name, status, duration_ms, error)
+        await asyncio.to_thread(_record_finish, run_id, status, error, duration_ms)
+        return status
+
+    async def _schedule(self, job: Job):
+        while True:
+            now = datetime.now(timezone.utc)
+            self.next_runs[job.name] = job.trigger.next_after(now)
+            await asyncio.sleep((self.next_runs[job.name] - now).total_seconds())
+            if self.is_leader:
+                try:
+                    await self.run_job(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:  # recording the run failed; keep the schedule
+                    logger.warning("Could not run job %s: %s", job.name, error)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="scheduler")
+        loop = asyncio.get_running_loop()
+        self.leader.start()
+        self._tasks = [loop.create_task(self._schedule(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        await self.leader.stop()  # closing the connection releases the lock
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.next_runs = {}
+        if self._executor is not None:
+            # Running jobs are not waited for; their statement_timeout still applies
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "worker": self.worker,
+            "leader": self.is_leader,
+            "jobs": [
+                {"name": job.name, "trigger": str(job.trigger), "timeout_seconds": job.timeout,
+                 "next_run": self.next_runs.get(job.name),
+                 "running": job.name in self._running and not self._running[job.name].done()}
+                for job in self.jobs.values()
+            ],
+        }
+
+
+def job_run_summary(db: Session) -> dict:
+    """Runs, failures and durations of every job that ran within the history, by job."""
+    failed = JobRun.status.in_(FAILED_STATUSES)
+    rows = db.execute(select(
+        JobRun.job_name,
+        func.count(),
+        func.count().filter(failed),
+        func.avg(JobRun.duration_ms),
+        func.max(JobRun.duration_ms),
+        func.max(JobRun.started_at),
+        func.max(JobRun.started_at).filter(failed),
+    ).group_by(JobRun.job_name)).all()
+    return {
+        name: {"runs": runs, "failures": failures,
+               "avg_duration_ms": round(average, 1) if average is not None else None,
+               "max_duration_ms": round(longest, 1) if longest is not None else None,
+               "last_started_at": last_started, "last_failed_at": last_failed}
+        for name, runs, failures, average, longest, last_started, last_failed in rows
+    }
+
+
+def list_job_runs(db: Session, job: str = None, failed_only: bool = False, limit: int = 50) -> list:
+    statement = select(JobRun).order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit)
+    if job:
+        statement = statement.where(JobRun.job_name == job)
+    if failed_only:
+        statement = statement.where(JobRun.status.in_(FAILED_STATUSES))
+    return db.scalars(statement).all()
+
+
+def prune_job_runs(db: Session, days: int = SCHEDULER_RUN_HISTORY_DAYS):
+    db.execute(delete(JobRun).where(JobRun.started_at < datetime.now(timezone.utc) - timedelta(days=days)))
+    db.commit()
+
+
+scheduler = Scheduler()
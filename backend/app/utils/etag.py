@@ -0,0 +1,58 @@
+import hashlib
+from typing import Any, Callable
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.utils.serialization import fast_json_response, model_json_response
+
+# Cache-Control for the conditional endpoints. Per-user payloads stay in the browser
+# cache only and are revalidated on every use (a 304 costs no serialization); the
+# catalog may be reused for a minute, since a catalog change is rare and not urgent.
+CACHE_PRIVATE_REVALIDATE = "private, no-cache"
+CACHE_PRIVATE_CATALOG = "private, max-age=60"
+CACHE_PUBLIC_REFERENCE = "public, max-age=300"
+
+
+def make_etag(*parts) -> str:
+    """A strong ETag derived from the versions the response was built from."""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2), so a W/ prefix is ignored
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def table_version(db: Session, table_name: str) -> str:
+    # xmin is the id of the transaction that wrote a row, so it changes on every insert
+    # and update; aggregating it with the ids also catches deletes. Only meant for
+    # small reference tables.
+    return db.scalar(text(
+        f"SELECT md5(coalesce(string_agg(id::text || ':' || xmin::text, ',' ORDER BY id), '')) FROM {table_name}"
+    ))
+
+
+def conditional_json(request: Request, etag: str, cache_control: str, build: Callable[[], Any],
+                     response_type: Any = None) -> Response:
+    """Answer 304 when the client already has etag; otherwise build and encode the body.
+
+    build() only runs for a 200. With response_type the result is validated and filtered
+    against it (e.g. ORM objects); without it, it is encoded as is.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if cache_control.startswith("private"):
+        headers["Vary"] = "Authorization"
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if response_type is not None:
+        response = model_json_response(response_type, build())
+    else:
+        response = fast_json_response(build())
+    response.headers.update(headers)
+    return response
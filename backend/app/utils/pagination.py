@@ -0,0 +1,27 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+
+
+# Cursors are opaque to clients: the sort key of the last row of a page, JSON-encoded
+# and base64url'd. The next page is read with a row-value comparison on that key
+# (WHERE (recorded_at, id) < (:recorded_at, :id)), so every page costs the same
+# however deep it is, unlike OFFSET.
+def encode_cursor(*values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    # types gives the expected type of each key part, e.g. (datetime, int)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("wrong number of key parts")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, payload)
+        )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from e
@@ -1,9 +1,17 @@
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS
+from app.config import REFRESH_TOKEN_EXPIRE_MINUTES
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds makes needs_update() report hashes created with a lower cost factor,
+# so they are upgraded transparently the next time the user logs in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 
 
 # Generate a password hash for a given plain password.
@@ -15,6 +23,11 @@ def get_password_hash(password: str) -> str:
 # This is useful for user authentication in web applications.
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+# Verifies a password and, when the stored hash uses outdated parameters, returns a
+# replacement hash computed with the current ones (otherwise None).
+# Both steps happen in a single call so a login pays for one bcrypt verification.
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
 # This function creates a JWT access token for a given user.
 # It takes a dictionary of user data and an optional expiration time.
 # The token is signed with a secret key and an algorithm (HS256).
@@ -28,12 +41,27 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# Refresh tokens are long-lived and only accepted by POST /api/v1/auth/refresh,
+# which trades them for a new short-lived access token.
+def create_refresh_token(data: dict, expires_delta: timedelta = None):
+    to_encode = {"sub": data["sub"], "user_id": data["user_id"], "ver": data["ver"]}
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "type": "refresh"})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# Claims embedded in every access token. Carrying department_id and role_id lets
+# routes authorize from the token alone; "ver" must match users.token_version,
+# so bumping the version revokes every token issued before the change.
+def build_token_claims(user) -> dict:
+    return {
+        "sub": user.username,
+        "role": user.role.value,
+        "user_id": user.id,
+        "department_id": user.department_id,
+        "role_id": user.role_id,
+        "ver": user.token_version,
+    }
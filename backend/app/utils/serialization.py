@@ -0,0 +1,43 @@
+from functools import lru_cache
+from typing import Any
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+
+# One TypeAdapter per response type, built on first use. Building an adapter compiles
+# its validator and serializer, which costs far more than using it.
+@lru_cache(maxsize=None)
+def type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def validate_response(response_type: Any, content: Any) -> Any:
+    """Validate content (dicts, ORM objects or result rows) against response_type once."""
+    return type_adapter(response_type).validate_python(content, from_attributes=True)
+
+
+def fast_json_response(content: Any, response_type: Any = None) -> ORJSONResponse:
+    """Validate content built from result rows once and encode it directly with orjson.
+
+    Returning a Response skips FastAPI's response_model handling, which would validate
+    every row and then run it through jsonable_encoder before json.dumps. Instead the
+    content is checked against response_type (normally the route's response_model)
+    with its cached adapter, and the content itself is what orjson writes (dates,
+    datetimes and enums included), so it must already have the model's fields. Without
+    a response_type, for routes that declare no response_model, nothing is checked.
+    """
+    if response_type is not None:
+        validate_response(response_type, content)
+    return ORJSONResponse(content)
+
+
+def model_json_response(response_type: Any, content: Any) -> Response:
+    """Validate content against response_type once and encode it with the same adapter.
+
+    For content that still needs response_model's conversion and field filtering, such
+    as ORM objects, without FastAPI's second validation pass.
+    """
+    adapter = type_adapter(response_type)
+    return Response(adapter.dump_json(adapter.validate_python(content, from_attributes=True)),
+                    media_type="application/json")
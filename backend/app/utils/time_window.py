@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import extract, false
+from app.models.models import MetricRecord
+
+
+def first_of_next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """A half-open [start, end) range of UTC calendar days.
+
+    Either bound may be open (None). month_of_year restricts the window to one month
+    of every year, for the month-without-year query parameter that has no single range.
+    predicates() renders the window against a date column (metric_records.recorded_date
+    by default, or the day/month column of a rollup table) as plain >= / < comparisons,
+    so Postgres can answer it from the (user_id, recorded_date)-style indexes.
+    """
+    start: Optional[date] = None
+    end: Optional[date] = None
+    month_of_year: Optional[int] = None
+    empty: bool = False
+
+    @classmethod
+    def day(cls, day: date) -> "TimeWindow":
+        return cls(day, day + timedelta(days=1))
+
+    @classmethod
+    def iso_week(cls, year: int, week: int) -> "TimeWindow":
+        monday = date.fromisocalendar(year, week, 1)
+        return cls(monday, monday + timedelta(days=7))
+
+    @classmethod
+    def month(cls, year: int, month: int) -> "TimeWindow":
+        first_day = date(year, month, 1)
+        return cls(first_day, first_of_next_month(first_day))
+
+    @classmethod
+    def quarter(cls, year: int, quarter: int) -> "TimeWindow":
+        if not 1 <= quarter <= 4:
+            raise ValueError("quarter must be in 1..4")
+        first_day = date(year, 3 * quarter - 2, 1)
+        return cls(first_day, date(year + quarter // 4, (3 * quarter) % 12 + 1, 1))
+
+    @classmethod
+    def year(cls, year: int) -> "TimeWindow":
+        return cls(date(year, 1, 1), date(year + 1, 1, 1))
+
+    @classmethod
+    def between(cls, start_date: date = None, end_date: date = None) -> "TimeWindow":
+        """Inclusive start_date/end_date, as the routes' query parameters are."""
+        return cls(start_date, end_date + timedelta(days=1) if end_date else None)
+
+    @classmethod
+    def from_params(cls, start_date: date = None, end_date: date = None,
+                    month: int = None, year: int = None) -> "TimeWindow":
+        """The window selected by the start_date/end_date/month/year query parameters."""
+        window = cls.between(start_date, end_date)
+        if month is not None and not 1 <= month <= 12:
+            return cls(empty=True)
+        if year and month:
+            return window.intersect(cls.month(year, month))
+        if year:
+            return window.intersect(cls.year(year))
+        if month:
+            return window.intersect(cls(month_of_year=month))
+        return window
+
+    def intersect(self, other: "TimeWindow") -> "TimeWindow":
+        if self.empty or other.empty:
+            return TimeWindow(empty=True)
+        if self.month_of_year and other.month_of_year and self.month_of_year != other.month_of_year:
+            return TimeWindow(empty=True)
+        starts = [bound for bound in (self.start, other.start) if bound]
+        ends = [bound for bound in (self.end, other.end) if bound]
+        start = max(starts) if starts else None
+        end = min(ends) if ends else None
+        if start and end and start >= end:
+            return TimeWindow(empty=True)
+        return TimeWindow(start, end, self.month_of_year or other.month_of_year)
+
+    @property
+    def month_aligned(self) -> bool:
+        """True when whole months cover the window, so the monthly rollups can answer it."""
+        return all(bound is None or bound.day == 1 for bound in (self.start, self.end))
+
+    def predicates(self, column=None) -> list:
+        if column is None:
+            column = MetricRecord.recorded_date
+        if self.empty:
+            return [false()]
+        predicates = []
+        if self.start:
+            predicates.append(column >= self.start)
+        if self.end:
+            predicates.append(column < self.end)
+        if self.month_of_year:
+            predicates.append(extract("month", column) == self.month_of_year)
+        return predicates
+
+
+_WINDOW_FORMATS = [
+    (re.compile(r"(\d{4})-(\d{2})-(\d{2})"), lambda y, m, d: TimeWindow.day(date(int(y), int(m), int(d)))),
+    (re.compile(r"(\d{4})-W(\d{2})"), lambda y, w: TimeWindow.iso_week(int(y), int(w))),
+    (re.compile(r"(\d{4})-Q(\d)"), lambda y, q: TimeWindow.quarter(int(y), int(q))),
+    (re.compile(r"(\d{4})-(\d{2})"), lambda y, m: TimeWindow.month(int(y), int(m))),
+    (re.compile(r"(\d{4})"), lambda y: TimeWindow.year(int(y))),
+]
+
+
+def parse_time_window(value: str) -> TimeWindow:
+    """Parse YYYY-MM-DD, YYYY-Www (ISO week), YYYY-MM, YYYY-Qn, YYYY or START..END.
+
+    START..END are inclusive YYYY-MM-DD dates. Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if ".." in value:
+        start, _, end = value.partition("..")
+        start_date, end_date = date.fromisoformat(start), date.fromisoformat(end)
+        if end_date < start_date:
+            raise ValueError("range end is before its start")
+        return TimeWindow.between(start_date, end_date)
+    for pattern, build in _WINDOW_FORMATS:
+        match = pattern.fullmatch(value)
+        if match:
+            return build(*match.groups())
+    raise ValueError("Use YYYY-MM-DD, YYYY-Www, YYYY-MM, YYYY-Qn, YYYY or YYYY-MM-DD..YYYY-MM-DD")
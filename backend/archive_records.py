@@ -0,0 +1,52 @@
+"""Move raw metric_records of old months into the compressed metric_record_archives table.
+
+The API's scheduler runs this nightly as the archive_records job; run it by hand or
+from cron when SCHEDULER_ENABLED=false. Months before the current one and
+its --after-months predecessors are archived whole, in transactions of about
+--batch-rows records; an interrupted run is continued by simply running it again.
+Rollups of archived months are kept, so dashboards and monthly trends still cover
+them, but their records can no longer be listed, exported or submitted. The emptied
+monthly partitions can then be detached with maintain_partitions.py --retain-months.
+
+    python archive_records.py --after-months 13 --batch-rows 5000
+"""
+import argparse
+from datetime import datetime, timezone
+from app.config import METRIC_ARCHIVE_AFTER_MONTHS, METRIC_ARCHIVE_BATCH_ROWS
+from app.database import SessionLocal, engine
+from app.services.archive import archive_records
+from app.services.partitions import retention_cutoff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--after-months", type=int, default=METRIC_ARCHIVE_AFTER_MONTHS,
+                        help="previous months to keep as raw records; 0 disables archival")
+    parser.add_argument("--batch-rows", type=int, default=METRIC_ARCHIVE_BATCH_ROWS,
+                        help="records moved per transaction")
+    parser.add_argument("--max-batches", type=int, default=None,
+                        help="stop after this many batches (the next run continues)")
+    args = parser.parse_args()
+
+    before = retention_cutoff(datetime.now(timezone.utc).date(), args.after_months)
+    if not before:
+        print("Archival is disabled (--after-months 0)")
+        return
+
+    db = SessionLocal()
+    try:
+        report = archive_records(db, before, batch_rows=args.batch_rows, max_batches=args.max_batches)
+    finally:
+        db.close()
+        engine.dispose()
+
+    for month, count in sorted(report.months.items()):
+        print(f"✔️ Archived {count} records of {month:%Y-%m}")
+    if report.complete:
+        print(f"✅ Records before {before} are archived ({report.records} moved in {report.batches} batches)")
+    else:
+        print(f"✅ Stopped after {report.batches} batches ({report.records} records); run again to continue")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+import math
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Small helpers shared by the benchmark scripts in this folder.
+# They only use the standard library so they can run from any machine that can
+# reach the API, without installing the backend requirements.
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(name, latencies, elapsed, errors=0):
+    count = len(latencies)
+    return {
+        "name": name,
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_report(results):
+    for result in results:
+        print(json.dumps(result))
+
+
+def http_request(url, data=None, headers=None, form=False):
+    body = None
+    headers = dict(headers or {})
+    if data is not None:
+        if form:
+            body = urllib.parse.urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+    request = urllib.request.Request(url, data=body, headers=headers)
+    with urllib.request.urlopen(request) as response:
+        return response.status, response.read()
+
+
+def login(base_url, username, password):
+    _, body = http_request(
+        f"{base_url}/api/v1/auth/login",
+        data={"username": username, "password": password},
+        form=True,
+    )
+    return json.loads(body)["access_token"]
+
+
+# Runs `func` `total` times with `concurrency` callers in flight and returns
+# (latencies in seconds, error count, wall-clock seconds).
+def run_concurrently(func, total, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            func()
+            return time.perf_counter() - start, None
+        except Exception as exc:
+            return time.perf_counter() - start, exc
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, error in outcomes if error is None]
+    errors = sum(1 for _, error in outcomes if error is not None)
+    return latencies, errors, elapsed
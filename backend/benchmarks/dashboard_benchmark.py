@@ -0,0 +1,75 @@
+"""Concurrent dashboard throughput: sync session vs async session.
+
+Runs the department aggregate query behind GET /api/v1/dashboard/view-aggregate-metrics
+from many concurrent tasks on one event loop, the way uvicorn serves requests:
+
+  sync-in-loop  the previous route: an `async def` handler querying through the sync
+                Session, so every query blocks the event loop until it returns
+  async         the current route: the same statement through the asyncpg AsyncSession
+
+    python benchmarks/dashboard_benchmark.py --department-id 1 --date-filter 2025-04
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine  # noqa: E402
+from app.routes.dashboards import build_aggregated_metrics_query  # noqa: E402
+from common import print_report, summarize  # noqa: E402
+
+
+async def sync_in_loop(statement):
+    db = SessionLocal()
+    try:
+        db.execute(statement).all()
+    finally:
+        db.close()
+
+
+async def async_session(statement):
+    async with AsyncSessionLocal() as db:
+        (await db.execute(statement)).all()
+
+
+async def drive(name, query_func, statement, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await query_func(statement)
+            latencies.append(time.perf_counter() - start)
+
+    # warm up the pool so connection setup is not measured
+    await asyncio.gather(*(query_func(statement) for _ in range(concurrency)))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(f"{name} c={concurrency}", latencies, time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--department-id", type=int, default=1)
+    parser.add_argument("--type", default=None, choices=["PERFORMANCE", "WELLNESS"])
+    parser.add_argument("--date-filter", default=str(time.gmtime().tm_year))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    statement = build_aggregated_metrics_query(args.department_id, args.type, args.date_filter)
+    results = [
+        await drive("sync-in-loop", sync_in_loop, statement, args.requests, args.concurrency),
+        await drive("async", async_session, statement, args.requests, args.concurrency),
+    ]
+    print_report(results)
+    engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
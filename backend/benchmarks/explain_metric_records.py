@@ -0,0 +1,137 @@
+"""Before/after EXPLAIN ANALYZE for metric_records date filters on synthetic data.
+
+Builds two scratch tables with the same synthetic rows (default 10M):
+
+  explain_metric_records_before  original layout: primary key only, routes filtered
+                                 with cast(recorded_at, Date) / extract(...)
+  explain_metric_records_after   stored recorded_date column with the
+                                 (user_id, recorded_date) and (metric_id, recorded_date)
+                                 indexes, filtered with half-open ranges
+
+and prints the plans of the filters used by the metrics, metric-records and dashboard
+routes against each. Uses DATABASE_URL; the application tables are not touched.
+
+    python benchmarks/explain_metric_records.py --rows 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text  # noqa: E402
+from app.database import create_db_engine  # noqa: E402
+
+BEFORE = "explain_metric_records_before"
+AFTER = "explain_metric_records_after"
+
+# (label, query on the old layout, query on the new layout)
+QUERIES = [
+    (
+        "employee history for one month (my-metrics?month=&year=)",
+        f"""SELECT id, metric_id, value_numeric, recorded_at FROM {BEFORE}
+            WHERE user_id = :user_id
+              AND extract(month FROM recorded_at) = 6 AND extract(year FROM recorded_at) = 2024""",
+        f"""SELECT id, metric_id, value_numeric, recorded_at FROM {AFTER}
+            WHERE user_id = :user_id
+              AND recorded_date >= DATE '2024-06-01' AND recorded_date < DATE '2024-07-01'""",
+    ),
+    (
+        "one metric over a date range (start_date/end_date)",
+        f"""SELECT count(*), avg(value_numeric) FROM {BEFORE}
+            WHERE metric_id = :metric_id
+              AND CAST(recorded_at AS DATE) >= DATE '2024-03-01'
+              AND CAST(recorded_at AS DATE) <= DATE '2024-03-14'""",
+        f"""SELECT count(*), avg(value_numeric) FROM {AFTER}
+            WHERE metric_id = :metric_id
+              AND recorded_date >= DATE '2024-03-01' AND recorded_date < DATE '2024-03-15'""",
+    ),
+    (
+        "department dashboard for one day (date_filter=YYYY-MM-DD)",
+        f"""SELECT metric_id, sum(value_numeric) FROM {BEFORE}
+            WHERE user_id = ANY(:user_ids) AND DATE(recorded_at) = DATE '2024-09-10'
+            GROUP BY metric_id""",
+        f"""SELECT metric_id, sum(value_numeric) FROM {AFTER}
+            WHERE user_id = ANY(:user_ids) AND recorded_date = DATE '2024-09-10'
+            GROUP BY metric_id""",
+    ),
+]
+
+
+def build_tables(conn, rows, users, metrics, days):
+    conn.execute(text(f"DROP TABLE IF EXISTS {BEFORE}, {AFTER}"))
+    conn.execute(text(f"""
+        CREATE TABLE {BEFORE} (
+            id bigint PRIMARY KEY,
+            user_id integer NOT NULL,
+            metric_id integer NOT NULL,
+            value_numeric double precision,
+            recorded_at timestamptz
+        )"""))
+    conn.execute(text(f"""
+        INSERT INTO {BEFORE}
+        SELECT g,
+               1 + ((g / :days) % :users),
+               1 + ((g / (:days * :users)) % :metrics),
+               random() * 10,
+               TIMESTAMPTZ '2023-01-01 08:00+00' + (g % :days) * INTERVAL '1 day'
+        FROM generate_series(1, :rows) AS g"""),
+        {"rows": rows, "users": users, "metrics": metrics, "days": days})
+    conn.execute(text(f"""
+        CREATE TABLE {AFTER} (
+            id bigint PRIMARY KEY,
+            user_id integer NOT NULL,
+            metric_id integer NOT NULL,
+            value_numeric double precision,
+            recorded_at timestamptz,
+            recorded_date date GENERATED ALWAYS AS ((recorded_at AT TIME ZONE 'UTC')::date) STORED
+        )"""))
+    conn.execute(text(f"""
+        INSERT INTO {AFTER} (id, user_id, metric_id, value_numeric, recorded_at)
+        SELECT id, user_id, metric_id, value_numeric, recorded_at FROM {BEFORE}"""))
+    conn.execute(text(f"CREATE INDEX ON {AFTER} (user_id, recorded_date)"))
+    conn.execute(text(f"CREATE INDEX ON {AFTER} (metric_id, recorded_date)"))
+    conn.execute(text(f"ANALYZE {BEFORE}"))
+    conn.execute(text(f"ANALYZE {AFTER}"))
+
+
+def explain(conn, sql, params):
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).scalars().all()
+    return "\n".join(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--metrics", type=int, default=40)
+    parser.add_argument("--days", type=int, default=2 * 365)
+    parser.add_argument("--reuse", action="store_true", help="skip rebuilding the scratch tables")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tables afterwards")
+    args = parser.parse_args()
+
+    # Building 10M rows takes a while; do not let a configured statement_timeout abort it
+    engine = create_db_engine(statement_timeout_ms=0)
+    params = {"user_id": args.users // 2, "metric_id": 1, "user_ids": list(range(1, 51))}
+    with engine.begin() as conn:
+        if not args.reuse:
+            started = time.perf_counter()
+            build_tables(conn, args.rows, args.users, args.metrics, args.days)
+            print(f"-- built {args.rows} rows per table in {time.perf_counter() - started:.1f}s")
+
+    with engine.connect() as conn:
+        for label, before_sql, after_sql in QUERIES:
+            print(f"\n==== {label}")
+            print("---- before")
+            print(explain(conn, before_sql, params))
+            print("---- after")
+            print(explain(conn, after_sql, params))
+
+    if not args.keep:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {BEFORE}, {AFTER}"))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
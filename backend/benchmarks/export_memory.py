@@ -0,0 +1,126 @@
+"""Peak Python memory of the department export: streamed vs materialized.
+
+Creates a scratch department with synthetic records (default 1M), then exports it
+twice, reporting the tracemalloc peak and the untraced run time:
+
+  materialized  the /department/employee-metrics approach: .all() on the query and
+                one EmployeeMetricWithDate per row, grouped by employee in a dict
+  streamed      the /department/employee-metrics/export generator: server-side
+                cursor, one encoded NDJSON chunk at a time
+
+The scratch department, users, metric and records are removed afterwards. Uses DATABASE_URL.
+
+    python benchmarks/export_memory.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text  # noqa: E402
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine  # noqa: E402
+from app.models.models import Department, DepartmentRoleType, DepartmentType, MetricDefinition  # noqa: E402
+from app.models.models import MetricRecord, MetricTypeEnum, RoleType, User  # noqa: E402
+from app.routes.metric_records import EmployeeMetricWithDate  # noqa: E402
+from app.services.export_service import department_export_query, stream_ndjson  # noqa: E402
+from app.utils.time_window import TimeWindow  # noqa: E402
+
+
+def create_dataset(rows, users):
+    db = SessionLocal()
+    department = Department(name="export benchmark", type=DepartmentType.USPS, description="scratch")
+    db.add(department)
+    db.flush()
+    employees = [
+        User(username=f"export_bench_{i}", email=f"export_bench_{i}@example.com", hashed_password="x",
+             first_name="Bench", last_name=str(i), employee_id=f"XB{i:05d}", role=RoleType.EMPLOYEE,
+             department_role=DepartmentRoleType.USPS_MAIL_CARRIER, department_id=department.id)
+        for i in range(users)
+    ]
+    metric = MetricDefinition(metric_name="export benchmark metric", metric_type=MetricTypeEnum.PERFORMANCE,
+                              department_id=department.id, unit="Count")
+    db.add_all(employees + [metric])
+    db.flush()
+    # One record per employee and day, spread backwards from 2024-12-31
+    db.execute(text("""
+        INSERT INTO metric_records (user_id, metric_id, metric_type, value_numeric, value_text,
+                                    recorded_at, recorded_date)
+        SELECT (:user_ids)[1 + g % :users], :metric_id, 'PERFORMANCE', random() * 100, 'synthetic',
+               at, (at AT TIME ZONE 'UTC')::date
+        FROM generate_series(0, :rows - 1) AS g,
+             LATERAL (SELECT TIMESTAMPTZ '2024-12-31 09:00+00' - (g / :users) * INTERVAL '1 day' AS at) AS t
+    """), {"user_ids": [e.id for e in employees], "users": users, "metric_id": metric.id, "rows": rows})
+    db.commit()
+    ids = (department.id, [e.id for e in employees], metric.id)
+    db.close()
+    return ids
+
+
+def drop_dataset(department_id, user_ids, metric_id):
+    db = SessionLocal()
+    db.query(MetricRecord).filter(MetricRecord.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(MetricDefinition).filter(MetricDefinition.id == metric_id).delete()
+    db.query(Department).filter(Department.id == department_id).delete()
+    db.commit()
+    db.close()
+
+
+async def materialized(statement):
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(statement)).all()
+    grouped = defaultdict(list)
+    for r in rows:
+        grouped[r.employee_id].append(EmployeeMetricWithDate(
+            metric_id=r.metric_id, metric_name=r.metric_name, metric_type=r.metric_type,
+            value_numeric=r.value_numeric, value_text=r.value_text,
+            recorded_at=r.recorded_at.date(), unit=r.unit,
+        ))
+    return sum(len(metrics) for metrics in grouped.values())
+
+
+async def streamed(statement):
+    size = 0
+    async for chunk in stream_ndjson(statement):
+        size += len(chunk)
+    return size
+
+
+async def measure(name, func, statement):
+    # Timed without tracemalloc, which slows allocation-heavy code several times over
+    started = time.perf_counter()
+    await func(statement)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    await func(statement)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<13} peak {peak / 2**20:8.1f} MiB   {elapsed:6.1f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--skip-materialized", action="store_true", help="only run the streamed export")
+    args = parser.parse_args()
+
+    department_id, user_ids, metric_id = create_dataset(args.rows, args.users)
+    try:
+        statement = department_export_query(department_id, TimeWindow())
+        print(f"-- {args.rows} records in {args.users} employees")
+        await measure("streamed", streamed, statement)
+        if not args.skip_materialized:
+            await measure("materialized", materialized, statement)
+    finally:
+        drop_dataset(department_id, user_ids, metric_id)
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
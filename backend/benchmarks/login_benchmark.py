@@ -0,0 +1,41 @@
+"""Login throughput benchmark.
+
+Fires POST /api/v1/auth/login at a running API with a fixed number of concurrent
+clients and reports throughput plus p50/p99 latency.
+
+    uvicorn app.main:app --port 8000
+    python benchmarks/login_benchmark.py --requests 400 --concurrency 16
+
+Compare runs with different BCRYPT_MAX_WORKERS / BCRYPT_ROUNDS settings on the server.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from common import http_request, print_report, run_concurrently, summarize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="patrick")
+    parser.add_argument("--password", default="patrick123")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    def do_login():
+        http_request(
+            f"{args.base_url}/api/v1/auth/login",
+            data={"username": args.username, "password": args.password},
+            form=True,
+        )
+
+    latencies, errors, elapsed = run_concurrently(do_login, args.requests, args.concurrency)
+    result = summarize(f"login c={args.concurrency}", latencies, elapsed, errors)
+    print_report([result])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Response serialization cost of the large list routes: response_model path vs orjson path.
+
+Serves the same synthetic department history (no database needed) through two routes
+of a scratch FastAPI app, shaped like /department/employee-metrics?unpaginated=true:
+
+  response_model  the previous route body: one EmployeeMetricWithDate and
+                  EmployeeWithMetrics per row/employee, returned through
+                  response_model (validated again, jsonable_encoder, json.dumps)
+  orjson          the current body: dicts from the row tuples, returned with
+                  fast_json_response (validated once with the cached adapter,
+                  then encoded by orjson)
+
+and reports the median request time for each size. Both responses are checked to
+decode to the same JSON.
+
+    python benchmarks/serialization.py --rows 1000 10000 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.models.models import MetricTypeEnum  # noqa: E402
+from app.routes.metric_records import EmployeeMetricWithDate, EmployeeWithMetrics  # noqa: E402
+from app.utils.serialization import fast_json_response  # noqa: E402
+
+Row = namedtuple("Row", "id user_id metric_id metric_name metric_type value_numeric value_text recorded_at unit")
+Employee = namedtuple("Employee", "employee_id first_name last_name")
+
+
+def synthetic_rows(count, employees):
+    start = datetime(2024, 12, 31, 9, tzinfo=timezone.utc)
+    metric_types = (MetricTypeEnum.PERFORMANCE, MetricTypeEnum.WELLNESS)
+    return [
+        Row(i, i % employees, 1 + i % 20, f"Metric {1 + i % 20}", metric_types[i % 2], i * 0.5,
+            None if i % 3 else "note", start - timedelta(hours=i), "Count")
+        for i in range(count)
+    ]
+
+
+def build_app(rows, employee_lookup):
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=List[EmployeeWithMetrics])
+    def response_model_route():
+        result = defaultdict(list)
+        for r in rows:
+            result[r.user_id].append(EmployeeMetricWithDate(
+                metric_id=r.metric_id, metric_name=r.metric_name, metric_type=r.metric_type,
+                value_numeric=r.value_numeric, value_text=r.value_text,
+                recorded_at=r.recorded_at.date(), unit=r.unit,
+            ))
+        return [
+            EmployeeWithMetrics(employee_id=employee_lookup[user_id].employee_id,
+                                first_name=employee_lookup[user_id].first_name,
+                                last_name=employee_lookup[user_id].last_name, metrics=metrics)
+            for user_id, metrics in result.items()
+        ]
+
+    @app.get("/orjson", response_model=List[EmployeeWithMetrics])
+    def orjson_route():
+        result = defaultdict(list)
+        for r in rows:
+            result[r.user_id].append({
+                "metric_id": r.metric_id, "metric_name": r.metric_name, "metric_type": r.metric_type,
+                "value_numeric": r.value_numeric, "value_text": r.value_text,
+                "recorded_at": r.recorded_at.date(), "unit": r.unit,
+            })
+        return fast_json_response([
+            {"employee_id": employee_lookup[user_id].employee_id,
+             "first_name": employee_lookup[user_id].first_name,
+             "last_name": employee_lookup[user_id].last_name, "metrics": metrics}
+            for user_id, metrics in result.items()
+        ], List[EmployeeWithMetrics])
+
+    return app
+
+
+def timed(client, path, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--employees", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    employee_lookup = {i: Employee(f"EMP{i:05d}", "First", f"Last{i}") for i in range(args.employees)}
+    print(f"{'rows':>8} {'response_model':>15} {'orjson':>10} {'speedup':>8} {'bytes':>11}")
+    for count in args.rows:
+        client = TestClient(build_app(synthetic_rows(count, args.employees), employee_lookup))
+        slow, slow_response = timed(client, "/response-model", args.repeat)
+        fast, fast_response = timed(client, "/orjson", args.repeat)
+        assert slow_response.json() == fast_response.json()
+        print(f"{count:>8} {slow * 1000:>13.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x "
+              f"{len(fast_response.content):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,5 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.config import DATABASE_URL
 from sqlalchemy.orm import Session
-from app.models.base import SessionLocal
+from app.database import engine, SessionLocal
 #from app.models.models import Department, DepartmentType
 from app.models.models import RoleType, User, Department, DepartmentType, DepartmentRoleType, EmployeeRole
 from app.models.models import MetricDefinition, MetricRecord  # Import all models
@@ -11,10 +8,12 @@ from app.models.base import Base
 import json
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.models.models import MetricDefinition, MetricTypeEnum
+from app.models.models import MetricDefinition, AppMetadata
+from app.services.metric_catalog import sync_catalog
+from app.config import STARTUP_SEED_MODE
+from sqlalchemy import select
+import hashlib
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
 department_role_to_id = {
     "USPS_SUPERVISOR": 5,
     "HEALTHCARE_SUPERVISOR": 6,
@@ -39,57 +38,15 @@ def reset_metric_id_sequence(db: Session):
     """))
     db.commit()
 
-def seed_metric_definitions(db: Session, json_file: str):
-    try:
-        # Load the JSON data
-        with open(json_file, "r") as file:
-            metric_definitions = json.load(file)
-        
-        for metric in metric_definitions:
-            # Convert metric_type to the Enum value
-            metric_type = MetricTypeEnum[metric["metric_type"].upper()]
-            
-            # Check if the metric already exists
-            existing_metric = db.query(MetricDefinition).filter(
-                MetricDefinition.metric_name == metric["metric_name"]
-            ).first()
-            metric_formula = metric.get("metric_formula", None)
-            if not existing_metric:
-                # Create a new MetricDefinition object
-                new_metric = MetricDefinition(
-                    metric_name=metric["metric_name"],
-                    metric_description=metric["metric_description"],
-                    metric_type=metric_type,
-                    department_id=metric["department_id"],
-                    unit=metric["unit"],
-                    metric_formula=metric_formula,
-                    metric_formula_description=metric["metric_formula_description"],
-                    is_aggregated=metric["is_aggregated"],
-                    is_numeric=metric["is_numeric"],
-                    value=metric["value"]
-                )
-                db.add(new_metric)
-                print(f"✅ Added metric: {metric['metric_name']}")
-            else:
-                print(f"⚠️ Metric already exists: {metric['metric_name']}")
-        
-        # Commit the changes
-        db.commit()
-        print("✅ Metric definitions seeded successfully.")
-    except Exception as e:
-        db.rollback()
-        print(f"❌ Error seeding metric definitions: {str(e)}")
-    
-def seed_departments(db: Session):
-    departments_to_seed = [
-        {"name": "US Postal Service", "type": DepartmentType.USPS, "description": "Handles mail delivery"},
-        {"name": "Healthcare", "type": DepartmentType.HEALTHCARE, "description": "Federal health services"}
-    ]
-    print("Departments to seed:")
-    print(departments_to_seed)   # Check the seed data
-    print("Checking department type...")
-    print(Department.__table__.columns['type'].type)
-    for dep in departments_to_seed:
+DEPARTMENTS = [
+    {"name": "US Postal Service", "type": DepartmentType.USPS, "description": "Handles mail delivery"},
+    {"name": "Healthcare", "type": DepartmentType.HEALTHCARE, "description": "Federal health services"}
+]
+
+
+def seed_departments(db: Session) -> bool:
+    ok = True
+    for dep in DEPARTMENTS:
         try:
             # Check if department exists using name instead of type
             existing = db.query(Department).filter(Department.name == dep["name"]).first()
@@ -105,224 +62,215 @@ def seed_departments(db: Session):
         except Exception as e:
             db.rollback()  # Rollback in case of error
             print(f"Error seeding department {dep['name']}: {str(e)}")
+            ok = False
     
     print("🏢 Departments seeding completed.")
+    return ok
     
 
 # TBD: Once Namita's changes are done this has to be revalidated with auth.
 # no frontend code to call this function
-def seed_admin_user(db: Session):
+ADMIN_USER = {
+    "username": "admin",
+    "email": "admin@example.com",
+    "password": "adminpassword123",
+    "first_name": "System",
+    "last_name": "Admin",
+    "role": RoleType.ADMIN,
+    "department_role": DepartmentRoleType.ADMIN2,
+    "department_id": None,  # Admin might not be tied to a specific department
+    "employee_id": "EMP001",
+    "is_active": True
+}
+
+
+def seed_users(db: Session, users: list, label: str) -> bool:
+    # One query finds the users that already exist; bcrypt runs only for the new ones.
+    # Each user is inserted in a savepoint of its own, so one that fails (e.g. a taken
+    # email) keeps only itself out; False tells the caller that one did.
+    existing = set(db.scalars(select(User.username).where(User.username.in_([user["username"] for user in users]))))
+    succeeded = True
+    for user in users:
+        if user["username"] in existing:
+            print(f"⚠️ {label} {user['username']} already exists.")
+            continue
+        fields = {key: value for key, value in user.items() if key != "password"}
+        try:
+            with db.begin_nested():
+                db.add(User(**fields, hashed_password=get_password_hash(user["password"])))
+        except Exception as e:
+            print(f"❌ Error seeding {label.lower()} user {user['username']}: {str(e)}")
+            succeeded = False
+            continue
+        print(f"✅ {label} user created: {user['username']}")
     try:
-        existing_admin = db.query(User).filter(User.username == "admin").first()
-        if existing_admin:
-            print("Admin already exists.")
-            return
-        # Debug prints
-        print("Available DepartmentRoleType values:", [e.value for e in DepartmentRoleType])
-        print("Attempting to use:", DepartmentRoleType.ADMIN2.value)
-        # ...rest of your code
-        admin_user = User(
-            username="admin",
-            email="admin@example.com",
-            hashed_password=get_password_hash("adminpassword123"),
-            first_name="System",
-            last_name="Admin",
-            role=RoleType.ADMIN,
-            department_role=DepartmentRoleType.ADMIN2, # Changed this line
-            department_id=None,  # Admin might not be tied to a specific department
-            employee_id="EMP001",
-            is_active=True
-        )
-        db.add(admin_user)
         db.commit()
-        print(f"✅ Admin user created: {admin_user.username}")
-    finally:
-        db.close()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error seeding {label.lower()} users: {str(e)}")
+        return False
+    return succeeded
+
+
+def seed_admin_user(db: Session) -> bool:
+    return seed_users(db, [ADMIN_USER], "Admin")
+
+
 # TBD: Once Namita's changes are done this has to be revalidated with auth and
 # check by adding supervisors by admin and add employees by supervisors
 # remove this function.
-def seed_supervisor_user(db: Session):
-    #db: Session = SessionLocal()
-    
-    supervisors_to_seed = [
-        {
-            "username": "jason",
-            "email": "jason@example.com",
-            "hashed_password": get_password_hash("jason123"),
-            "first_name": "Jason",
-            "last_name": "Smith",
-            "role": RoleType.SUPERVISOR,
-            "department_role": DepartmentRoleType.USPS_SUPERVISOR,
-            "department_id": 1,  # Admin might not be tied to a specific department
-            "role_id" : department_role_to_id[DepartmentRoleType["USPS_SUPERVISOR"].value],
-            "employee_id": "EMP002",
-            "is_active": True
-        },
-        {
-            "username": "johnny",
-            "email": "johnny@example.com",
-            "hashed_password": get_password_hash("johnny123"),
-            "first_name": "Johnny",
-            "last_name": "Doe",
-            "role": RoleType.SUPERVISOR,    
-            "department_role": DepartmentRoleType.HEALTHCARE_SUPERVISOR,
-            "department_id": 2,
-            "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_SUPERVISOR"].value],
-            "employee_id": "EMP003",
-            "is_active": True
-        }
-    ]
-    for supervisor in supervisors_to_seed:
-        try:
-            # Check if the employee already exists
-            existing_supervisor = db.query(User).filter(User.username == supervisor["username"]).first()
-            if existing_supervisor:
-                print(f"⚠️ Employee {supervisor['username']} already exists.")
-                continue
-
-            # Create a new employee
-            new_employee = User(**supervisor)
-            db.add(new_employee)
-            db.commit()
-            print(f"✅ Supervisor user created: {new_employee.username}")
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Error seeding supervisor user {supervisor['username']}: {str(e)}")
-        finally:
-            db.close()
+SUPERVISORS = [
+    {
+        "username": "jason",
+        "email": "jason@example.com",
+        "password": "jason123",
+        "first_name": "Jason",
+        "last_name": "Smith",
+        "role": RoleType.SUPERVISOR,
+        "department_role": DepartmentRoleType.USPS_SUPERVISOR,
+        "department_id": 1,  # Admin might not be tied to a specific department
+        "role_id" : department_role_to_id[DepartmentRoleType["USPS_SUPERVISOR"].value],
+        "employee_id": "EMP002",
+        "is_active": True
+    },
+    {
+        "username": "johnny",
+        "email": "johnny@example.com",
+        "password": "johnny123",
+        "first_name": "Johnny",
+        "last_name": "Doe",
+        "role": RoleType.SUPERVISOR,    
+        "department_role": DepartmentRoleType.HEALTHCARE_SUPERVISOR,
+        "department_id": 2,
+        "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_SUPERVISOR"].value],
+        "employee_id": "EMP003",
+        "is_active": True
+    }
+]
+
+
+def seed_supervisor_user(db: Session) -> bool:
+    return seed_users(db, SUPERVISORS, "Supervisor")
+
 
 # once backend logic is implemented to add supervisors by admin and add employees by supervisors, remove this function.
-def seed_employee_user(db: Session):
-    employees_to_seed = [
-        {
-            "username": "patrick",
-            "email": "patrick@example.com",
-            "hashed_password": get_password_hash("patrick123"),
-            "first_name": "Patrick",
-            "last_name": "Smith",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.USPS_MAIL_CARRIER,
-            "department_id": 1,
-            "role_id" : department_role_to_id[DepartmentRoleType["USPS_MAIL_CARRIER"].value],
-            "employee_id": "EMP004",
-            "is_active": True
-        },
-           {
-            "username": "Robert",
-            "email": "robert@example.com",
-            "hashed_password": get_password_hash("michael123"),
-            "first_name": "Robert",
-            "last_name": "Ross",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.USPS_OFFICE_ADMIN,
-            "department_id": 1,
-            "role_id" : department_role_to_id[DepartmentRoleType["USPS_OFFICE_ADMIN"].value],
-            "employee_id": "EMP005",
-            "is_active": True
-        },
-        {
-            "username": "jane",
-            "email": "jane@example.com",
-            "hashed_password": get_password_hash("jane123"),
-            "first_name": "Jane",
-            "last_name": "Doe",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.HEALTHCARE_NURSE,
-            "department_id": 2,
-            "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_NURSE"].value],
-            "employee_id": "EMP006",
-            "is_active": True
-        },
-        {
-            "username": "michael",
-            "email": "michael@example.com",
-            "hashed_password": get_password_hash("michael123"),
-            "first_name": "Michael",
-            "last_name": "Johnson",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.HEALTHCARE_ADMIN,
-            "department_id": 2,
-            "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_ADMIN"].value],
-            "employee_id": "EMP007",
-            "is_active": True
-        },
-        
-        {
-            "username": "richard",
-            "email": "richardr@example.com",
-            "hashed_password": get_password_hash("richard123"),
-            "first_name": "Richard",
-            "last_name": "C",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.USPS_OFFICE_ADMIN,
-            "department_id": 1,
-            "role_id" : department_role_to_id[DepartmentRoleType["USPS_OFFICE_ADMIN"].value],
-            "employee_id": "EMP018",
-            "is_active": True
-        },
-        {
-            "username": "Gary",
-            "email": "gary@example.com",
-            "hashed_password": get_password_hash("gary123"),
-            "first_name": "Gary",
-            "last_name": "Perl",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.USPS_MAIL_CARRIER,
-            "department_id": 1,
-            "role_id" : department_role_to_id[DepartmentRoleType["USPS_MAIL_CARRIER"].value],
-            "employee_id": "EMP019",
-            "is_active": True
-        },
-        {
-            "username": "Tom",
-            "email": "tom@example.com",
-            "hashed_password": get_password_hash("tom123"),
-            "first_name": "Tom",
-            "last_name": "Perl",
-            "role": RoleType.EMPLOYEE,
-            "department_role": DepartmentRoleType.HEALTHCARE_ADMIN,
-            "department_id": 2,
-            "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_ADMIN"].value],
-            "employee_id": "EMP010",
-            "is_active": True
-        },
-        
-    ]
-    for employee in employees_to_seed:
-        try:
-            # Check if the employee already exists
-            existing_employee = db.query(User).filter(User.username == employee["username"]).first()
-            if existing_employee:
-                print(f"⚠️ Employee {employee['username']} already exists.")
-                continue
-
-            # Create a new employee
-            new_employee = User(**employee)
-            db.add(new_employee)
-            db.commit()
-            print(f"✅ Supervisor user created: {new_employee.username}")
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Error seeding employee user {employee['username']}: {str(e)}")
- 
-        finally:
-            db.close()
-            
-def seed_roles(db: Session):
-    roles = [
-        (1, "USPS_MAIL_CARRIER", "Postal worker responsible for mail and parcel delivery"),
-        (2, "USPS_OFFICE_ADMIN", "Administrative staff in USPS office"),
-        (3, "HEALTHCARE_NURSE", "Registered Nurse"),
-        (4, "HEALTHCARE_ADMIN", "Healthcare administrative staff"),
-        (5, "USPS_SUPERVISOR", "Supervisor in USPS department"),
-        (6, "HEALTHCARE_SUPERVISOR", "Healthcare department supervisor"),
-        (7, "TRANSPORTATION_DRIVER", "Vehicle driver"),
-        (8, "TRANSPORTATION_DISPATCHER", "Transportation logistics coordinator"),
-        (9, "IT_SUPPORT_TECHNICIAN", "IT support and maintenance staff"),
-        (10, "FINANCE_ANALYST", "Financial analysis and reporting")
-    ]
+EMPLOYEES = [
+    {
+        "username": "patrick",
+        "email": "patrick@example.com",
+        "password": "patrick123",
+        "first_name": "Patrick",
+        "last_name": "Smith",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.USPS_MAIL_CARRIER,
+        "department_id": 1,
+        "role_id" : department_role_to_id[DepartmentRoleType["USPS_MAIL_CARRIER"].value],
+        "employee_id": "EMP004",
+        "is_active": True
+    },
+    {
+        "username": "Robert",
+        "email": "robert@example.com",
+        "password": "michael123",
+        "first_name": "Robert",
+        "last_name": "Ross",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.USPS_OFFICE_ADMIN,
+        "department_id": 1,
+        "role_id" : department_role_to_id[DepartmentRoleType["USPS_OFFICE_ADMIN"].value],
+        "employee_id": "EMP005",
+        "is_active": True
+    },
+    {
+        "username": "jane",
+        "email": "jane@example.com",
+        "password": "jane123",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.HEALTHCARE_NURSE,
+        "department_id": 2,
+        "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_NURSE"].value],
+        "employee_id": "EMP006",
+        "is_active": True
+    },
+    {
+        "username": "michael",
+        "email": "michael@example.com",
+        "password": "michael123",
+        "first_name": "Michael",
+        "last_name": "Johnson",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.HEALTHCARE_ADMIN,
+        "department_id": 2,
+        "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_ADMIN"].value],
+        "employee_id": "EMP007",
+        "is_active": True
+    },
+    
+    {
+        "username": "richard",
+        "email": "richardr@example.com",
+        "password": "richard123",
+        "first_name": "Richard",
+        "last_name": "C",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.USPS_OFFICE_ADMIN,
+        "department_id": 1,
+        "role_id" : department_role_to_id[DepartmentRoleType["USPS_OFFICE_ADMIN"].value],
+        "employee_id": "EMP018",
+        "is_active": True
+    },
+    {
+        "username": "Gary",
+        "email": "gary@example.com",
+        "password": "gary123",
+        "first_name": "Gary",
+        "last_name": "Perl",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.USPS_MAIL_CARRIER,
+        "department_id": 1,
+        "role_id" : department_role_to_id[DepartmentRoleType["USPS_MAIL_CARRIER"].value],
+        "employee_id": "EMP019",
+        "is_active": True
+    },
+    {
+        "username": "Tom",
+        "email": "tom@example.com",
+        "password": "tom123",
+        "first_name": "Tom",
+        "last_name": "Perl",
+        "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.HEALTHCARE_ADMIN,
+        "department_id": 2,
+        "role_id" : department_role_to_id[DepartmentRoleType["HEALTHCARE_ADMIN"].value],
+        "employee_id": "EMP010",
+        "is_active": True
+    },
+    
+]
+
 
-    for role_id, role_name, role_desc in roles:
+def seed_employee_user(db: Session) -> bool:
+    return seed_users(db, EMPLOYEES, "Employee")
+
+
+ROLES = [
+    (1, "USPS_MAIL_CARRIER", "Postal worker responsible for mail and parcel delivery"),
+    (2, "USPS_OFFICE_ADMIN", "Administrative staff in USPS office"),
+    (3, "HEALTHCARE_NURSE", "Registered Nurse"),
+    (4, "HEALTHCARE_ADMIN", "Healthcare administrative staff"),
+    (5, "USPS_SUPERVISOR", "Supervisor in USPS department"),
+    (6, "HEALTHCARE_SUPERVISOR", "Healthcare department supervisor"),
+    (7, "TRANSPORTATION_DRIVER", "Vehicle driver"),
+    (8, "TRANSPORTATION_DISPATCHER", "Transportation logistics coordinator"),
+    (9, "IT_SUPPORT_TECHNICIAN", "IT support and maintenance staff"),
+    (10, "FINANCE_ANALYST", "Financial analysis and reporting")
+]
+
+
+def seed_roles(db: Session) -> bool:
+    for role_id, role_name, role_desc in ROLES:
         existing = db.query(EmployeeRole).filter_by(role_id=role_id).first()
         if not existing:
             db.add(EmployeeRole(role_id=role_id, role_name=role_name, role_description=role_desc))
@@ -331,31 +279,103 @@ def seed_roles(db: Session):
             print(f"⚠️ Role already exists: {role_name}")
     
     db.commit()
+    return True
+
+
+# Mapping of (department_id, role_id) -> applicable metric_ids
+ROLE_METRIC_MAPPINGS = {
+    (1, 1): [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12],
+    (1, 2): [9, 10, 11, 12, 13, 14, 15, 16, 17, 18],
+    (2, 3): [21, 22, 23, 18, 27, 29, 30, 36, 37, 38, 39, 31, 32],
+    (2, 4): [18, 19, 20, 24, 25, 26, 27, 33, 34, 35, 36, 37, 38, 39]
+}
+
 
+def seed_metric_catalog(db: Session, json_file: str) -> bool:
+    # Definitions from the JSON file and ROLE_METRIC_MAPPINGS, diffed against the
+    # database and applied in bulk in one transaction (see sync_catalog)
+    with open(json_file, "r") as file:
+        metric_definitions = json.load(file)
+    role_mappings = [
+        (metric_id, role_id)
+        for (dept_id, role_id), metric_ids in ROLE_METRIC_MAPPINGS.items()
+        for metric_id in metric_ids
+    ]
+    try:
+        report = sync_catalog(db, metric_definitions, role_mappings)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error seeding the metric catalog: {str(e)}")
+        return False
+
+    for name in report.added:
+        print(f"✅ Added metric: {name}")
+    for name in report.updated:
+        print(f"✔️ Updated metric: {name}")
+    print(f"✅ Metric catalog seeded: {len(report.added)} added, {len(report.updated)} updated, "
+          f"{report.unchanged} unchanged, {report.mapped} role mappings added.")
+    return True
+
+
+# Startup seeding is skipped while nothing it depends on changed: the fingerprint
+# covers the seed constants above, metric_definitions.json and the models' table names
+# (so a new model still gets its table from create_all). It is stored in app_metadata
+# only after a seeding run in which every step succeeded, so a failed step is retried
+# on the next start; delete that row or set STARTUP_SEED_MODE=always to seed again.
+SEED_FINGERPRINT_KEY = "seed_fingerprint"
 
-def seed_metric_definition_roles(db: Session):
-    # Mapping of (department_id, role_id) -> applicable metric_ids
-    role_metric_mappings = {
-        (1, 1): [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12],
-        (1, 2): [9, 10, 11, 12, 13, 14, 15, 16, 17, 18],
-        (2, 3): [21, 22, 23, 18, 27, 29, 30, 36, 37, 38, 39, 31, 32],
-        (2, 4): [18, 19, 20, 24, 25, 26, 27, 33, 34, 35, 36, 37, 38, 39]
+
+def seed_fingerprint(json_file: str) -> str:
+    inputs = {
+        "tables": sorted(Base.metadata.tables),
+        "departments": DEPARTMENTS,
+        "roles": ROLES,
+        "users": [ADMIN_USER] + SUPERVISORS + EMPLOYEES,
+        "role_metric_mappings": sorted((list(key), value) for key, value in ROLE_METRIC_MAPPINGS.items()),
     }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode())
+    with open(json_file, "rb") as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def stored_seed_fingerprint(db: Session):
+    # None on a database whose tables were never created
+    if db.scalar(text("SELECT to_regclass('app_metadata')")) is None:
+        return None
+    return db.scalar(select(AppMetadata.value).where(AppMetadata.key == SEED_FINGERPRINT_KEY))
+
 
-    for (dept_id, role_id), metric_ids in role_metric_mappings.items():
-        for metric_id in metric_ids:
-            db.execute(text("""
-                INSERT INTO metric_definition_roles (metric_id, role_id)
-                SELECT :metric_id, :role_id
-                WHERE NOT EXISTS (
-                    SELECT 1 FROM metric_definition_roles
-                    WHERE metric_id = :metric_id AND role_id = :role_id
-                )
-            """), {"metric_id": metric_id, "role_id": role_id})
-            print(f"✔️ Mapped metric {metric_id} to role {role_id}")
+def seed_on_startup(db: Session, json_file: str, mode: str = STARTUP_SEED_MODE) -> bool:
+    """Create missing tables and seed them unless the seed inputs are unchanged.
 
+    True if it seeded and stored the fingerprint; False if seeding was skipped or a step failed.
+    """
+    if mode == "off":
+        return False
+    fingerprint = seed_fingerprint(json_file)
+    stored = stored_seed_fingerprint(db)
+    db.commit()
+    if mode != "always" and stored == fingerprint:
+        return False
+
+    Base.metadata.create_all(bind=db.get_bind())
+    reset_metric_id_sequence(db)
+    # Every step runs even after one failed; each reports its own errors
+    succeeded = [
+        seed_departments(db),
+        seed_roles(db),
+        seed_admin_user(db),
+        seed_supervisor_user(db),
+        seed_employee_user(db),
+        seed_metric_catalog(db, json_file),
+    ]
+    if not all(succeeded):
+        print("❌ Seeding did not complete; it runs again on the next start.")
+        return False
+    db.merge(AppMetadata(key=SEED_FINGERPRINT_KEY, value=fingerprint))
     db.commit()
-    print("✅ Role-metric mapping complete.")
+    return True
 
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+"""Create upcoming monthly partitions of metric_records and detach expired ones.
+
+Run daily from cron when the API's scheduler is disabled (it runs this as the
+maintain_partitions job); it is idempotent. Creates the current month and
+--ahead months after it, splits months that collected rows in the default partition out
+into their own partitions, and with --retain-months N detaches the partitions of months
+before the current one and its N predecessors. Detached tables keep their rows.
+
+    python maintain_partitions.py --ahead 3 --retain-months 24
+"""
+import argparse
+from datetime import datetime, timezone
+from app.config import METRIC_PARTITION_RETENTION_MONTHS, METRIC_PARTITIONS_AHEAD
+from app.database import SessionLocal, engine
+from app.services.partitions import detach_partitions, ensure_partitions, is_partitioned, retention_cutoff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ahead", type=int, default=METRIC_PARTITIONS_AHEAD,
+                        help="months to create after the current one")
+    parser.add_argument("--retain-months", type=int, default=METRIC_PARTITION_RETENTION_MONTHS,
+                        help="previous months to keep attached; 0 keeps every month")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            print("metric_records is not partitioned yet; run the migrations first")
+            return
+        created = ensure_partitions(db, ahead=args.ahead, retain_months=args.retain_months)
+        db.commit()
+        for name in created:
+            print(f"✔️ Created {name}")
+
+        cutoff = retention_cutoff(datetime.now(timezone.utc).date(), args.retain_months)
+        if cutoff:
+            detached = detach_partitions(db, cutoff)
+            db.commit()
+            for name in detached:
+                print(f"✔️ Detached {name}")
+    finally:
+        db.close()
+        engine.dispose()
+
+    print("✅ metric_records partitions are up to date")
+
+
+if __name__ == "__main__":
+    main()
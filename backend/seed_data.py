@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from app.services.metric_catalog import sync_catalog
 
 def seed_metric_definition_roles(db: Session):
     # Mapping of (department_id, role_id) -> applicable metric_ids
@@ -10,17 +10,11 @@ def seed_metric_definition_roles(db: Session):
         (2, 5): [18, 19, 20, 24, 25, 26, 27, 33, 34, 35, 9, 10, 11, 12]
     }
 
-    for (dept_id, role_id), metric_ids in role_metric_mappings.items():
-        for metric_id in metric_ids:
-            db.execute(text("""
-                INSERT INTO metric_definition_roles (metric_id, role_id)
-                SELECT :metric_id, :role_id
-                WHERE NOT EXISTS (
-                    SELECT 1 FROM metric_definition_roles
-                    WHERE metric_id = :metric_id AND role_id = :role_id
-                )
-            """), {"metric_id": metric_id, "role_id": role_id})
-            print(f"✔️ Mapped metric {metric_id} to role {role_id}")
-
-    db.commit()
-    print("✅ Role-metric mapping complete.")
+    # All pairs in one multi-row INSERT ... ON CONFLICT DO NOTHING
+    pairs = [
+        (metric_id, role_id)
+        for (dept_id, role_id), metric_ids in role_metric_mappings.items()
+        for metric_id in metric_ids
+    ]
+    report = sync_catalog(db, role_mappings=pairs)
+    print(f"✅ Role-metric mapping complete ({report.mapped} of {len(pairs)} mappings added).")
@@ -0,0 +1,162 @@
+import importlib.util
+import os
+import sys
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fixtures for tests that exercise routes against Postgres. They run against
+# DATABASE_URL and are skipped when it is unreachable. The dataset fixture creates its
+# own department, users and metric definitions and removes them afterwards.
+
+# (metric, day, hour UTC, value): late-evening and just-after-midnight timestamps sit on
+# day, week, month, quarter and year boundaries.
+RECORDS = [
+    (0, date(2023, 12, 31), 23, 1.0),
+    (0, date(2024, 1, 1), 0, 2.0),
+    (1, date(2024, 1, 1), 0, 3.5),
+    (0, date(2024, 2, 29), 12, 4.0),
+    (1, date(2024, 3, 31), 23, 5.0),
+    (0, date(2024, 4, 1), 0, 6.0),
+    (1, date(2024, 6, 9), 22, 7.0),
+    (0, date(2024, 6, 10), 1, 8.0),
+    (0, date(2024, 12, 31), 23, 9.5),
+    (1, date(2025, 1, 1), 0, 10.0),
+]
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    from sqlalchemy import text
+    from app.database import SessionLocal, engine
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as error:
+        pytest.skip(f"Postgres not reachable at DATABASE_URL: {error}")
+
+    from fastapi.testclient import TestClient
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.main import app
+    from app.models.models import Department, DepartmentRoleType, DepartmentType, MetricDefinition
+    from app.models.models import MetricRecord, MetricTypeEnum, RoleType, User
+    from app.services.metric_catalog import bump_catalog_version, metric_catalog
+
+    # Enter the client first so the startup seeding has run (on a fresh database it
+    # creates the tables and resets the metric_definitions id sequence) before the
+    # fixture adds its own rows.
+    with TestClient(app) as client:
+        db = SessionLocal()
+        department = Department(name="api test department", type=DepartmentType.USPS,
+                                description="created by the test fixtures")
+        db.add(department)
+        db.flush()
+        users = [
+            User(username=f"tw_{name}", email=f"tw_{name}@example.com", hashed_password="x",
+                 first_name=name, last_name="Window", employee_id=f"TW{i:03d}", role=role,
+                 department_role=DepartmentRoleType.SUPERVISOR, department_id=department.id)
+            for i, (name, role) in enumerate([("employee", RoleType.EMPLOYEE), ("supervisor", RoleType.SUPERVISOR)])
+        ]
+        metrics = [
+            MetricDefinition(metric_name=f"tw metric {metric_type.name}", metric_type=metric_type,
+                             department_id=department.id, unit="Count")
+            for metric_type in (MetricTypeEnum.PERFORMANCE, MetricTypeEnum.WELLNESS)
+        ]
+        db.add_all(users + metrics)
+        db.flush()
+        # Like every change to the definitions, so the in-memory catalog picks them up
+        bump_catalog_version(db)
+        employee, supervisor = users
+
+        rows = [
+            {
+                "user_id": employee.id,
+                "metric_id": metrics[metric].id,
+                "metric_type": metrics[metric].metric_type,
+                "recorded_at": datetime.combine(day, time(hour), tzinfo=timezone.utc),
+                "value_numeric": value,
+                "value_text": None,
+                "value_json": None,
+            }
+            for metric, day, hour, value in RECORDS
+        ]
+        upsert_metric_records(db, rows)
+        refresh_rollups(db, [(employee.id, row["metric_id"], row["recorded_at"].date()) for row in rows])
+        db.commit()
+        metric_catalog.invalidate()
+
+        records = [(metrics[metric], day, value) for metric, day, hour, value in RECORDS]
+        ids = {"department": department.id, "employee": employee.id, "supervisor": supervisor.id,
+               "metrics": [metric.id for metric in metrics]}
+        try:
+            yield {"client": client, "app": app, "records": records, "ids": ids,
+                   "employee": employee.employee_id}
+        finally:
+            db.query(MetricRecord).filter(MetricRecord.user_id == employee.id).delete()
+            for user in users:
+                db.delete(user)
+            db.flush()
+            for metric in metrics:
+                db.delete(metric)
+            db.flush()
+            bump_catalog_version(db)
+            db.delete(department)
+            db.commit()
+            metric_catalog.invalidate()
+            db.close()
+
+
+@pytest.fixture()
+def as_role(dataset):
+    from app.auth.deps import Principal, get_async_principal, get_current_principal
+    from app.models.models import RoleType
+
+    def use(role):
+        user_id = dataset["ids"]["employee" if role == RoleType.EMPLOYEE else "supervisor"]
+        principal = Principal(user_id=user_id, username="tw", role=role,
+                              department_id=dataset["ids"]["department"], role_id=None)
+        dataset["app"].dependency_overrides[get_current_principal] = lambda: principal
+        dataset["app"].dependency_overrides[get_async_principal] = lambda: principal
+        return dataset["client"]
+
+    yield use
+    dataset["app"].dependency_overrides.clear()
+
+
+@pytest.fixture()
+def auth_headers(dataset):
+    # Real bearer tokens of the dataset's employee and supervisor, by name
+    from app.database import SessionLocal
+    from app.models.models import User
+    from app.utils.security import build_token_claims, create_access_token
+    db = SessionLocal()
+    try:
+        return {
+            name: {"Authorization": f"Bearer {create_access_token(data=build_token_claims(db.get(User, dataset['ids'][name])))}"}
+            for name in ("employee", "supervisor")
+        }
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def upgrade():
+    # Runs the upgrade() of one alembic revision on a connection, e.g. against a scratch
+    # schema put first on the search_path
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    versions = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+    def run(connection, revision):
+        [path] = versions.glob(f"{revision}_*.py")
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        with Operations.context(MigrationContext.configure(connection)):
+            module.upgrade()
+
+    return run
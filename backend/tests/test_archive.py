@@ -0,0 +1,237 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from app.services.archive import _user_batches, decode_records, encode_records
+
+BEFORE = date(2021, 3, 1)
+
+
+# ---------- batching and payloads (no database needed) ----------
+
+@pytest.mark.parametrize("counts, batch_rows, expected", [
+    ([], 10, []),
+    ([(1, 4), (2, 4), (3, 4)], 8, [[1, 2], [3]]),
+    ([(1, 20), (2, 1)], 8, [[1], [2]]),
+    ([(1, 3), (2, 30), (3, 3)], 8, [[1], [2], [3]]),
+])
+def test_user_batches_keep_users_whole(counts, batch_rows, expected):
+    assert list(_user_batches(counts, batch_rows)) == expected
+
+
+def test_payload_round_trip():
+    from app.models.models import MetricTypeEnum
+    row = {"id": 7, "metric_type": MetricTypeEnum.WELLNESS, "value_json": {"a": [1, 2]},
+           "recorded_at": datetime(2021, 1, 5, 23, tzinfo=timezone.utc), "recorded_date": date(2021, 1, 5)}
+    assert decode_records(encode_records([row])) == [{
+        "id": 7, "metric_type": "WELLNESS", "value_json": {"a": [1, 2]},
+        "recorded_at": "2021-01-05T23:00:00+00:00", "recorded_date": "2021-01-05",
+    }]
+
+
+# ---------- against Postgres (fixtures in conftest.py) ----------
+
+def _rows(user_id, metric_ids):
+    # Two months of history: two metrics on five days each, with text, json and notes
+    from app.models.models import MetricTypeEnum
+    rows = []
+    for month in (1, 2):
+        for day in (1, 9, 15, 27, 28):
+            for metric_id, metric_type in zip(metric_ids, (MetricTypeEnum.PERFORMANCE, MetricTypeEnum.WELLNESS)):
+                rows.append({
+                    "user_id": user_id, "metric_id": metric_id, "metric_type": metric_type,
+                    "recorded_at": datetime.combine(date(2021, month, day), time(22), tzinfo=timezone.utc),
+                    "value_numeric": float(user_id % 7 + month * day), "value_text": f"day {day}",
+                    "value_json": {"shift": day % 3}, "notes": f"note {month}-{day}",
+                })
+    return rows
+
+
+def _snapshot(db, user_id):
+    from sqlalchemy import select
+    from app.crud.metric import monthly_metric_averages
+    from app.models.models import MetricDailyRollup, MetricLatest, MetricMonthlyRollup
+    return {
+        "trend": monthly_metric_averages(db, user_id, 2021),
+        "daily": db.execute(select(MetricDailyRollup.metric_id, MetricDailyRollup.day, MetricDailyRollup.value_sum)
+                            .where(MetricDailyRollup.user_id == user_id)
+                            .order_by(MetricDailyRollup.metric_id, MetricDailyRollup.day)).all(),
+        "monthly": db.execute(select(MetricMonthlyRollup.metric_id, MetricMonthlyRollup.month,
+                                     MetricMonthlyRollup.value_sum, MetricMonthlyRollup.value_count)
+                              .where(MetricMonthlyRollup.user_id == user_id)
+                              .order_by(MetricMonthlyRollup.metric_id, MetricMonthlyRollup.month)).all(),
+        "latest": db.execute(select(MetricLatest.metric_id, MetricLatest.record_id, MetricLatest.value_numeric)
+                             .where(MetricLatest.user_id == user_id).order_by(MetricLatest.metric_id)).all(),
+    }
+
+
+@pytest.fixture(scope="module")
+def archived(dataset):
+    """Two employees with 2021 history, archived in two runs: one batch, then the rest."""
+    from sqlalchemy import event, select
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.database import SessionLocal
+    from app.models.models import DepartmentRoleType, MetricRecord, RoleType, User
+    from app.services.archive import archive_records
+
+    db = SessionLocal()
+    users = [
+        User(username=f"ar_{i}", email=f"ar_{i}@example.com", hashed_password="x", first_name="Archived",
+             last_name=str(i), employee_id=f"AR{i:03d}", role=RoleType.EMPLOYEE,
+             department_role=DepartmentRoleType.USPS_MAIL_CARRIER, department_id=dataset["ids"]["department"])
+        for i in range(2)
+    ]
+    db.add_all(users)
+    db.flush()
+    ids = [user.id for user in users]
+    rows = [row for user_id in ids for row in _rows(user_id, dataset["ids"]["metrics"])]
+    upsert_metric_records(db, rows)
+    refresh_rollups(db, [(row["user_id"], row["metric_id"], row["recorded_at"].date()) for row in rows])
+    db.commit()
+
+    records = {
+        user_id: [
+            {"id": record.id, "value_numeric": record.value_numeric, "value_text": record.value_text,
+             "value_json": record.value_json, "notes": record.notes, "recorded_date": record.recorded_date.isoformat(),
+             "recorded_at": record.recorded_at.isoformat(), "metric_type": record.metric_type.name}
+            for record in db.scalars(select(MetricRecord).where(MetricRecord.user_id == user_id)
+                                     .order_by(MetricRecord.recorded_date, MetricRecord.id))
+        ]
+        for user_id in ids
+    }
+    before = {user_id: _snapshot(db, user_id) for user_id in ids}
+    db.commit()
+
+    commits = []
+
+    def count(session):
+        commits.append(session)
+
+    event.listen(db, "after_commit", count)
+    # A batch holds one user's month: the first run stops after a single one
+    first = archive_records(db, BEFORE, batch_rows=1, max_batches=1)
+    first_commits = len(commits)
+    second = archive_records(db, BEFORE, batch_rows=1)
+    event.remove(db, "after_commit", count)
+
+    try:
+        yield {"db": db, "ids": ids, "records": records, "before": before, "runs": (first, second),
+               "commits": (first_commits, len(commits) - first_commits), "dataset": dataset}
+    finally:
+        db.rollback()
+        db.query(MetricRecord).filter(MetricRecord.user_id.in_(ids)).delete()
+        for user in users:
+            db.delete(user)
+        db.commit()
+        db.close()
+
+
+def test_runs_resume_where_they_stopped(archived):
+    first, second = archived["runs"]
+    assert (first.batches, first.records, first.complete) == (1, 10, False)
+    assert (second.batches, second.complete) == (3, True)
+    assert first.records + second.records == 40
+    assert second.months == {date(2021, 1, 1): 10, date(2021, 2, 1): 20}
+    # Every batch is its own transaction
+    assert archived["commits"][0] >= first.batches and archived["commits"][1] >= second.batches
+
+
+def test_records_move_to_the_archive_intact(archived):
+    from sqlalchemy import func, select
+    from app.models.models import MetricRecord, MetricRecordArchive
+    from app.services.archive import load_archived_records
+    db = archived["db"]
+    for user_id in archived["ids"]:
+        assert db.scalar(select(func.count()).where(MetricRecord.user_id == user_id)) == 0
+        restored = load_archived_records(db, user_id, date(2021, 1, 1)) + \
+            load_archived_records(db, user_id, date(2021, 2, 1))
+        assert [{key: record[key] for key in archived["records"][user_id][0]} for record in restored] == \
+            archived["records"][user_id]
+    counts = db.execute(select(MetricRecordArchive.month, func.sum(MetricRecordArchive.record_count))
+                        .where(MetricRecordArchive.user_id.in_(archived["ids"]))
+                        .group_by(MetricRecordArchive.month)).all()
+    assert dict(counts) == {date(2021, 1, 1): 20, date(2021, 2, 1): 20}
+
+
+def test_rollups_and_latest_values_survive_archival_and_rebuild(archived):
+    from app.crud.rollup import archived_before, rebuild_user_rollups
+    db = archived["db"]
+    assert archived_before(db) == BEFORE
+    rebuild_user_rollups(db, archived["ids"])
+    db.commit()
+    for user_id in archived["ids"]:
+        after = _snapshot(db, user_id)
+        before = archived["before"][user_id]
+        assert after["trend"] == before["trend"]
+        assert after["trend"][0]["avg_performance"] > 0
+        assert after["monthly"] == before["monthly"]
+        assert after["daily"] == before["daily"]
+        assert after["latest"] == before["latest"]
+
+
+def test_employee_details_trend_covers_archived_year(archived):
+    from app.auth.deps import get_current_user, get_current_user_role
+    from app.models.models import RoleType, User
+    dataset = archived["dataset"]
+    supervisor = User(id=dataset["ids"]["supervisor"], department_id=dataset["ids"]["department"])
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: supervisor
+    app.dependency_overrides[get_current_user_role] = lambda: RoleType.SUPERVISOR
+    try:
+        response = dataset["client"].get("/api/v1/metric-records/employee/AR000/details", params={"year": 2021})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["monthly_metrics"] == archived["before"][archived["ids"][0]]["trend"]
+
+
+def test_submissions_into_archived_months_are_rejected(archived):
+    from app.auth.deps import get_current_user, get_current_user_role
+    from app.models.models import RoleType, User
+    dataset = archived["dataset"]
+    employee = User(id=archived["ids"][0], department_id=dataset["ids"]["department"])
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: employee
+    app.dependency_overrides[get_current_user_role] = lambda: RoleType.EMPLOYEE
+    try:
+        response = dataset["client"].post("/api/v1/metric-records/employee-submit-metrics", json={
+            "date": "2021-02-10", "metrics": [{"metric_id": dataset["ids"]["metrics"][0], "value_numeric": 1.0}],
+        })
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert "archived" in response.json()["detail"]
+
+
+def test_full_parquet_export_keeps_archived_months(archived, tmp_path):
+    pa_dataset = pytest.importorskip("pyarrow.dataset")
+    from sqlalchemy import delete
+    from app.crud.metric import upsert_metric_records
+    from app.models.models import MetricRecord, MetricTypeEnum
+    from app.services.parquet_export import export_metric_snapshot
+    db = archived["db"]
+    dataset = archived["dataset"]
+    # A record left in metric_records, as by an archival run interrupted within the month
+    leftover = {"user_id": archived["ids"][0], "metric_id": dataset["ids"]["metrics"][0],
+                "metric_type": MetricTypeEnum.PERFORMANCE, "value_numeric": 99.0, "value_text": None,
+                "value_json": None, "recorded_at": datetime(2021, 2, 20, 12, tzinfo=timezone.utc)}
+    upsert_metric_records(db, [leftover])
+    db.commit()
+    try:
+        # Twice: the second full run rewrites the months the first one wrote
+        export_metric_snapshot(db, str(tmp_path))
+        report = export_metric_snapshot(db, str(tmp_path))
+    finally:
+        db.execute(delete(MetricRecord).where(MetricRecord.user_id == archived["ids"][0]))
+        db.commit()
+
+    table = pa_dataset.dataset(str(tmp_path), partitioning="hive").to_table(
+        filter=pa_dataset.field("user_id").isin(archived["ids"]))
+    exported = sorted(zip(table["user_id"].to_pylist(), table["record_id"].to_pylist(),
+                          table["value_text"].to_pylist(), table["metric_type"].to_pylist()))
+    expected = sorted((user_id, record["id"], record["value_text"], MetricTypeEnum[record["metric_type"]].value)
+                      for user_id, records in archived["records"].items() for record in records)
+    assert [row for row in exported if row[2] is not None] == expected
+    assert len(exported) == len(expected) + 1
+    assert report["rows"] >= len(exported)
@@ -0,0 +1,264 @@
+import time
+
+import pytest
+from sqlalchemy import func, select, update
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def notify_from_other_worker(user_id, **changes):
+    # What another worker's publish_user_change() sends on commit, with its change
+    from app.auth.user_cache import USER_CHANGES_CHANNEL
+    from app.database import engine
+    from app.models.models import User
+    with engine.begin() as connection:
+        if changes:
+            connection.execute(update(User).where(User.id == user_id).values(**changes))
+        connection.execute(select(func.pg_notify(USER_CHANGES_CHANNEL, str(user_id))))
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    from app.utils import cache as module
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    cache = module.TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"  # 2 is now the least recently used
+    cache.set(3, "c")
+    assert (cache.get(2), cache.get(1), cache.get(3)) == (None, "a", "c")
+    now[0] += 61
+    assert cache.get(1) is None
+    cache.set(4, "d")
+    cache.invalidate(4)
+    assert cache.get(4) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 3, 1, 1)
+
+
+def test_cached_users_are_resolved_without_a_query(dataset, auth_headers):
+    from sqlalchemy import event
+    from app.auth.user_cache import invalidate_user
+    from app.database import engine
+    invalidate_user(dataset["ids"]["employee"])
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            seen.append(statement)
+
+    route = "/api/v1/metric-records/employee/available-metrics"
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert dataset["client"].get(route, headers=auth_headers["employee"]).status_code == 200
+        loaded = len(seen)
+        assert dataset["client"].get(route, headers=auth_headers["employee"]).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert loaded == 1 and len(seen) == 1
+
+
+def test_user_updates_evict_the_cached_user(dataset, auth_headers):
+    from app.auth.user_cache import publish_user_change, user_cache
+    from app.database import SessionLocal
+    from app.models.models import User
+    client, employee = dataset["client"], dataset["ids"]["employee"]
+    assert client.get("/api/v1/metric-records/employee/available-metrics",
+                      headers=auth_headers["employee"]).status_code == 200
+    assert user_cache.get(employee)["first_name"] == "employee"
+    response = client.put(f"/api/v1/users/employees/{employee}", json={"first_name": "Renamed"},
+                          headers=auth_headers["supervisor"])
+    try:
+        assert response.status_code == 200
+        assert user_cache.get(employee) is None
+    finally:
+        db = SessionLocal()
+        db.get(User, employee).first_name = "employee"
+        publish_user_change(db, employee)
+        db.commit()
+        db.close()
+
+
+@pytest.fixture()
+def listening(dataset):
+    from app.auth.user_cache import user_change_listener
+    assert wait_for(user_change_listener.connected.is_set)
+    return dataset
+
+
+def test_changes_in_other_workers_evict_cached_users(listening):
+    from app.auth.user_cache import get_user_snapshot, user_cache
+    from app.database import SessionLocal
+    user_id = listening["ids"]["employee"]
+    db = SessionLocal()
+    try:
+        get_user_snapshot(db, user_id)
+    finally:
+        db.close()
+    assert user_cache.get(user_id) is not None
+    notify_from_other_worker(user_id)
+    assert wait_for(lambda: user_cache.get(user_id) is None)
+
+
+def test_published_changes_evict_on_commit_only(dataset):
+    from app.auth.user_cache import get_user_snapshot, publish_user_change, user_cache
+    from app.database import SessionLocal
+    user_id = dataset["ids"]["employee"]
+    db = SessionLocal()
+    try:
+        get_user_snapshot(db, user_id)
+        publish_user_change(db, user_id)
+        db.rollback()
+        assert user_cache.get(user_id) is not None
+        publish_user_change(db, user_id)
+        assert user_cache.get(user_id) is not None
+        db.commit()
+        assert user_cache.get(user_id) is None
+    finally:
+        db.close()
+
+
+def test_users_are_not_cached_while_the_listener_is_disconnected(dataset, monkeypatch):
+    from app.auth import user_cache as module
+    from app.database import SessionLocal
+    user_id = dataset["ids"]["employee"]
+    module.invalidate_user(user_id)
+    monkeypatch.setattr(module.user_change_listener, "reliable", lambda: False)
+    db = SessionLocal()
+    try:
+        assert module.get_user_snapshot(db, user_id)["id"] == user_id
+    finally:
+        db.close()
+    assert module.user_cache.get(user_id) is None
+
+
+@pytest.fixture()
+def bearer(listening, auth_headers):
+    # auth_headers by user id; the users' rows are restored afterwards
+    from app.auth.user_cache import invalidate_user
+    from app.database import SessionLocal
+    from app.models.models import User
+    db = SessionLocal()
+    saved = [(user.id, user.token_version, user.is_active)
+             for user in (db.get(User, listening["ids"][name]) for name in ("employee", "supervisor"))]
+    db.close()
+    yield {listening["ids"][name]: headers for name, headers in auth_headers.items()}
+    db = SessionLocal()
+    for user_id, token_version, is_active in saved:
+        db.execute(update(User).where(User.id == user_id).values(token_version=token_version, is_active=is_active))
+        invalidate_user(user_id)
+    db.commit()
+    db.close()
+
+
+USER_ROUTE = "/api/v1/metric-records/employee/available-metrics"  # get_current_user
+PRINCIPAL_ROUTE = "/api/v1/metric-records/department/overview"   # get_async_principal
+
+
+def test_version_bump_in_another_worker_revokes_tokens(listening, bearer):
+    from app.models.models import User
+    client = listening["client"]
+    employee, supervisor = listening["ids"]["employee"], listening["ids"]["supervisor"]
+    # Both users are cached by these requests
+    assert client.get(USER_ROUTE, headers=bearer[employee]).status_code == 200
+    assert client.get(PRINCIPAL_ROUTE, headers=bearer[supervisor]).status_code == 200
+
+    for user_id in (employee, supervisor):
+        notify_from_other_worker(user_id, token_version=User.token_version + 1)
+    assert wait_for(lambda: client.get(USER_ROUTE, headers=bearer[employee]).status_code == 401)
+    assert wait_for(lambda: client.get(PRINCIPAL_ROUTE, headers=bearer[supervisor]).status_code == 401)
+
+
+def test_deactivated_users_are_rejected(listening, bearer):
+    client = listening["client"]
+    employee, supervisor = listening["ids"]["employee"], listening["ids"]["supervisor"]
+    assert client.get(PRINCIPAL_ROUTE, headers=bearer[supervisor]).status_code == 200
+    # Even without a version bump, e.g. a row deactivated by a script; the token itself
+    # is still valid, so the answer is 400 "Inactive user" rather than 401
+    for user_id in (employee, supervisor):
+        notify_from_other_worker(user_id, is_active=False)
+    assert wait_for(lambda: client.get(USER_ROUTE, headers=bearer[employee]).status_code == 400)
+    assert wait_for(lambda: client.get(PRINCIPAL_ROUTE, headers=bearer[supervisor]).status_code == 400)
+    assert client.get(PRINCIPAL_ROUTE, headers=bearer[supervisor]).json() == {"detail": "Inactive user"}
+
+
+@pytest.fixture()
+def login_user(dataset):
+    # A user whose password was hashed with a cheaper bcrypt cost than BCRYPT_ROUNDS
+    from app.database import SessionLocal
+    from app.models.models import DepartmentRoleType, RoleType, User
+    from app.utils.security import pwd_context
+    db = SessionLocal()
+    user = User(username="tw_login", email="tw_login@example.com", first_name="Login", last_name="Test",
+                hashed_password=pwd_context.hash("secret123", rounds=4), employee_id="TWL001",
+                role=RoleType.EMPLOYEE, department_role=DepartmentRoleType.USPS_MAIL_CARRIER,
+                department_id=dataset["ids"]["department"])
+    db.add(user)
+    db.commit()
+    yield db, user
+    db.rollback()
+    db.delete(user)
+    db.commit()
+    db.close()
+
+
+def test_login_rehashes_an_outdated_hash_once(dataset, login_user, monkeypatch):
+    from app.config import BCRYPT_ROUNDS
+    from app.services import auth_service
+    from app.utils.security import verify_password
+    db, user = login_user
+    verifications = []
+    verify = auth_service.verify_and_update_password
+    monkeypatch.setattr(auth_service, "verify_and_update_password",
+                        lambda *args: verifications.append(args) or verify(*args))
+    login = {"username": "tw_login", "password": "secret123"}
+
+    assert dataset["client"].post("/api/v1/auth/login", data=login).status_code == 200
+    db.refresh(user)
+    rehashed = user.hashed_password
+    assert rehashed.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert verify_password("secret123", rehashed)
+    assert len(verifications) == 1  # one bcrypt verification per login, rehash included
+
+    # Current cost: nothing to rewrite; a wrong password neither logs in nor rewrites
+    assert dataset["client"].post("/api/v1/auth/login", data=login).status_code == 200
+    assert dataset["client"].post("/api/v1/auth/login", data={**login, "password": "wrong"}).status_code == 401
+    db.refresh(user)
+    assert user.hashed_password == rehashed
+    assert len(verifications) == 3
+
+
+def test_refresh_flow_and_revocation_by_password_change(dataset, login_user, auth_headers):
+    from jose import jwt
+    from app.config import ALGORITHM, SECRET_KEY
+    client = dataset["client"]
+    db, user = login_user
+    tokens = client.post("/api/v1/auth/login", data={"username": "tw_login", "password": "secret123"}).json()
+    claims = jwt.decode(tokens["access_token"], SECRET_KEY, algorithms=[ALGORITHM])
+    assert (claims["user_id"], claims["department_id"], claims["ver"], claims["type"]) == \
+        (user.id, dataset["ids"]["department"], 0, "access")
+    access = {"Authorization": f"Bearer {tokens['access_token']}"}
+    route = "/api/v1/metric-records/employee/available-metrics"
+
+    # Refresh tokens are only good at /auth/refresh, access tokens only elsewhere
+    assert client.get(route, headers={"Authorization": f"Bearer {tokens['refresh_token']}"}).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+    refreshed = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert client.get(route, headers={"Authorization": f"Bearer {refreshed.json()['access_token']}"}).status_code == 200
+
+    # A password change bumps the token version: every earlier token stops working
+    assert client.get(route, headers=access).status_code == 200
+    response = client.put(f"/api/v1/users/employees/{user.id}", json={"password": "changed123"},
+                          headers=auth_headers["supervisor"])
+    assert response.status_code == 200
+    assert client.get(route, headers=access).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    relogin = client.post("/api/v1/auth/login", data={"username": "tw_login", "password": "changed123"}).json()
+    assert jwt.decode(relogin["access_token"], SECRET_KEY, algorithms=[ALGORITHM])["ver"] == 1
+    assert client.get(route, headers={"Authorization": f"Bearer {relogin['access_token']}"}).status_code == 200
@@ -0,0 +1,180 @@
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.models.models import RoleType
+from app.services.dashboard_cache import CHANGES_CHANNEL, DashboardCache, _messages, _parse_message, dashboard_key
+from app.utils.time_window import TimeWindow, parse_time_window
+
+DASHBOARD = "/api/v1/dashboard/view-aggregate-metrics"
+
+
+def _key(department_id, date_filter, metric_type=None):
+    return dashboard_key(department_id, metric_type, parse_time_window(date_filter))
+
+
+def test_equivalent_windows_share_a_key():
+    assert _key(1, "2024-06") == _key(1, "2024-06-01..2024-06-30") == _key(1, "2024-06", "")
+    assert _key(1, "2024-06") != _key(1, "2024-06", "WELLNESS") != _key(2, "2024-06", "WELLNESS")
+
+
+def _fill(cache, key, value):
+    _, token = cache.get(key)
+    cache.set(key, value, token, 0.01)
+
+
+def test_lru_eviction_and_stats():
+    cache = DashboardCache(maxsize=2, ttl=60)
+    for date_filter in ("2024-01", "2024-02"):
+        _fill(cache, _key(1, date_filter), [date_filter])
+    assert cache.get(_key(1, "2024-01"))[0] == ["2024-01"]  # now most recently used
+    _fill(cache, _key(1, "2024-03"), ["2024-03"])
+    assert cache.get(_key(1, "2024-02"))[0] is None
+    assert cache.get(_key(1, "2024-01"))[0] == ["2024-01"]
+
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 2, 4)
+    assert stats["hit_ratio"] == round(2 / 6, 4)
+    january = next(k for k in stats["keys"] if k["start"] == "2024-01-01")
+    assert (january["hits"], january["computes"], january["avg_compute_ms"]) == (2, 1, 10.0)
+
+
+def test_ttl_expiry():
+    cache = DashboardCache(maxsize=10, ttl=0)
+    _fill(cache, _key(1, "2024"), [1])
+    assert cache.get(_key(1, "2024"))[0] is None
+
+
+def test_invalidation_is_limited_to_department_and_days():
+    cache = DashboardCache(maxsize=100, ttl=60)
+    keys = {
+        "june": _key(1, "2024-06"),
+        "june_10": _key(1, "2024-06-10"),
+        "july": _key(1, "2024-07"),
+        "year": _key(1, "2024"),
+        "every_june": dashboard_key(1, None, TimeWindow(month_of_year=6)),
+        "other_department": _key(2, "2024-06"),
+    }
+    for name, key in keys.items():
+        _fill(cache, key, [name])
+
+    cache.invalidate(1, {date(2024, 6, 15)})
+    cached = {name for name, key in keys.items() if cache.get(key)[0] is not None}
+    assert cached == {"june_10", "july", "other_department"}
+
+    cache.invalidate(1, None)
+    assert {name for name, key in keys.items() if cache.get(key)[0] is not None} == {"other_department"}
+
+
+def test_results_computed_across_an_invalidation_are_not_stored():
+    cache = DashboardCache(maxsize=10, ttl=60)
+    key = _key(1, "2024-06")
+    _, token = cache.get(key)
+    cache.invalidate(1, {date(2024, 6, 1)})
+    cache.set(key, ["stale"], token, 0.01)
+    assert cache.get(key)[0] is None
+    _, token = cache.get(key)
+    cache.clear()
+    cache.set(key, ["stale"], token, 0.01)
+    assert cache.get(key)[0] is None
+
+
+def test_change_messages_round_trip():
+    days = {date(2024, 6, 1), date(2024, 6, 2)}
+    [message] = list(_messages({4: days}))
+    assert _parse_message(json.dumps(message)) == {4: days}
+    [message] = list(_messages({4: {date(2020, 1, 1) + timedelta(days=i) for i in range(500)}}))
+    assert _parse_message(json.dumps(message)) == {4: None}
+    assert _parse_message(json.dumps(list(_messages(None))[0])) is None
+
+
+# ---------- against Postgres ----------
+
+@pytest.fixture()
+def cache(dataset):
+    from app.services.dashboard_cache import dashboard_cache
+    dashboard_cache.clear()
+    return dashboard_cache
+
+
+def _totals(client, date_filter):
+    response = client.get(DASHBOARD, params={"date_filter": date_filter})
+    assert response.status_code == 200
+    return {m["metric_name"]: m["total"] for m in response.json()}
+
+
+def test_repeated_dashboard_requests_hit_the_cache(dataset, as_role, cache):
+    client = as_role(RoleType.SUPERVISOR)
+    first = _totals(client, "2024-06")
+    hits = cache.hits
+    assert _totals(client, "2024-06-01..2024-06-30") == first
+    assert cache.hits == hits + 1
+
+
+def _write_record(dataset, day, value):
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.database import SessionLocal
+    from app.models.models import MetricTypeEnum
+    db = SessionLocal()
+    upsert_metric_records(db, [{
+        "user_id": dataset["ids"]["employee"], "metric_id": dataset["ids"]["metrics"][0],
+        "metric_type": MetricTypeEnum.PERFORMANCE,
+        "recorded_at": datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc),
+        "value_numeric": value, "value_text": None, "value_json": None,
+    }])
+    refresh_rollups(db, [(dataset["ids"]["employee"], dataset["ids"]["metrics"][0], day)])
+    db.commit()
+    db.close()
+
+
+@pytest.fixture()
+def extra_record(dataset):
+    day = date(2024, 6, 20)
+    yield day
+    from app.crud.rollup import rebuild_user_rollups
+    from app.database import SessionLocal
+    from app.models.models import MetricRecord
+    db = SessionLocal()
+    db.query(MetricRecord).filter(MetricRecord.user_id == dataset["ids"]["employee"],
+                                  MetricRecord.recorded_date == day).delete()
+    rebuild_user_rollups(db, [dataset["ids"]["employee"]])
+    db.commit()
+    db.close()
+
+
+def test_writes_invalidate_only_the_touched_windows(dataset, as_role, cache, extra_record):
+    client = as_role(RoleType.SUPERVISOR)
+    metric_name = "tw metric PERFORMANCE"
+    june, january = _totals(client, "2024-06"), _totals(client, "2024-01")
+
+    _write_record(dataset, extra_record, 100.0)
+    hits = cache.hits
+    assert _totals(client, "2024-01") == january
+    assert cache.hits == hits + 1
+    assert _totals(client, "2024-06")[metric_name] == june[metric_name] + 100.0
+    assert cache.hits == hits + 1
+
+
+def test_notifications_from_other_workers_invalidate(dataset, as_role, cache):
+    from sqlalchemy import func, select
+    from app.database import engine
+    from app.services.dashboard_cache import dashboard_change_listener
+    client = as_role(RoleType.SUPERVISOR)
+    deadline = time.monotonic() + 10
+    while not dashboard_change_listener.connected.is_set() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert dashboard_change_listener.connected.is_set()
+
+    _totals(client, "2024-06")
+    key = _key(dataset["ids"]["department"], "2024-06")
+    assert cache.get(key)[0] is not None
+    # What another worker's publish_dashboard_changes() sends on commit
+    with engine.begin() as connection:
+        connection.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(
+            {"department_id": dataset["ids"]["department"], "days": ["2024-06-03"]}))))
+    while cache.get(key)[0] is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert cache.get(key)[0] is None
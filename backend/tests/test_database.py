@@ -0,0 +1,138 @@
+import pytest
+
+
+def test_pool_stats_cover_both_pools():
+    from app.config import DB_ASYNC_MAX_OVERFLOW, DB_ASYNC_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_SIZE
+    from app.database import pool_stats
+    stats = pool_stats()
+    assert (stats["pool_size"], stats["max_overflow"]) == (DB_POOL_SIZE, DB_MAX_OVERFLOW)
+    assert (stats["async"]["pool_size"], stats["async"]["max_overflow"]) == (DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW)
+    assert stats["max_connections"] == DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW
+    assert set(stats["async"]) == set(stats) - {"async", "max_connections"}
+
+
+def test_async_routes_use_only_the_async_pool(dataset, auth_headers):
+    from app.auth.user_cache import invalidate_user
+    from app.database import async_checkout_stats, checkout_stats
+    invalidate_user(dataset["ids"]["employee"])  # the principal is loaded, not cached
+    sync_before = checkout_stats.snapshot()["checkouts"]
+    async_before = async_checkout_stats.snapshot()["checkouts"]
+    response = dataset["client"].get("/api/v1/metrics/employee/my-metrics", headers=auth_headers["employee"])
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == len(dataset["records"])
+    assert checkout_stats.snapshot()["checkouts"] == sync_before
+    # The principal dependency and the route share one session and connection
+    assert async_checkout_stats.snapshot()["checkouts"] == async_before + 1
+
+
+def test_engines_share_one_pool():
+    import init_db
+    from app.database import SessionLocal, engine
+    from app.models import base
+    assert init_db.engine is engine and base.engine is engine
+    assert SessionLocal.kw["bind"] is engine
+
+
+def test_pool_snapshot_reports_saturation_and_checkout_timeouts(dataset):
+    from sqlalchemy import exc, text
+    from app.database import _pool_snapshot, checkout_stats, create_db_engine
+    tiny = create_db_engine(pool_size=1, max_overflow=0, pool_timeout=0.2, statement_timeout_ms=1234)
+    before = checkout_stats.snapshot()
+    try:
+        with tiny.connect() as connection:
+            # The per-connection statement_timeout is set at connect time
+            assert connection.scalar(text("SHOW statement_timeout")) == "1234ms"
+            stats = _pool_snapshot(tiny.pool, 0, checkout_stats)
+            assert (stats["pool_size"], stats["checked_out"], stats["checked_in"], stats["saturation"]) == \
+                (1, 1, 0, 1.0)
+            with pytest.raises(exc.TimeoutError):
+                tiny.connect()
+        stats = _pool_snapshot(tiny.pool, 0, checkout_stats)
+    finally:
+        tiny.dispose()
+    assert (stats["checked_out"], stats["checked_in"], stats["saturation"]) == (0, 1, 0.0)
+    assert stats["checkouts"] == before["checkouts"] + 1
+    assert stats["checkout_timeouts"] == before["checkout_timeouts"] + 1
+    assert stats["max_checkout_wait_ms"] >= before["max_checkout_wait_ms"]
+
+
+def test_db_pool_endpoint(dataset):
+    from app.auth.deps import get_current_user
+    from app.models.models import RoleType, User
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: User(id=0, role=RoleType.ADMIN, is_active=True)
+    try:
+        response = dataset["client"].get("/api/v1/admin/db-pool")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    body = response.json()
+    assert {"pool_size", "checked_out", "saturation", "checkouts", "avg_checkout_wait_ms", "async"} <= set(body)
+    assert body["checkouts"] > 0
+
+
+def test_asyncpg_dsn(monkeypatch):
+    from app import database
+    monkeypatch.setattr(database, "ASYNC_DATABASE_URL", None)
+    monkeypatch.setattr(database, "DATABASE_URL", "postgresql+psycopg2://app:s3cret@db:5433/wellness")
+    assert database.asyncpg_dsn() == "postgresql://app:s3cret@db:5433/wellness"
+    monkeypatch.setattr(database, "ASYNC_DATABASE_URL", "postgresql+asyncpg://reader:pw@replica/wellness")
+    assert database.asyncpg_dsn() == "postgresql://reader:pw@replica/wellness"
+
+
+def test_channel_listener_reconnects_and_resets(dataset):
+    # Shared by the user, dashboard and scheduler connections: a lost connection is
+    # reopened, on_reset runs again, and notifications are heard on the new one
+    import asyncio
+    from sqlalchemy import func, select, text
+    from app.database import ChannelListener, engine
+
+    class Recorder(ChannelListener):
+        channel = "test_channel_listener"
+
+        def __init__(self):
+            super().__init__(retry_seconds=0.05)
+            self.resets, self.payloads = 0, []
+
+        def on_notify(self, payload):
+            self.payloads.append(payload)
+
+        def on_reset(self):
+            self.resets += 1
+
+    def notify(payload):
+        with engine.begin() as connection:
+            connection.execute(select(func.pg_notify(Recorder.channel, payload)))
+
+    def terminate_listener():
+        with engine.begin() as connection:
+            return connection.scalar(text(
+                "SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity "
+                "WHERE query LIKE 'LISTEN%test_channel_listener%'"))
+
+    async def until(condition):
+        for _ in range(200):
+            if condition():
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def main():
+        listener = Recorder()
+        assert listener.reliable()
+        listener.start()
+        try:
+            assert not listener.reliable()
+            assert await until(listener.connected.is_set)
+            await asyncio.to_thread(notify, "first")
+            assert await until(lambda: listener.payloads == ["first"])
+            # Drop the listening backend, as a failover or idle timeout would
+            assert await asyncio.to_thread(terminate_listener) == 1
+            assert await until(lambda: listener.resets == 2 and listener.connected.is_set())
+            await asyncio.to_thread(notify, "second")
+            assert await until(lambda: listener.payloads == ["first", "second"])
+        finally:
+            await listener.stop()
+        assert listener.reliable() and not listener.connected.is_set()
+
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.models import RoleType
+
+OVERVIEW = "/api/v1/metric-records/department/overview"
+
+
+def _expected(dataset, as_of):
+    metrics = {}
+    for metric, day, value in dataset["records"]:
+        if day > as_of:
+            continue
+        latest_day, latest_value = metrics.get(metric.id, (None, None))
+        if latest_day is None or day >= latest_day:
+            metrics[metric.id] = (day, value)
+
+    def average(metric_id, length):
+        values = [value for metric, day, value in dataset["records"]
+                  if metric.id == metric_id and as_of - timedelta(days=length) < day <= as_of]
+        return sum(values) / len(values) if values else None
+
+    return {
+        metric_id: (day.isoformat(), value, average(metric_id, 7), average(metric_id, 30))
+        for metric_id, (day, value) in metrics.items()
+    }
+
+
+@pytest.mark.parametrize("as_of", [
+    date(2023, 12, 31), date(2024, 1, 1), date(2024, 1, 20), date(2024, 4, 5),
+    date(2024, 5, 15), date(2024, 6, 10), date(2025, 6, 1),
+])
+def test_overview_values(dataset, as_role, as_of):
+    response = as_role(RoleType.SUPERVISOR).get(OVERVIEW, params={"as_of": as_of.isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["department_id"], body["as_of"]) == (dataset["ids"]["department"], as_of.isoformat())
+    [employee] = body["employees"]
+    assert employee["employee_id"] == dataset["employee"]
+    expected = _expected(dataset, as_of)
+    assert {m["metric_id"]: (m["latest_recorded_at"], m["latest_value"], m["avg_7d"], m["avg_30d"])
+            for m in employee["metrics"]} == expected
+    assert employee["last_submission"] == max(day for day, *_ in expected.values())
+
+
+def test_overview_before_any_record(dataset, as_role):
+    response = as_role(RoleType.SUPERVISOR).get(OVERVIEW, params={"as_of": "2023-01-01"})
+    [employee] = response.json()["employees"]
+    assert (employee["metrics"], employee["last_submission"]) == ([], None)
+
+
+def test_overview_requires_supervisor(dataset, as_role):
+    assert as_role(RoleType.EMPLOYEE).get(OVERVIEW).status_code == 403
+
+
+@pytest.fixture()
+def extra_employees(dataset):
+    from app.database import SessionLocal
+    from app.models.models import DepartmentRoleType, User
+    db = SessionLocal()
+    users = [
+        User(username=f"ov_employee_{i}", email=f"ov_employee_{i}@example.com", hashed_password="x",
+             first_name="Extra", last_name=f"Employee{i}", employee_id=f"OV{i:03d}", role=RoleType.EMPLOYEE,
+             department_role=DepartmentRoleType.USPS_MAIL_CARRIER, department_id=dataset["ids"]["department"])
+        for i in range(25)
+    ]
+    db.add_all(users)
+    db.commit()
+    yield users
+    for user in users:
+        db.delete(user)
+    db.commit()
+    db.close()
+
+
+def test_query_count_does_not_grow_with_headcount(dataset, as_role, extra_employees):
+    from app.database import async_engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = as_role(RoleType.SUPERVISOR).get(OVERVIEW, params={"as_of": "2024-06-10"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert len(response.json()["employees"]) == 1 + len(extra_employees)
+    assert len([s for s in seen if s.lstrip().upper().startswith(("SELECT", "WITH"))]) == 3
+
+
+@pytest.fixture()
+def db(dataset):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def test_latest_values_skip_records_dated_after_as_of(dataset, db):
+    # A value dated ahead of as_of is metric_latest's row for its pair, so that pair is
+    # looked up in metric_records while the other one is still read from metric_latest
+    from datetime import datetime, timezone
+    from app.crud.metric import department_latest_values_query, upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.models.models import MetricDefinition
+    user_id, (first, second) = dataset["ids"]["employee"], dataset["ids"]["metrics"]
+    metric = db.get(MetricDefinition, first)
+    upsert_metric_records(db, [{"user_id": user_id, "metric_id": first, "metric_type": metric.metric_type,
+                                "recorded_at": datetime(2025, 3, 1, tzinfo=timezone.utc),
+                                "value_numeric": 11.0, "value_text": None, "value_json": None}])
+    refresh_rollups(db, [(user_id, first, date(2025, 3, 1))])
+    latest = {row.metric_id: (row.recorded_at.date(), row.value_numeric)
+              for row in db.execute(department_latest_values_query(dataset["ids"]["department"], date(2025, 1, 15)))}
+    assert latest == {first: (date(2024, 12, 31), 9.5), second: (date(2025, 1, 1), 10.0)}
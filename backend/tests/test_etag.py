@@ -0,0 +1,164 @@
+import pytest
+from sqlalchemy import event
+from starlette.requests import Request
+
+from app.models.models import RoleType
+from app.utils.etag import etag_matches, make_etag
+
+DEPARTMENTS = "/api/v1/departments/view"
+PROFILE = "/api/v1/profile/me"
+CATALOG_ROUTES = [
+    "/api/v1/metric-records/employee/available-metrics",
+    "/api/v1/metric-records/employee/performance-metrics",
+    "/api/v1/metric-records/employee/wellness-metrics",
+    "/api/v1/metrics/performance-metrics",
+    "/api/v1/metrics/wellness-metrics",
+]
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(_request(header), '"abc"') is matches
+
+
+def test_make_etag_is_strong_and_stable():
+    etag = make_etag("catalog", 3, 7)
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert etag == make_etag("catalog", 3, 7) != make_etag("catalog", 4, 7)
+
+
+@pytest.fixture()
+def statements():
+    from app.database import engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture()
+def as_employee(dataset):
+    from app.auth.deps import get_current_user, get_current_user_role
+    from app.database import SessionLocal
+    from app.models.models import User
+    db = SessionLocal()
+    employee = db.get(User, dataset["ids"]["employee"])
+    db.expunge(employee)
+    db.close()
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: employee
+    app.dependency_overrides[get_current_user_role] = lambda: RoleType.EMPLOYEE
+    yield dataset["client"]
+    app.dependency_overrides.clear()
+
+
+def _update(model, row_id, **values):
+    from app.database import SessionLocal
+    db = SessionLocal()
+    db.query(model).filter(model.id == row_id).update(values)
+    db.commit()
+    db.close()
+
+
+def test_departments_conditional_get(dataset, statements):
+    from app.models.models import Department
+    client = dataset["client"]
+    first = client.get(DEPARTMENTS)
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "public, max-age=300"
+    assert any(d["id"] == dataset["ids"]["department"] for d in first.json())
+
+    statements.clear()
+    cached = client.get(DEPARTMENTS, headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == first.headers["etag"]
+    assert len(statements) == 1  # the row-version check only
+
+    _update(Department, dataset["ids"]["department"], description="changed by test_etag")
+    try:
+        changed = client.get(DEPARTMENTS, headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != first.headers["etag"]
+    finally:
+        _update(Department, dataset["ids"]["department"], description="created by the test fixtures")
+
+
+def test_departments_view_lists_every_department(dataset):
+    # GET /departments/view used to be answered by a placeholder handler registered
+    # first ({"message": "Departments endpoint"}); the department list answers now
+    from app.database import SessionLocal
+    from app.models.models import Department
+    db = SessionLocal()
+    try:
+        expected = [{"id": d.id, "name": d.name, "type": d.type.value, "description": d.description}
+                    for d in db.query(Department).order_by(Department.id)]
+    finally:
+        db.close()
+    response = dataset["client"].get(DEPARTMENTS)
+    assert response.status_code == 200
+    assert response.json() == expected
+    assert [route.path for route in dataset["app"].routes].count(DEPARTMENTS) == 1
+
+
+def test_profile_conditional_get(dataset, as_employee):
+    from app.models.models import User
+    first = as_employee.get(PROFILE)
+    assert first.status_code == 200
+    assert first.json()["employee_id"] == dataset["employee"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert first.headers["vary"] == "Authorization"
+    assert as_employee.get(PROFILE, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    _update(User, dataset["ids"]["employee"], first_name="Renamed")
+    try:
+        changed = as_employee.get(PROFILE, headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.json()["first_name"] == "Renamed"
+    finally:
+        _update(User, dataset["ids"]["employee"], first_name="employee")
+
+
+@pytest.mark.parametrize("path", CATALOG_ROUTES)
+def test_catalog_routes_follow_catalog_version(dataset, as_employee, statements, path):
+    from app.database import SessionLocal
+    from app.services.metric_catalog import bump_catalog_version, metric_catalog
+    first = as_employee.get(path)
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, max-age=60"
+
+    statements.clear()
+    assert as_employee.get(path, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert statements == []
+
+    db = SessionLocal()
+    bump_catalog_version(db)
+    db.commit()
+    db.close()
+    metric_catalog.invalidate()
+    changed = as_employee.get(path, headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert changed.json() == first.json()
+
+
+def test_department_metrics_list_definitions_of_the_type(dataset, as_employee):
+    response = as_employee.get("/api/v1/metrics/wellness-metrics")
+    assert [(m["id"], m["metric_type"]) for m in response.json()] == [(dataset["ids"]["metrics"][1], "wellness")]
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.models.models import RoleType
+
+EXPORT = "/api/v1/metric-records/department/employee-metrics/export"
+
+
+def _expected(dataset, metric_ids=None, year=None):
+    return sorted(
+        (dataset["employee"], metric.id, day.isoformat(), value)
+        for metric, day, value in dataset["records"]
+        if (metric_ids is None or metric.id in metric_ids) and (year is None or day.year == year)
+    )
+
+
+@pytest.mark.parametrize("params, pick_metrics, year", [
+    ({}, None, None),
+    ({"year": 2024}, None, 2024),
+    ({}, [0], None),
+    ({"year": 2024}, [0, 1], 2024),
+])
+def test_ndjson_export(dataset, as_role, params, pick_metrics, year):
+    metric_ids = [dataset["ids"]["metrics"][i] for i in pick_metrics] if pick_metrics else None
+    response = as_role(RoleType.SUPERVISOR).get(EXPORT, params={**params, "metric_id": metric_ids or []})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted((r["employee_id"], r["metric_id"], r["recorded_at"][:10], r["value_numeric"]) for r in rows) == \
+        _expected(dataset, metric_ids, year)
+    assert {r["metric_type"] for r in rows} <= {"performance", "wellness"}
+
+
+def test_csv_export(dataset, as_role):
+    response = as_role(RoleType.SUPERVISOR).get(EXPORT, params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="department-metrics.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted((r["employee_id"], int(r["metric_id"]), r["recorded_at"][:10], float(r["value_numeric"]))
+                  for r in rows) == _expected(dataset)
+
+
+def test_export_is_ordered_by_employee_then_time(dataset, as_role):
+    response = as_role(RoleType.SUPERVISOR).get(EXPORT)
+    recorded = [json.loads(line)["recorded_at"] for line in response.text.splitlines()]
+    assert recorded == sorted(recorded)
+
+
+def test_export_requires_supervisor(dataset, as_role):
+    assert as_role(RoleType.EMPLOYEE).get(EXPORT).status_code == 403
+
+
+def test_export_rejects_unknown_format(dataset, as_role):
+    assert as_role(RoleType.SUPERVISOR).get(EXPORT, params={"format": "xlsx"}).status_code == 422
@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.models.models import MetricTypeEnum, RoleType, User
+from app.services.metric_catalog import MetricCatalog, MetricCatalogSnapshot
+
+ROLE_ID = 10  # FINANCE_ANALYST: no seeded metric mappings
+
+
+def test_snapshot_lookups():
+    definitions = {
+        1: {"id": 1, "department_id": 7, "metric_type": MetricTypeEnum.PERFORMANCE},
+        2: {"id": 2, "department_id": 7, "metric_type": MetricTypeEnum.WELLNESS},
+        3: {"id": 3, "department_id": 8, "metric_type": MetricTypeEnum.WELLNESS},
+    }
+    snapshot = MetricCatalogSnapshot(version=1, definitions=definitions,
+                                     department_metric_ids={7: (1, 2), 8: (3,)},
+                                     role_metric_ids={5: frozenset({1, 2, 3})})
+    assert [d["id"] for d in snapshot.definitions_for(7, 5)] == [1, 2]
+    assert [d["id"] for d in snapshot.definitions_for(7, 5, "WELLNESS")] == [2]
+    assert snapshot.definitions_for(7, None) == []
+    assert snapshot.definitions_for(9, 5) == []
+    assert snapshot.metric_types(7, {1, 3, 99}) == {1: MetricTypeEnum.PERFORMANCE}
+
+
+@contextmanager
+def catalog_queries():
+    from app.database import engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "metric_definition" in statement or "catalog_versions" in statement:
+            seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture()
+def role_mappings(dataset):
+    from app.database import SessionLocal
+    from app.models.models import MetricDefinitionRole
+    from app.services.metric_catalog import bump_catalog_version, metric_catalog
+    db = SessionLocal()
+    db.add_all([MetricDefinitionRole(metric_id=metric_id, role_id=ROLE_ID) for metric_id in dataset["ids"]["metrics"]])
+    bump_catalog_version(db)
+    db.commit()
+    metric_catalog.invalidate()
+    yield db
+    db.query(MetricDefinitionRole).filter(MetricDefinitionRole.role_id == ROLE_ID).delete()
+    bump_catalog_version(db)
+    db.commit()
+    metric_catalog.invalidate()
+    db.close()
+
+
+@pytest.fixture()
+def as_mapped_employee(dataset):
+    from app.auth.deps import get_current_user, get_current_user_role
+    employee = User(id=dataset["ids"]["employee"], role_id=ROLE_ID, department_id=dataset["ids"]["department"])
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: employee
+    app.dependency_overrides[get_current_user_role] = lambda: RoleType.EMPLOYEE
+    yield dataset["client"]
+    app.dependency_overrides.clear()
+
+
+def test_routes_are_served_without_catalog_queries(dataset, role_mappings, as_mapped_employee):
+    metrics = dataset["ids"]["metrics"]
+    as_mapped_employee.get("/api/v1/metric-records/employee/available-metrics")  # loads the new version
+    with catalog_queries() as seen:
+        available = as_mapped_employee.get("/api/v1/metric-records/employee/available-metrics")
+        performance = as_mapped_employee.get("/api/v1/metric-records/employee/performance-metrics")
+        wellness = as_mapped_employee.get("/api/v1/metric-records/employee/wellness-metrics")
+    assert seen == []
+    assert [m["id"] for m in available.json()] == metrics
+    assert [(m["id"], m["metric_type"]) for m in performance.json()] == [(metrics[0], "performance")]
+    assert [(m["id"], m["metric_type"]) for m in wellness.json()] == [(metrics[1], "wellness")]
+
+
+def test_other_workers_reload_after_a_version_bump(dataset, role_mappings):
+    from app.services.metric_catalog import bump_catalog_version
+    worker = MetricCatalog(check_interval=3600)
+    before = worker.get(role_mappings)
+    assert {d["id"] for d in before.definitions_for(dataset["ids"]["department"], ROLE_ID)} == \
+        set(dataset["ids"]["metrics"])
+
+    from app.models.models import MetricDefinitionRole
+    role_mappings.query(MetricDefinitionRole).filter(
+        MetricDefinitionRole.role_id == ROLE_ID, MetricDefinitionRole.metric_id == dataset["ids"]["metrics"][1]
+    ).delete()
+    bump_catalog_version(role_mappings)
+    role_mappings.commit()
+
+    # Within the check interval the worker keeps serving its snapshot without queries
+    with catalog_queries() as seen:
+        assert worker.get(role_mappings) is before
+    assert seen == []
+
+    worker.invalidate()  # as if the check interval had passed
+    after = worker.get(role_mappings)
+    assert after.version == before.version + 1
+    assert [d["id"] for d in after.definitions_for(dataset["ids"]["department"], ROLE_ID)] == \
+        [dataset["ids"]["metrics"][0]]
+    assert worker.stats()["reloads"] == 2
+
+
+def test_sync_of_the_seeded_catalog_changes_nothing(dataset):
+    import json
+    import os
+    from app.database import SessionLocal
+    from app.services.metric_catalog import current_version, sync_catalog
+    from init_db import ROLE_METRIC_MAPPINGS
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "metric_definitions.json")) as file:
+        definitions = json.load(file)
+    pairs = [(metric_id, role_id) for (_, role_id), ids in ROLE_METRIC_MAPPINGS.items() for metric_id in ids]
+    db = SessionLocal()
+    try:
+        version = current_version(db)
+        with catalog_queries() as seen:
+            report = sync_catalog(db, definitions, pairs)
+        assert (report.added, report.updated, report.unchanged, report.mapped) == ([], [], len(definitions), 0)
+        assert len(seen) == 2  # the diff and one mapping INSERT; no version bump
+        assert current_version(db) == version
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def bulk_catalog(dataset):
+    from app.database import SessionLocal
+    from app.models.models import MetricDefinition, MetricDefinitionRole
+    from app.services.metric_catalog import bump_catalog_version
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    synced = MetricDefinition.metric_name.like("bulk metric %")
+    db.query(MetricDefinitionRole).filter(MetricDefinitionRole.metric_id.in_(
+        db.query(MetricDefinition.id).filter(synced).scalar_subquery()
+    )).delete(synchronize_session=False)
+    db.query(MetricDefinition).filter(synced).delete(synchronize_session=False)
+    bump_catalog_version(db)
+    db.commit()
+    db.close()
+
+
+def test_sync_applies_thousands_of_definitions_in_bulk(dataset, bulk_catalog):
+    from app.models.models import MetricDefinition
+    from app.services.metric_catalog import CATALOG_SYNC_CHUNK_ROWS, current_version, sync_catalog
+    db = bulk_catalog
+    count = 2 * CATALOG_SYNC_CHUNK_ROWS + 500
+    definitions = [
+        {"metric_name": f"bulk metric {i:05d}", "metric_description": "synced in bulk",
+         "metric_type": "Performance" if i % 2 else "Wellness", "department_id": dataset["ids"]["department"],
+         "unit": "Count", "metric_formula": None, "metric_formula_description": "", "is_aggregated": False,
+         "is_numeric": True, "value": ""}
+        for i in range(count)
+    ]
+    version = current_version(db)
+    with catalog_queries() as seen:
+        report = sync_catalog(db, definitions)
+    assert len(report.added) == count and report.updated == [] and report.mapped == 0
+    assert len(seen) == 5  # the diff, three multi-row INSERTs and the version bump
+    assert current_version(db) == version + 1
+
+    ids = dict(db.query(MetricDefinition.metric_name, MetricDefinition.id)
+               .filter(MetricDefinition.metric_name.like("bulk metric %")))
+    assert len(ids) == count
+    definitions[7] = {**definitions[7], "unit": "Hours"}
+    definitions[1500] = {**definitions[1500], "metric_type": "Wellness", "is_aggregated": True}
+    pairs = [(metric_id, ROLE_ID) for metric_id in ids.values()]
+    with catalog_queries() as seen:
+        report = sync_catalog(db, definitions, pairs)
+    assert report.added == [] and report.unchanged == count - 2 and report.mapped == count
+    assert report.updated == ["bulk metric 00007", "bulk metric 01500"]
+    assert len(seen) == 6  # the diff, one upsert, three mapping INSERTs and the version bump
+    changed = db.get(MetricDefinition, ids["bulk metric 01500"])
+    assert (changed.metric_type, changed.is_aggregated) == (MetricTypeEnum.WELLNESS, True)
+    assert db.get(MetricDefinition, ids["bulk metric 00007"]).unit == "Hours"
+
+    report = sync_catalog(db, definitions, pairs)
+    assert (report.added, report.updated, report.mapped) == ([], [], 0)
+    assert current_version(db) == version + 2
@@ -0,0 +1,128 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models.models import RoleType
+
+AGGREGATED = "/api/v1/metrics/employee/my-aggregated-metrics"
+
+
+@pytest.fixture()
+def db(dataset):
+    # Every write in these tests is rolled back, leaving the shared dataset untouched
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _latest(db, user_id):
+    from app.models.models import MetricLatest
+    return {row.metric_id: (row.value_numeric, row.recorded_at.date() if row.recorded_at else None)
+            for row in db.execute(select(MetricLatest).where(MetricLatest.user_id == user_id)).scalars()}
+
+
+def _submit(db, dataset, metric_index, day, value, hour=9):
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.models.models import MetricDefinition
+    user_id = dataset["ids"]["employee"]
+    metric = db.get(MetricDefinition, dataset["ids"]["metrics"][metric_index])
+    upsert_metric_records(db, [{
+        "user_id": user_id, "metric_id": metric.id, "metric_type": metric.metric_type,
+        "recorded_at": datetime.combine(day, time(hour), tzinfo=timezone.utc),
+        "value_numeric": value, "value_text": None, "value_json": None,
+    }])
+    refresh_rollups(db, [(user_id, metric.id, day)])
+
+
+def test_latest_after_fixture_writes(dataset, db):
+    first, second = dataset["ids"]["metrics"]
+    assert _latest(db, dataset["ids"]["employee"]) == {
+        first: (9.5, date(2024, 12, 31)),
+        second: (10.0, date(2025, 1, 1)),
+    }
+
+
+def test_latest_matches_distinct_on(dataset, db):
+    from app.crud.rollup import latest_records_select
+    from app.models.models import MetricRecord
+    user_id = dataset["ids"]["employee"]
+    rows = db.execute(latest_records_select().where(MetricRecord.user_id == user_id)).all()
+    assert {row.metric_id: (row.value_numeric, row.recorded_at.date()) for row in rows} == _latest(db, user_id)
+
+
+def test_backdated_submission_keeps_latest(dataset, db):
+    first, _ = dataset["ids"]["metrics"]
+    _submit(db, dataset, 0, date(2024, 7, 1), 42.0)
+    assert _latest(db, dataset["ids"]["employee"])[first] == (9.5, date(2024, 12, 31))
+
+
+def test_newer_and_same_day_submissions_replace_latest(dataset, db):
+    first, second = dataset["ids"]["metrics"]
+    _submit(db, dataset, 0, date(2025, 2, 1), 11.0)
+    assert _latest(db, dataset["ids"]["employee"])[first] == (11.0, date(2025, 2, 1))
+    # Same day again: the upsert updates the record in place
+    _submit(db, dataset, 0, date(2025, 2, 1), 12.0, hour=18)
+    latest = _latest(db, dataset["ids"]["employee"])
+    assert latest[first] == (12.0, date(2025, 2, 1))
+    assert latest[second] == (10.0, date(2025, 1, 1))
+
+
+def test_latest_follows_timestamp_not_write_order(dataset, db):
+    from app.crud.rollup import latest_records_select
+    from app.models.models import MetricDefinition, MetricRecord, MetricTypeEnum
+    user_id = dataset["ids"]["employee"]
+    metric = MetricDefinition(metric_name="order metric", metric_type=MetricTypeEnum.PERFORMANCE,
+                              department_id=dataset["ids"]["department"], unit="Count")
+    db.add(metric)
+    db.flush()
+    # Written newest first: the later ids carry older timestamps and must not win
+    for day, value in [(date(2024, 3, 3), 3.0), (date(2024, 3, 1), 1.0), (date(2024, 3, 2), 2.0)]:
+        db.add(MetricRecord(user_id=user_id, metric_id=metric.id, metric_type=metric.metric_type,
+                            value_numeric=value, recorded_at=datetime.combine(day, time(8), tzinfo=timezone.utc)))
+        db.flush()
+    statement = latest_records_select().where(MetricRecord.user_id == user_id, MetricRecord.metric_id == metric.id)
+    assert db.execute(statement).one().value_numeric == 3.0
+
+
+def test_undated_records_are_rejected(dataset, db):
+    # Each record belongs to the monthly partition of its recorded_date, so there are no
+    # undated records that could tie with each other
+    from sqlalchemy.exc import IntegrityError
+    from app.models.models import MetricRecord, MetricTypeEnum
+    first, _ = dataset["ids"]["metrics"]
+    db.add(MetricRecord(user_id=dataset["ids"]["employee"], metric_id=first,
+                        metric_type=MetricTypeEnum.PERFORMANCE, value_numeric=1.0))
+    with pytest.raises(IntegrityError):
+        db.flush()
+
+
+@pytest.mark.parametrize("params", [{}, {"year": 2024}, {"year": 2024, "month": 6}, {"start_date": "2024-06-01"}])
+def test_aggregated_metrics_latest_value(dataset, as_role, params):
+    response = as_role(RoleType.EMPLOYEE).get(AGGREGATED, params=params)
+    assert response.status_code == 200
+    metric_ids = [m["metric_id"] for m in response.json()]
+    assert len(metric_ids) == len(set(metric_ids))
+    first, second = dataset["ids"]["metrics"]
+    assert {m["metric_id"]: m["latest_value"] for m in response.json()} == \
+        {metric_id: value for metric_id, value in {first: 9.5, second: 10.0}.items() if metric_id in metric_ids}
+
+
+def test_latest_lookup_uses_index(dataset, db):
+    from app.crud.rollup import latest_records_select
+    from app.database import engine
+    from app.models.models import MetricRecord
+    statement = latest_records_select().where(MetricRecord.user_id == dataset["ids"]["employee"])
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    # On a table this small sorting a few rows is as cheap as anything; with sorts
+    # disabled the plan shows whether the index can deliver the DISTINCT ON order
+    for setting in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+        db.execute(text(f"SET LOCAL {setting} = off"))
+    plan = "\n".join(db.execute(text(f"EXPLAIN {compiled}")).scalars())
+    # Each monthly partition has its own copy of ix_metric_records_user_metric_latest;
+    # their ordered scans are merged
+    assert "_user_id_metric_id_recorded_at_id_idx" in plan
+    assert "Sort  (" not in plan
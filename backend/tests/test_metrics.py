@@ -0,0 +1,132 @@
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+# The read routes served from AsyncSession, called with real bearer tokens (so the
+# async principal dependency runs too) and compared with payloads worked out from the
+# dataset's records by hand.
+
+MY_METRICS = "/api/v1/metrics/employee/my-metrics"
+MY_AGGREGATES = "/api/v1/metrics/employee/my-aggregated-metrics"
+BY_DATE = "/api/v1/metrics/employee/metrics-by-date/{}"
+DEPARTMENT_METRICS = "/api/v1/metric-records/department/employee-metrics"
+DASHBOARD = "/api/v1/dashboard/view-aggregate-metrics"
+
+
+def _expected_record(metric, day, value):
+    return {"metric_id": metric.id, "metric_name": metric.metric_name, "metric_type": metric.metric_type.value,
+            "value_numeric": value, "value_text": None, "recorded_at": day.isoformat(), "unit": "Count"}
+
+
+def _records(dataset, first=date.min, last=date.max, metric_type=None):
+    return [(metric, day, value) for metric, day, value in dataset["records"]
+            if first <= day <= last and metric_type in (None, metric.metric_type.name)]
+
+
+def _newest_first(rows):
+    return [row["recorded_at"] for row in rows] == sorted((row["recorded_at"] for row in rows), reverse=True)
+
+
+def _without_ids(rows):
+    return sorted((tuple(sorted((k, v) for k, v in row.items() if k != "id")) for row in rows), key=repr)
+
+
+@pytest.mark.parametrize("params, first, last, metric_type", [
+    ({}, date.min, date.max, None),
+    ({"year": 2024}, date(2024, 1, 1), date(2024, 12, 31), None),
+    ({"start_date": "2024-01-01", "end_date": "2024-03-31"}, date(2024, 1, 1), date(2024, 3, 31), None),
+    ({"metric_type": "wellness"}, date.min, date.max, "WELLNESS"),
+])
+def test_my_metrics_payload(dataset, auth_headers, params, first, last, metric_type):
+    response = dataset["client"].get(MY_METRICS, params={**params, "unpaginated": True},
+                                     headers=auth_headers["employee"])
+    assert response.status_code == 200
+    rows = response.json()
+    assert _newest_first(rows)
+    assert len({row["id"] for row in rows}) == len(rows)
+    expected = [_expected_record(*record) for record in _records(dataset, first, last, metric_type)]
+    assert _without_ids(rows) == _without_ids(expected)
+
+
+@pytest.mark.parametrize("params, first, last", [
+    ({"year": 2024}, date(2024, 1, 1), date(2024, 12, 31)),
+    ({"month": 1, "year": 2024}, date(2024, 1, 1), date(2024, 1, 31)),
+    # Not whole months, so the daily rollups answer
+    ({"start_date": "2024-01-01", "end_date": "2024-06-09"}, date(2024, 1, 1), date(2024, 6, 9)),
+])
+def test_my_aggregated_metrics_payload(dataset, auth_headers, params, first, last):
+    response = dataset["client"].get(MY_AGGREGATES, params=params, headers=auth_headers["employee"])
+    assert response.status_code == 200
+
+    values, latest = defaultdict(list), {}
+    for metric, day, value in dataset["records"]:
+        latest[metric.id] = max(latest.get(metric.id, (day, value)), (day, value))
+        if first <= day <= last:
+            values[metric].append(value)
+    expected = {
+        metric.id: {"metric_id": metric.id, "metric_name": metric.metric_name,
+                    "metric_type": metric.metric_type.value, "avg_value": pytest.approx(sum(v) / len(v)),
+                    "min_value": min(v), "max_value": max(v), "count": len(v), "unit": "Count",
+                    # The latest value is over all time, not only the window
+                    "latest_value": latest[metric.id][1], "latest_text_value": None}
+        for metric, v in values.items()
+    }
+    assert {row["metric_id"]: row for row in response.json()} == expected
+
+
+@pytest.mark.parametrize("day", [date(2024, 1, 1), date(2023, 12, 31), date(2024, 6, 9), date(2024, 6, 8)])
+def test_metrics_by_date_payload(dataset, auth_headers, day):
+    response = dataset["client"].get(BY_DATE.format(day.isoformat()), headers=auth_headers["employee"])
+    assert response.status_code == 200
+    expected = [_expected_record(*record) for record in _records(dataset, day, day)]
+    assert _without_ids(response.json()) == _without_ids(expected)
+
+
+@pytest.mark.parametrize("params, first, last, metric_type", [
+    ({}, date.min, date.max, None),
+    ({"month": 6, "year": 2024}, date(2024, 6, 1), date(2024, 6, 30), None),
+    ({"metric_type": "PERFORMANCE", "year": 2024}, date(2024, 1, 1), date(2024, 12, 31), "PERFORMANCE"),
+])
+def test_department_employee_metrics_payload(dataset, auth_headers, params, first, last, metric_type):
+    response = dataset["client"].get(DEPARTMENT_METRICS, params={**params, "unpaginated": True},
+                                     headers=auth_headers["supervisor"])
+    assert response.status_code == 200
+    # Only the employee has records; the supervisor is not listed
+    [employee] = response.json()
+    assert (employee["employee_id"], employee["first_name"], employee["last_name"]) == \
+        (dataset["employee"], "employee", "Window")
+    assert _newest_first(employee["metrics"])
+    expected = [_expected_record(*record) for record in _records(dataset, first, last, metric_type)]
+    assert _without_ids(employee["metrics"]) == _without_ids(expected)
+
+
+@pytest.mark.parametrize("date_filter, first, last", [
+    ("2024", date(2024, 1, 1), date(2024, 12, 31)),
+    ("2024-Q2", date(2024, 4, 1), date(2024, 6, 30)),
+    ("2024-01-01", date(2024, 1, 1), date(2024, 1, 1)),
+    ("2023-12-31..2024-02-29", date(2023, 12, 31), date(2024, 2, 29)),
+])
+@pytest.mark.parametrize("metric_type", [None, "WELLNESS"])
+def test_dashboard_aggregate_payload(dataset, auth_headers, date_filter, first, last, metric_type):
+    params = {"date_filter": date_filter, **({"type": metric_type} if metric_type else {})}
+    # Twice: the second answer comes from the dashboard cache and must not differ
+    payloads = [dataset["client"].get(DASHBOARD, params=params, headers=auth_headers["supervisor"])
+                for _ in range(2)]
+    assert [response.status_code for response in payloads] == [200, 200]
+
+    totals = defaultdict(float)
+    for metric, day, value in _records(dataset, first, last, metric_type):
+        totals[(metric.metric_type.value, metric.metric_name)] += value
+    for response in payloads:
+        rows = response.json()
+        assert {(row["metric_type"], row["metric_name"]): row["total"] for row in rows} == totals
+        assert len(rows) == len(totals)
+
+
+def test_employee_routes_reject_supervisors(dataset, auth_headers):
+    for url in (MY_METRICS, MY_AGGREGATES, BY_DATE.format("2024-01-01")):
+        assert dataset["client"].get(url, headers=auth_headers["supervisor"]).status_code == 403
+    assert dataset["client"].get(DEPARTMENT_METRICS, headers=auth_headers["employee"]).status_code == 403
+    assert dataset["client"].get(DASHBOARD, params={"date_filter": "2024"},
+                                 headers=auth_headers["employee"]).status_code == 403
@@ -0,0 +1,93 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+from sqlalchemy import extract, func
+
+DETAILS = "/api/v1/metric-records/employee/{}/details"
+
+# Extra June 2024 values for the dataset's employee: several values per month and type,
+# and a text-only record that must not count towards the average
+EXTRA = [
+    (0, date(2024, 6, 15), 3.0, None),
+    (1, date(2024, 6, 20), 1.5, None),
+    (0, date(2024, 6, 21), None, "no number"),
+    (1, date(2024, 7, 31), 2.25, None),
+]
+
+
+@pytest.fixture()
+def db(dataset):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _raw_trend(db, user_id, year):
+    # The per-month avg() over metric_records that the trend used to run, one query
+    # for all months
+    from app.models.models import MetricRecord
+    month = extract("month", MetricRecord.recorded_date)
+    rows = db.query(month, MetricRecord.metric_type, func.avg(MetricRecord.value_numeric)).filter(
+        MetricRecord.user_id == user_id,
+        MetricRecord.recorded_date >= date(year, 1, 1),
+        MetricRecord.recorded_date < date(year + 1, 1, 1),
+        MetricRecord.value_numeric != None,
+    ).group_by(month, MetricRecord.metric_type).all()
+    averages = {(int(number), metric_type.name): value for number, metric_type, value in rows}
+    return [{
+        "month": number,
+        "avg_performance": round(averages.get((number, "PERFORMANCE"), 0), 2),
+        "avg_wellness": round(averages.get((number, "WELLNESS"), 0), 2),
+    } for number in range(1, 13)]
+
+
+def _add_extra(db, dataset):
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.models.models import MetricDefinition
+    user_id = dataset["ids"]["employee"]
+    rows = []
+    for index, day, value, text in EXTRA:
+        metric = db.get(MetricDefinition, dataset["ids"]["metrics"][index])
+        rows.append({"user_id": user_id, "metric_id": metric.id, "metric_type": metric.metric_type,
+                     "recorded_at": datetime.combine(day, time(10), tzinfo=timezone.utc),
+                     "value_numeric": value, "value_text": text, "value_json": None})
+    upsert_metric_records(db, rows)
+    refresh_rollups(db, [(user_id, row["metric_id"], row["recorded_at"].date()) for row in rows])
+
+
+@pytest.mark.parametrize("year", [2023, 2024, 2025, 2026])
+def test_trend_matches_raw_averages(dataset, db, year):
+    from app.crud.metric import monthly_metric_averages
+    user_id = dataset["ids"]["employee"]
+    assert monthly_metric_averages(db, user_id, year) == _raw_trend(db, user_id, year)
+
+
+def test_trend_of_the_fixture_year(dataset, db):
+    from app.crud.metric import monthly_metric_averages
+    trend = {row["month"]: (row["avg_performance"], row["avg_wellness"])
+             for row in monthly_metric_averages(db, dataset["ids"]["employee"], 2024)}
+    assert trend == {1: (2.0, 3.5), 2: (4.0, 0), 3: (0, 5.0), 4: (6.0, 0), 5: (0, 0), 6: (8.0, 7.0),
+                     7: (0, 0), 8: (0, 0), 9: (0, 0), 10: (0, 0), 11: (0, 0), 12: (9.5, 0)}
+
+
+def test_trend_averages_several_values_per_month(dataset, db):
+    from app.crud.metric import monthly_metric_averages
+    user_id = dataset["ids"]["employee"]
+    _add_extra(db, dataset)
+    trend = monthly_metric_averages(db, user_id, 2024)
+    assert trend == _raw_trend(db, user_id, 2024)
+    assert (trend[5]["avg_performance"], trend[5]["avg_wellness"]) == (5.5, 4.25)
+    assert trend[6]["avg_wellness"] == 2.25
+
+
+def test_employee_details_returns_the_trend(dataset, auth_headers, db):
+    from app.crud.metric import monthly_metric_averages
+    user_id = dataset["ids"]["employee"]
+    for params, year in [({"year": 2024}, 2024), ({}, datetime.now().year)]:
+        response = dataset["client"].get(DETAILS.format(dataset["employee"]), params=params,
+                                         headers=auth_headers["supervisor"])
+        assert response.status_code == 200
+        assert response.json()["monthly_metrics"] == monthly_metric_averages(db, user_id, year)
@@ -0,0 +1,73 @@
+import pytest
+
+from app.config import PAGE_SIZE_MAX
+from app.models.models import RoleType
+
+MY_METRICS = "/api/v1/metrics/employee/my-metrics"
+DEPARTMENT_METRICS = "/api/v1/metric-records/department/employee-metrics"
+
+
+def _walk(client, url, limit, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+        assert len(pages) <= 100, "pagination does not terminate"
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 9, 10, 11])
+@pytest.mark.parametrize("params", [{}, {"year": 2024}, {"metric_type": "PERFORMANCE"}])
+def test_my_metrics_pages_match_unpaginated(dataset, as_role, limit, params):
+    client = as_role(RoleType.EMPLOYEE)
+    everything = client.get(MY_METRICS, params={**params, "unpaginated": True}).json()
+    pages = _walk(client, MY_METRICS, limit, **params)
+    assert [m["id"] for page in pages for m in page] == [m["id"] for m in everything]
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize("limit", [1, 4, 10, 11])
+def test_department_metrics_pages_match_unpaginated(dataset, as_role, limit):
+    client = as_role(RoleType.SUPERVISOR)
+
+    def flatten(employees):
+        return [(e["employee_id"], m["metric_id"], m["recorded_at"]) for e in employees for m in e["metrics"]]
+
+    everything = client.get(DEPARTMENT_METRICS, params={"unpaginated": True}).json()
+    pages = _walk(client, DEPARTMENT_METRICS, limit)
+    assert [row for page in pages for row in flatten(page)] == flatten(everything)
+
+
+def test_users_keyset_pages(dataset):
+    from app.database import SessionLocal
+    from app.models.models import User
+    db = SessionLocal()
+    try:
+        all_ids = [user_id for user_id, in db.query(User.id).order_by(User.id)]
+    finally:
+        db.close()
+    pages = _walk(dataset["client"], "/api/v1/users/", 3)
+    assert [user["id"] for page in pages for user in page] == all_ids
+    # The plain list the route answered before it was paginated
+    everything = dataset["client"].get("/api/v1/users/", params={"unpaginated": True}).json()
+    assert [user["id"] for user in everything] == all_ids
+    assert everything == [user for page in pages for user in page]
+
+
+@pytest.mark.parametrize("url", [MY_METRICS, DEPARTMENT_METRICS, "/api/v1/users/"])
+@pytest.mark.parametrize("cursor", ["garbage", "WyJhIl0", "WyJub3QtYS1kYXRlIiwgMV0"])
+def test_invalid_cursor_is_rejected(dataset, as_role, url, cursor):
+    client = as_role(RoleType.SUPERVISOR if url == DEPARTMENT_METRICS else RoleType.EMPLOYEE)
+    assert client.get(url, params={"cursor": cursor}).status_code == 400
+
+
+@pytest.mark.parametrize("url", [MY_METRICS, DEPARTMENT_METRICS, "/api/v1/users/"])
+@pytest.mark.parametrize("limit", [0, PAGE_SIZE_MAX + 1])
+def test_page_size_is_capped(dataset, as_role, url, limit):
+    client = as_role(RoleType.SUPERVISOR if url == DEPARTMENT_METRICS else RoleType.EMPLOYEE)
+    assert client.get(url, params={"limit": limit}).status_code == 422
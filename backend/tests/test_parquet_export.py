@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+pa_dataset = pytest.importorskip("pyarrow.dataset")
+
+from app.services.parquet_export import MANIFEST, export_metric_snapshot, read_manifest  # noqa: E402
+
+
+@pytest.fixture()
+def db(dataset):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _department_rows(root, department_id):
+    table = pa_dataset.dataset(root, partitioning="hive").to_table(
+        filter=pa_dataset.field("department_id") == department_id)
+    return sorted(zip(table["metric_id"].to_pylist(), table["recorded_date"].to_pylist(),
+                      table["value_numeric"].to_pylist()))
+
+
+def _expected(dataset, since=None):
+    return sorted((metric.id, day, value) for metric, day, value in dataset["records"]
+                  if since is None or day >= since)
+
+
+def test_full_snapshot_is_partitioned_by_department_and_month(dataset, db, tmp_path):
+    report = export_metric_snapshot(db, str(tmp_path), chunk_rows=3)
+    department_dir = tmp_path / f"department_id={dataset['ids']['department']}"
+    assert sorted(os.listdir(department_dir)) == sorted(
+        {f"month={day:%Y-%m}" for metric, day, value in dataset["records"]})
+    assert _department_rows(str(tmp_path), dataset["ids"]["department"]) == _expected(dataset)
+    assert report["rows"] >= len(dataset["records"])
+    assert report["bytes"] == sum(path.stat().st_size for path in tmp_path.rglob("*.parquet"))
+    assert read_manifest(str(tmp_path))["exported_through"] == report["exported_through"]
+
+
+def test_incremental_run_only_appends_new_months(dataset, db, tmp_path):
+    export_metric_snapshot(db, str(tmp_path))
+    before = {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*.parquet")}
+    report = export_metric_snapshot(db, str(tmp_path), incremental=True)
+    assert (report["rows"], report["files"]) == (0, 0)
+    assert {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*.parquet")} == before
+
+
+def test_since_rewrites_from_that_month(dataset, db, tmp_path):
+    from datetime import date
+    export_metric_snapshot(db, str(tmp_path), since="2024-06")
+    assert _department_rows(str(tmp_path), dataset["ids"]["department"]) == _expected(dataset, date(2024, 6, 1))
+    # A partial snapshot does not claim to cover the months before it
+    assert "exported_through" not in read_manifest(str(tmp_path))
+
+    export_metric_snapshot(db, str(tmp_path))
+    export_metric_snapshot(db, str(tmp_path), since="2024-06")
+    assert _department_rows(str(tmp_path), dataset["ids"]["department"]) == _expected(dataset)
+    with open(tmp_path / MANIFEST) as file:
+        assert json.load(file)["last_run"]["from_month"] == "2024-06"
+
+
+def test_a_partition_reopened_in_one_run_gets_another_file(tmp_path):
+    from datetime import date, datetime, timezone
+    from app.services.parquet_export import _PartitionWriter
+    row = (1, 2, "E1", 3, "metric", "performance", "Count", 1.0, None, None,
+           datetime(2021, 2, 1, tzinfo=timezone.utc), date(2021, 2, 1))
+    writer = _PartitionWriter(str(tmp_path))
+    for key in [(5, "2021-02"), (5, "2021-03"), (5, "2021-02")]:
+        writer.write(key, [row])
+    writer.close()
+    assert sorted(path.name for path in (tmp_path / "department_id=5" / "month=2021-02").iterdir()) == \
+        ["part-0.parquet", "part-1.parquet"]
+    assert writer.files == 3
@@ -0,0 +1,224 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from app.services.partitions import add_months, partition_name, retention_cutoff
+from app.utils.time_window import TimeWindow
+
+TODAY = date(2026, 10, 17)
+
+
+# ---------- month arithmetic (no database needed) ----------
+
+@pytest.mark.parametrize("month, count, expected", [
+    (date(2024, 1, 1), 0, date(2024, 1, 1)),
+    (date(2024, 1, 1), 1, date(2024, 2, 1)),
+    (date(2024, 12, 1), 1, date(2025, 1, 1)),
+    (date(2024, 1, 1), -1, date(2023, 12, 1)),
+    (date(2024, 3, 1), -27, date(2021, 12, 1)),
+])
+def test_add_months(month, count, expected):
+    assert add_months(month, count) == expected
+
+
+def test_partition_name():
+    assert partition_name(date(2024, 6, 1)) == "metric_records_y2024m06"
+
+
+@pytest.mark.parametrize("retain, cutoff", [(0, None), (1, date(2026, 9, 1)), (12, date(2025, 10, 1))])
+def test_retention_cutoff(retain, cutoff):
+    assert retention_cutoff(TODAY, retain) == cutoff
+
+
+# ---------- against Postgres (fixtures in conftest.py) ----------
+
+@pytest.fixture(scope="module")
+def partitioned(dataset):
+    # Gives the fixture's months (2023-12 .. 2025-01) partitions of their own, as the
+    # maintenance job would after backdated submissions land in the default partition
+    from app.database import SessionLocal
+    from app.services.partitions import ensure_partitions, is_partitioned
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            pytest.skip("metric_records is not partitioned")
+        ensure_partitions(db)
+        db.commit()
+    finally:
+        db.close()
+    return dataset
+
+
+@pytest.fixture()
+def db(partitioned):
+    # Partition DDL is transactional: everything below is rolled back
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _insert(db, dataset, day):
+    from app.crud.metric import upsert_metric_records
+    from app.models.models import MetricTypeEnum
+    upsert_metric_records(db, [{
+        "user_id": dataset["ids"]["employee"], "metric_id": dataset["ids"]["metrics"][0],
+        "metric_type": MetricTypeEnum.PERFORMANCE,
+        "recorded_at": datetime.combine(day, time(12), tzinfo=timezone.utc),
+        "value_numeric": 1.0, "value_text": None, "value_json": None,
+    }])
+
+
+def _count(db, table, day):
+    from sqlalchemy import text
+    return db.scalar(text(f"SELECT count(*) FROM {table} WHERE recorded_date = :day"), {"day": day})
+
+
+def test_fixture_months_are_contiguous(db):
+    from app.services.partitions import list_partitions
+    months = [partition.start for partition in list_partitions(db) if not partition.default]
+    assert date(2023, 12, 1) in months and date(2025, 1, 1) in months
+    assert months == [add_months(months[0], i) for i in range(len(months))]
+    assert months[-1] >= add_months(datetime.now(timezone.utc).date().replace(day=1), 3)
+
+
+def test_ensure_moves_default_rows_into_new_partitions(partitioned, db):
+    from app.services.partitions import DEFAULT_PARTITION, ensure_partitions
+    day = date(2019, 5, 20)
+    _insert(db, partitioned, day)
+    assert _count(db, DEFAULT_PARTITION, day) == 1
+
+    created = ensure_partitions(db, today=TODAY)
+    # 2019-05 and every month up to the fixture's first partition
+    assert created[0] == "metric_records_y2019m05"
+    assert created[-1] == "metric_records_y2023m11"
+    assert _count(db, DEFAULT_PARTITION, day) == 0
+    assert _count(db, "metric_records_y2019m05", day) == 1
+    assert ensure_partitions(db, today=TODAY) == []
+
+
+def test_missing_partitions_lists_upcoming_months_only(partitioned, db):
+    from app.services.partitions import ensure_partitions, missing_partitions
+    later = date(2031, 2, 10)
+    assert missing_partitions(db, today=later, ahead=2) == [date(2031, 2, 1), date(2031, 3, 1), date(2031, 4, 1)]
+    ensure_partitions(db, today=later, ahead=1)
+    assert missing_partitions(db, today=later, ahead=2) == [date(2031, 4, 1)]
+    assert missing_partitions(db, today=later, ahead=1) == []
+
+
+def test_ensure_leaves_rows_before_retention_in_default(partitioned, db):
+    from app.services.partitions import DEFAULT_PARTITION, ensure_partitions
+    day = date(2019, 5, 20)
+    _insert(db, partitioned, day)
+    assert ensure_partitions(db, today=TODAY, retain_months=12) == []
+    assert _count(db, DEFAULT_PARTITION, day) == 1
+
+
+def test_detach_keeps_rows_in_a_standalone_table(partitioned, db):
+    from sqlalchemy import text
+    from app.services.partitions import detach_partitions, ensure_partitions, list_partitions
+    day = date(2019, 5, 20)
+    _insert(db, partitioned, day)
+    ensure_partitions(db, today=TODAY)
+
+    detached = detach_partitions(db, date(2019, 7, 1))
+    assert detached == ["metric_records_y2019m05", "metric_records_y2019m06"]
+    assert "metric_records_y2019m05" not in {partition.name for partition in list_partitions(db)}
+    assert _count(db, "metric_records", day) == 0
+    assert _count(db, "metric_records_y2019m05", day) == 1
+    assert db.scalar(text("SELECT relispartition FROM pg_class WHERE relname = 'metric_records_y2019m05'")) is False
+
+
+def _scanned(db, statement, analyze=False):
+    """Partitions of metric_records (and other tables) that the plan of statement reads.
+
+    With analyze, only those actually read when it runs, leaving out the partitions
+    pruned at run time.
+    """
+    from sqlalchemy import text
+    from app.database import engine
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN ({'ANALYZE, ' if analyze else ''}FORMAT JSON) {compiled}")).scalar()
+    relations = set()
+
+    def walk(node):
+        if "Relation Name" in node and node.get("Actual Loops", 1):
+            relations.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return relations
+
+
+def _record_partitions(relations):
+    return {name for name in relations if name.startswith("metric_records")}
+
+
+@pytest.mark.parametrize("window, expected", [
+    (TimeWindow.month(2024, 6), {"metric_records_y2024m06"}),
+    (TimeWindow.day(date(2024, 2, 29)), {"metric_records_y2024m02"}),
+    (TimeWindow.between(date(2024, 3, 31), date(2024, 4, 1)), {"metric_records_y2024m03", "metric_records_y2024m04"}),
+    (TimeWindow.quarter(2024, 1), {f"metric_records_y2024m{m:02d}" for m in (1, 2, 3)}),
+    (TimeWindow.year(2024), {f"metric_records_y2024m{m:02d}" for m in range(1, 13)}),
+])
+def test_my_metrics_prunes_partitions(partitioned, db, window, expected):
+    from app.routes.metrics import build_my_metrics_query
+    statement = build_my_metrics_query(partitioned["ids"]["employee"], None, window)
+    assert _record_partitions(_scanned(db, statement)) == expected
+
+
+def test_my_metrics_keyset_page_skips_newer_partitions(partitioned, db):
+    from sqlalchemy import tuple_
+    from app.models.models import MetricRecord
+    from app.routes.metrics import build_my_metrics_query
+    after = datetime(2024, 3, 31, 23, tzinfo=timezone.utc)
+    statement = build_my_metrics_query(partitioned["ids"]["employee"], None, TimeWindow()).where(
+        tuple_(MetricRecord.recorded_at, MetricRecord.id) < tuple_(after, 10**9),
+        MetricRecord.recorded_date <= after.date(),
+    )
+    scanned = _record_partitions(_scanned(db, statement))
+    assert "metric_records_y2024m03" in scanned
+    assert not {"metric_records_y2024m04", "metric_records_y2025m01"} & scanned
+
+
+def test_metrics_by_date_prunes_partitions(partitioned, db):
+    from app.routes.metrics import build_metrics_by_date_query
+    statement = build_metrics_by_date_query(partitioned["ids"]["employee"], date(2024, 6, 10), "PERFORMANCE")
+    assert _record_partitions(_scanned(db, statement)) == {"metric_records_y2024m06"}
+
+
+@pytest.mark.parametrize("as_of, expected", [
+    # Later than every record: metric_latest answers alone
+    (date(2025, 6, 1), set()),
+    (date(2025, 1, 1), set()),
+    # Each metric's value is looked up from the last month before June with values
+    # (April and March), not over the whole history
+    (date(2024, 6, 10), {f"metric_records_y2024m{m:02d}" for m in (3, 4, 5, 6)}),
+    (date(2024, 1, 1), {"metric_records_y2023m12", "metric_records_y2024m01"}),
+])
+def test_department_latest_values_read_recent_partitions(partitioned, db, as_of, expected):
+    from app.crud.metric import department_latest_values_query
+    statement = department_latest_values_query(partitioned["ids"]["department"], as_of)
+    scanned = _scanned(db, statement, analyze=True)
+    assert _record_partitions(scanned) == expected
+    assert "metric_latest" in scanned
+
+
+@pytest.mark.parametrize("date_filter", ["2024-06-10", "2024-W23", "2024-06", "2024-Q2", "2024"])
+def test_dashboard_reads_rollups_only(partitioned, db, date_filter):
+    from app.routes.dashboards import build_aggregated_metrics_query
+    scanned = _scanned(db, build_aggregated_metrics_query(partitioned["ids"]["department"], None, date_filter))
+    assert not _record_partitions(scanned)
+    assert scanned & {"metric_daily_rollups", "metric_monthly_rollups"}
+
+
+def test_partitioned_routes_return_the_fixture(partitioned, as_role):
+    from app.models.models import RoleType
+    response = as_role(RoleType.EMPLOYEE).get("/api/v1/metrics/employee/my-metrics", params={"limit": 3})
+    first = response.json()
+    assert [item["recorded_at"] for item in first["items"]] == ["2025-01-01", "2024-12-31", "2024-06-10"]
+    response = as_role(RoleType.EMPLOYEE).get("/api/v1/metrics/employee/my-metrics",
+                                              params={"limit": 3, "cursor": first["next_cursor"]})
+    assert [item["recorded_at"] for item in response.json()["items"]] == ["2024-06-09", "2024-04-01", "2024-03-31"]
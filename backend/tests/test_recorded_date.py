@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.models.models import utc_day
+
+# (user_id, metric_id, recorded_at, UTC day); offsets other than UTC and a session time
+# zone west of UTC make sure the day is taken in UTC
+ROWS = [
+    (1, 1, "2023-12-31 23:59:59+00", date(2023, 12, 31)),
+    (1, 1, "2024-01-01 00:00:00+00", date(2024, 1, 1)),
+    (1, 2, "2024-01-01 01:30:00+02", date(2023, 12, 31)),
+    (1, 2, "2024-02-29 19:00:00-05", date(2024, 3, 1)),
+    (2, 1, "2024-06-30 23:00:00-07", date(2024, 7, 1)),
+    (2, 2, None, None),
+]
+
+
+def test_utc_day():
+    assert utc_day(datetime(2024, 1, 1, 1, 30, tzinfo=timezone(timedelta(hours=2)))) == date(2023, 12, 31)
+    assert utc_day(datetime(2024, 2, 29, 19, tzinfo=timezone(timedelta(hours=-5)))) == date(2024, 3, 1)
+    # Naive values are taken as UTC
+    assert utc_day(datetime(2024, 1, 1, 0, 0)) == date(2024, 1, 1)
+    assert utc_day(None) is None
+
+
+@pytest.fixture()
+def scratch(dataset):
+    # metric_records as it was before the per-day unique index, in a schema of its own;
+    # the whole transaction is rolled back
+    from app.database import engine
+    connection = engine.connect()
+    transaction = connection.begin()
+    connection.execute(text("CREATE SCHEMA recorded_date_backfill"))
+    connection.execute(text("SET LOCAL search_path TO recorded_date_backfill, public"))
+    connection.execute(text("SET LOCAL TimeZone TO 'America/Los_Angeles'"))
+    connection.execute(text("""
+        CREATE TABLE metric_records (
+            id serial PRIMARY KEY, user_id integer, metric_id integer, metric_type text,
+            value_numeric double precision, value_json json, value_text text,
+            recorded_at timestamp with time zone, notes text
+        )
+    """))
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+def _insert(connection, user_id, metric_id, recorded_at, value=1.0):
+    return connection.scalar(text(
+        "INSERT INTO metric_records (user_id, metric_id, metric_type, value_numeric, recorded_at) "
+        "VALUES (:user_id, :metric_id, 'PERFORMANCE', :value, CAST(:recorded_at AS timestamptz)) RETURNING id"
+    ), {"user_id": user_id, "metric_id": metric_id, "value": value, "recorded_at": recorded_at})
+
+
+def test_migrations_backfill_recorded_date(scratch, upgrade, caplog):
+    from sqlalchemy.exc import IntegrityError
+    expected = {_insert(scratch, user_id, metric_id, recorded_at): day for user_id, metric_id, recorded_at, day in ROWS}
+    # Same user, metric and UTC day: the per-day migration merges them into the first
+    # record, each value taking the latest non-null one, as upsert_metric_records does
+    first = _insert(scratch, 3, 1, "2024-03-10 08:00:00+00", 1.0)
+    second = _insert(scratch, 3, 1, "2024-03-09 21:00:00-05", 2.0)
+    third = _insert(scratch, 3, 1, "2024-03-10 12:00:00+00", None)
+    scratch.execute(text("UPDATE metric_records SET value_text = 'note', notes = 'kept' WHERE id = :id"),
+                    {"id": third})
+    expected[first] = date(2024, 3, 10)
+
+    with caplog.at_level("WARNING"):
+        upgrade(scratch, "131c79ed59ae")
+    assert "Merging 2 duplicate metric records into 1 (user_id, metric_id, day) keys: (3, 1, 2024-03-10)" \
+        in caplog.text
+    upgrade(scratch, "cb71f8a6193e")
+
+    rows = scratch.execute(text("SELECT id, recorded_at, recorded_date FROM metric_records")).all()
+    assert {row.id: row.recorded_date for row in rows} == expected
+    merged = scratch.execute(text("SELECT recorded_at, value_numeric, value_text, notes FROM metric_records "
+                                  "WHERE id = :id"), {"id": first}).one()
+    assert merged == (datetime(2024, 3, 10, 8, tzinfo=timezone.utc), 2.0, "note", "kept")
+    # The application computes the same day for the partition key of new rows
+    assert all(row.recorded_date == utc_day(row.recorded_at) for row in rows)
+
+    # New rows get theirs too, and the unique index is on the stored column
+    assert scratch.scalar(text("SELECT recorded_date FROM metric_records WHERE id = :id"),
+                          {"id": _insert(scratch, 4, 1, "2024-05-01 00:30:00+01")}) == date(2024, 4, 30)
+    indexes = set(scratch.scalars(text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = 'recorded_date_backfill' AND tablename = 'metric_records'"
+    )))
+    assert "CREATE UNIQUE INDEX uq_metric_records_user_metric_day ON recorded_date_backfill.metric_records " \
+           "USING btree (user_id, metric_id, recorded_date)" in indexes
+    with pytest.raises(IntegrityError):
+        with scratch.begin_nested():
+            _insert(scratch, 4, 1, "2024-04-30 23:00:00+00")
+
+
+def test_orm_inserts_fill_recorded_date(dataset):
+    from app.database import SessionLocal
+    from app.models.models import MetricRecord, MetricTypeEnum
+    db = SessionLocal()
+    try:
+        record = MetricRecord(user_id=dataset["ids"]["employee"], metric_id=dataset["ids"]["metrics"][0],
+                              metric_type=MetricTypeEnum.PERFORMANCE, value_numeric=1.0,
+                              recorded_at=datetime(2024, 8, 1, 1, 30, tzinfo=timezone(timedelta(hours=2))))
+        db.add(record)
+        # The check constraint rejects a day that does not match recorded_at
+        db.flush()
+        assert record.recorded_date == date(2024, 7, 31)
+    finally:
+        db.rollback()
+        db.close()
@@ -0,0 +1,148 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+
+@pytest.fixture()
+def db(dataset):
+    # Every write in these tests is rolled back, leaving the shared dataset untouched
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _expected(db, user_id):
+    # Daily and monthly rollups worked out from the raw records, in Python
+    from app.models.models import MetricRecord, User
+    rows = db.execute(select(User.department_id, MetricRecord.metric_id, MetricRecord.metric_type,
+                             MetricRecord.recorded_date, MetricRecord.value_numeric)
+                      .join(User, User.id == MetricRecord.user_id).where(MetricRecord.user_id == user_id)).all()
+    grains = {"day": {}, "month": {}}
+    for department_id, metric_id, metric_type, day, value in rows:
+        for grain, period in (("day", day), ("month", day.replace(day=1))):
+            values = grains[grain].setdefault((metric_id, period), (department_id, metric_type, []))[2]
+            values.append(value)
+    return {
+        grain: {
+            key: (department_id, metric_type, len(values), len(numbers := [v for v in values if v is not None]),
+                  sum(numbers) if numbers else None, min(numbers, default=None), max(numbers, default=None))
+            for key, (department_id, metric_type, values) in keys.items()
+        }
+        for grain, keys in grains.items()
+    }
+
+
+def _rollups(db, user_id):
+    from app.models.models import MetricDailyRollup, MetricMonthlyRollup
+    db.expire_all()
+    return {
+        grain: {
+            (row.metric_id, getattr(row, grain)): (row.department_id, row.metric_type, row.record_count,
+                                                   row.value_count, row.value_sum, row.value_min, row.value_max)
+            for row in db.execute(select(model).where(model.user_id == user_id)).scalars()
+        }
+        for grain, model in (("day", MetricDailyRollup), ("month", MetricMonthlyRollup))
+    }
+
+
+def _write(db, dataset, *records):
+    from app.crud.metric import upsert_metric_records
+    from app.crud.rollup import refresh_rollups
+    from app.models.models import MetricDefinition
+    user_id = dataset["ids"]["employee"]
+    rows = []
+    for index, day, value, note in records:
+        metric = db.get(MetricDefinition, dataset["ids"]["metrics"][index])
+        rows.append({"user_id": user_id, "metric_id": metric.id, "metric_type": metric.metric_type,
+                     "recorded_at": datetime.combine(day, time(12), tzinfo=timezone.utc),
+                     "value_numeric": value, "value_text": note, "value_json": None})
+    upsert_metric_records(db, rows)
+    refresh_rollups(db, [(user_id, row["metric_id"], row["recorded_at"].date()) for row in rows])
+
+
+def test_fixture_rollups_match_records(dataset, db):
+    user_id = dataset["ids"]["employee"]
+    rollups = _rollups(db, user_id)
+    assert rollups == _expected(db, user_id)
+    # One daily row per fixture record; the year boundary splits December and January
+    assert len(rollups["day"]) == len(dataset["records"])
+    first = dataset["ids"]["metrics"][0]
+    assert rollups["month"][(first, date(2023, 12, 1))][2:] == (1, 1, 1.0, 1.0, 1.0)
+    assert rollups["month"][(first, date(2024, 6, 1))][2:] == (1, 1, 8.0, 8.0, 8.0)
+
+
+def test_refresh_follows_updates_and_new_records(dataset, db):
+    user_id = dataset["ids"]["employee"]
+    first = dataset["ids"]["metrics"][0]
+    before = _rollups(db, user_id)
+    _write(db, dataset,
+           # June's maximum shrinks below another June value
+           (0, date(2024, 6, 10), 0.5, None),
+           (0, date(2024, 6, 12), 3.0, None),
+           # Counts as a record but not as a value
+           (0, date(2024, 6, 13), None, "text only"),
+           # A new month
+           (1, date(2024, 9, 1), 4.0, None))
+    after = _rollups(db, user_id)
+    assert after == _expected(db, user_id)
+    assert after["month"][(first, date(2024, 6, 1))][2:] == (3, 2, 3.5, 0.5, 3.0)
+    # Nothing outside the touched keys moved
+    touched = {(first, date(2024, 6, 10)), (first, date(2024, 6, 12)), (first, date(2024, 6, 13)),
+               (dataset["ids"]["metrics"][1], date(2024, 9, 1))}
+    assert {key: row for key, row in after["day"].items() if key not in touched} == \
+        {key: row for key, row in before["day"].items() if key not in touched}
+
+
+def test_refresh_of_an_unchanged_day_is_a_no_op(dataset, db):
+    from app.crud.rollup import refresh_rollups
+    user_id = dataset["ids"]["employee"]
+    before = _rollups(db, user_id)
+    refresh_rollups(db, [(user_id, metric.id, day) for metric, day, _ in dataset["records"]])
+    assert _rollups(db, user_id) == before
+
+
+def test_rebuild_repairs_drifted_rollups(dataset, db):
+    from app.crud.rollup import rebuild_user_rollups
+    from app.models.models import MetricDailyRollup, MetricLatest, MetricMonthlyRollup
+    user_id = dataset["ids"]["employee"]
+    first, second = dataset["ids"]["metrics"]
+    expected_latest = {row.metric_id: row.record_id for row in db.execute(
+        select(MetricLatest).where(MetricLatest.user_id == user_id)).scalars()}
+
+    db.execute(MetricDailyRollup.__table__.delete().where(MetricDailyRollup.user_id == user_id,
+                                                           MetricDailyRollup.metric_id == second))
+    db.execute(MetricMonthlyRollup.__table__.update().where(MetricMonthlyRollup.user_id == user_id)
+               .values(value_sum=MetricMonthlyRollup.value_sum + 100))
+    db.add(MetricDailyRollup(user_id=user_id, metric_id=first, day=date(2022, 5, 5),
+                             department_id=dataset["ids"]["department"], metric_type="PERFORMANCE",
+                             record_count=1, value_count=1, value_sum=1.0, value_min=1.0, value_max=1.0))
+    db.execute(MetricLatest.__table__.delete().where(MetricLatest.user_id == user_id))
+    db.flush()
+
+    rebuild_user_rollups(db, [user_id])
+    assert _rollups(db, user_id) == _expected(db, user_id)
+    assert {row.metric_id: row.record_id for row in db.execute(
+        select(MetricLatest).where(MetricLatest.user_id == user_id)).scalars()} == expected_latest
+
+
+def test_migration_fill_matches_incremental_rollups(dataset, db, upgrade):
+    # The initial fill of the rollup migration, run over a copy of the employee's
+    # records in a scratch schema, gives the rows the write paths maintained
+    user_id = dataset["ids"]["employee"]
+    connection = db.connection()
+    connection.execute(text("CREATE SCHEMA rollup_backfill"))
+    connection.execute(text("SET LOCAL search_path TO rollup_backfill, public"))
+    connection.execute(text("CREATE TABLE metric_records AS SELECT * FROM public.metric_records WHERE user_id = :user_id"),
+                       {"user_id": user_id})
+    upgrade(connection, "080696cd9c8f")
+
+    columns = "metric_id, department_id, metric_type, record_count, value_count, value_sum, value_min, value_max"
+    for table, period in (("metric_daily_rollups", "day"), ("metric_monthly_rollups", "month")):
+        query = f"SELECT {period}, {columns} FROM {{}}.{table} WHERE user_id = :user_id ORDER BY metric_id, {period}"
+        filled = connection.execute(text(query.format("rollup_backfill")), {"user_id": user_id}).all()
+        maintained = connection.execute(text(query.format("public")), {"user_id": user_id}).all()
+        assert filled == maintained
+        assert len(filled) > 0
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.scheduler import CronTrigger, IntervalTrigger
+
+NOW = datetime(2026, 10, 17, 10, 7, 30, tzinfo=timezone.utc)  # a Saturday
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+# ---------- triggers (no database needed) ----------
+
+@pytest.mark.parametrize("expression, expected", [
+    ("* * * * *", _utc(2026, 10, 17, 10, 8)),
+    ("*/15 * * * *", _utc(2026, 10, 17, 10, 15)),
+    ("7 10 * * *", _utc(2026, 10, 18, 10, 7)),
+    ("15 2 * * *", _utc(2026, 10, 18, 2, 15)),
+    ("0 9 * * 1-5", _utc(2026, 10, 19, 9, 0)),
+    ("30 3 * * 7", _utc(2026, 10, 18, 3, 30)),
+    ("0 0 1,20 * *", _utc(2026, 10, 20, 0, 0)),
+    ("0 0 1 * 0", _utc(2026, 10, 18, 0, 0)),  # day or weekday
+    ("5/20 12-14 * * *", _utc(2026, 10, 17, 12, 5)),
+    ("0 0 1 1 *", _utc(2027, 1, 1, 0, 0)),
+    ("0 0 29 2 *", _utc(2028, 2, 29, 0, 0)),
+])
+def test_cron_next_after(expression, expected):
+    assert CronTrigger(expression).next_after(NOW) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *", "* * 0 * *", "a * * * *",
+])
+def test_cron_rejects(expression):
+    with pytest.raises(ValueError):
+        CronTrigger(expression)
+
+
+def test_cron_that_never_fires():
+    with pytest.raises(ValueError):
+        CronTrigger("0 0 31 2 *").next_after(NOW)
+
+
+def test_interval_trigger():
+    assert IntervalTrigger(90).next_after(NOW) == _utc(2026, 10, 17, 10, 9)
+    with pytest.raises(ValueError):
+        IntervalTrigger(0)
+
+
+# ---------- against Postgres (fixtures in conftest.py) ----------
+
+JOB_PREFIX = "test scheduler "
+
+
+@pytest.fixture()
+def job_runs(dataset):
+    from app.database import SessionLocal
+    from app.models.models import JobRun
+    db = SessionLocal()
+    yield db
+    db.rollback()
+    db.query(JobRun).filter(JobRun.job_name.startswith(JOB_PREFIX)).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def _runs(db, name):
+    from app.models.models import JobRun
+    db.rollback()
+    return db.query(JobRun).filter(JobRun.job_name == name).order_by(JobRun.id).all()
+
+
+def test_runs_are_recorded_with_failures_and_timeouts(job_runs):
+    from sqlalchemy import text
+    from app.services.scheduler import Scheduler
+    threads = []
+
+    def succeed(db):
+        threads.append(threading.current_thread().name)
+        db.execute(text("SELECT 1"))
+
+    def fail(db):
+        raise ValueError("boom")
+
+    def hang(db):
+        db.execute(text("SELECT pg_sleep(10)"))
+
+    scheduler = Scheduler(lock_key=9101, leader_retry_seconds=0.05)
+    for name, func, timeout in [("ok", succeed, 5), ("fail", fail, 5), ("hang", hang, 0.3)]:
+        scheduler.add_job(JOB_PREFIX + name, func, IntervalTrigger(3600), timeout=timeout)
+
+    async def main():
+        scheduler.start()
+        try:
+            statuses = [await scheduler.run_job(scheduler.jobs[JOB_PREFIX + name]) for name in ("ok", "fail", "hang")]
+            # statement_timeout cancels the hung query right after the run was given up
+            started = time.monotonic()
+            while not scheduler._running[JOB_PREFIX + "hang"].done() and time.monotonic() - started < 5:
+                await asyncio.sleep(0.05)
+            return statuses, scheduler._running[JOB_PREFIX + "hang"].done()
+        finally:
+            await scheduler.stop()
+
+    statuses, hang_finished = asyncio.run(main())
+    assert statuses == ["succeeded", "failed", "timed_out"]
+    assert hang_finished
+    assert threads and threads[0].startswith("scheduler")
+
+    ok, = _runs(job_runs, JOB_PREFIX + "ok")
+    assert (ok.status, ok.error, ok.worker) == ("succeeded", None, scheduler.worker)
+    assert ok.duration_ms >= 0 and ok.finished_at >= ok.started_at
+    failed, = _runs(job_runs, JOB_PREFIX + "fail")
+    assert (failed.status, failed.error) == ("failed", "ValueError: boom")
+    timed_out, = _runs(job_runs, JOB_PREFIX + "hang")
+    assert timed_out.status == "timed_out" and 300 <= timed_out.duration_ms < 5000
+
+
+def test_only_the_leader_runs_scheduled_jobs(job_runs):
+    from app.services.scheduler import Scheduler
+    ran = {"first": 0, "second": 0}
+    schedulers = {}
+    for name in ran:
+        schedulers[name] = Scheduler(lock_key=9102, leader_retry_seconds=0.05)
+
+        def job(db, name=name):
+            ran[name] += 1
+
+        schedulers[name].add_job(JOB_PREFIX + "tick", job, IntervalTrigger(0.1))
+
+    async def wait_for_leader():
+        started = time.monotonic()
+        while time.monotonic() - started < 5:
+            leaders = [name for name, scheduler in schedulers.items() if scheduler.is_leader]
+            if leaders:
+                return leaders
+            await asyncio.sleep(0.02)
+        return []
+
+    async def main():
+        for scheduler in schedulers.values():
+            scheduler.start()
+        try:
+            leaders = await wait_for_leader()
+            await asyncio.sleep(0.5)
+            counts = dict(ran)
+            # The other worker takes over once the leader is gone
+            await schedulers[leaders[0]].stop()
+            del schedulers[leaders[0]]
+            successors = await wait_for_leader()
+            return leaders, counts, successors
+        finally:
+            for scheduler in schedulers.values():
+                await scheduler.stop()
+
+    leaders, counts, successors = asyncio.run(main())
+    assert len(leaders) == 1 and len(successors) == 1 and successors != leaders
+    assert counts[leaders[0]] >= 2
+    assert counts[successors[0]] == 0
+
+
+def test_admin_job_endpoints(dataset, job_runs):
+    from app.auth.deps import is_admin
+    from app.models.models import JobRun
+    now = datetime.now(timezone.utc)
+    job_runs.add_all([
+        JobRun(job_name=JOB_PREFIX + "report", status="succeeded", started_at=now, finished_at=now, duration_ms=40.0),
+        JobRun(job_name=JOB_PREFIX + "report", status="failed", started_at=now, finished_at=now, duration_ms=20.0,
+               error="RuntimeError: nope"),
+    ])
+    job_runs.commit()
+
+    app = dataset["app"]
+    app.dependency_overrides[is_admin] = lambda: None
+    try:
+        jobs = dataset["client"].get("/api/v1/admin/jobs").json()
+        runs = dataset["client"].get("/api/v1/admin/jobs/runs",
+                                     params={"job": JOB_PREFIX + "report", "failed": True}).json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert {"maintain_partitions", "archive_records", "prune_job_runs"} <= {job["name"] for job in jobs["jobs"]}
+    assert all(job["next_run"] for job in jobs["jobs"])
+    report = jobs["other_jobs"][JOB_PREFIX + "report"]
+    assert (report["runs"], report["failures"], report["avg_duration_ms"], report["max_duration_ms"]) == (2, 1, 30.0, 40.0)
+    assert [(run["status"], run["error"]) for run in runs] == [("failed", "RuntimeError: nope")]
@@ -0,0 +1,76 @@
+from datetime import date, datetime, timezone
+from typing import List
+
+import orjson
+import pytest
+
+from app.models.models import MetricTypeEnum, RoleType
+from app.routes.metric_records import EmployeeMetricsPage, EmployeeSearchResponse, EmployeeWithMetrics
+from app.routes.metrics import MetricRecordPage, MetricRecordResponse
+from app.utils.serialization import fast_json_response, type_adapter, validate_response
+
+
+def test_type_adapters_are_cached():
+    assert type_adapter(List[MetricRecordResponse]) is type_adapter(List[MetricRecordResponse])
+
+
+def test_fast_json_response_encodes_row_values():
+    response = fast_json_response([{
+        "metric_type": MetricTypeEnum.WELLNESS,
+        "recorded_at": datetime(2024, 2, 29, 23, 30, tzinfo=timezone.utc).date(),
+        "value_numeric": 1.5,
+        "value_text": None,
+    }])
+    assert response.media_type == "application/json"
+    assert orjson.loads(response.body) == [
+        {"metric_type": "wellness", "recorded_at": "2024-02-29", "value_numeric": 1.5, "value_text": None}
+    ]
+
+
+def test_fast_json_response_validates_against_the_response_type():
+    from pydantic import ValidationError
+    with pytest.raises(ValidationError):
+        fast_json_response([{"id": "not a number"}], List[MetricRecordResponse])
+    with pytest.raises(ValidationError):
+        fast_json_response({"items": [], "next_cursor": 1}, MetricRecordPage)
+    row = {"id": 1, "metric_id": 2, "metric_name": "Steps", "metric_type": MetricTypeEnum.WELLNESS,
+           "value_numeric": 3.5, "value_text": None, "recorded_at": date(2024, 2, 29), "unit": None}
+    response = fast_json_response([row], List[MetricRecordResponse])
+    assert orjson.loads(response.body) == [{**row, "metric_type": "wellness", "recorded_at": "2024-02-29"}]
+
+
+# The fast routes bypass response_model, so check what they send still matches it
+@pytest.mark.parametrize("role, path, params, response_type", [
+    (RoleType.EMPLOYEE, "/api/v1/metrics/employee/my-metrics", {}, MetricRecordPage),
+    (RoleType.EMPLOYEE, "/api/v1/metrics/employee/my-metrics", {"unpaginated": True}, List[MetricRecordResponse]),
+    (RoleType.SUPERVISOR, "/api/v1/metric-records/department/employee-metrics", {"limit": 3}, EmployeeMetricsPage),
+    (RoleType.SUPERVISOR, "/api/v1/metric-records/department/employee-metrics", {"unpaginated": True},
+     List[EmployeeWithMetrics]),
+])
+def test_fast_routes_match_response_model(dataset, as_role, role, path, params, response_type):
+    response = as_role(role).get(path, params=params)
+    assert response.status_code == 200
+    assert response.json()
+    validate_response(response_type, response.json())
+
+
+def test_search_by_id_matches_response_model(dataset):
+    from app.auth.deps import get_current_user, get_current_user_role
+    from app.database import SessionLocal
+    from app.models.models import User
+
+    db = SessionLocal()
+    supervisor = db.get(User, dataset["ids"]["supervisor"])
+    app = dataset["app"]
+    app.dependency_overrides[get_current_user] = lambda: supervisor
+    app.dependency_overrides[get_current_user_role] = lambda: RoleType.SUPERVISOR
+    try:
+        response = dataset["client"].get(f"/api/v1/metric-records/employee/search-by-id/{dataset['employee']}")
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+    assert response.status_code == 200
+    body = validate_response(EmployeeSearchResponse, response.json())
+    assert len(body.performance_metrics) + len(body.wellness_metrics) == len(dataset["records"])
+    assert {m.metric_type for m in body.performance_metrics} == {"performance"}
+    assert min(m.recorded_at for m in body.wellness_metrics) == date(2024, 1, 1)
@@ -0,0 +1,183 @@
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import select
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JSON_FILE = os.path.join(BACKEND, "metric_definitions.json")
+
+
+def test_import_does_no_database_work():
+    # An unreachable database: importing the app must neither connect nor print
+    env = {**os.environ, "DATABASE_URL": "postgresql://nobody@127.0.0.1:1/nowhere"}
+    script = "import time; t = time.perf_counter(); import app.main; print(f'{time.perf_counter() - t:.3f}')"
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.split()
+    assert len(lines) == 1  # only the import time: no sys.path or route listing
+    assert float(lines[0]) < 10
+
+
+@contextmanager
+def statements():
+    from sqlalchemy import event
+    from app.database import engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture()
+def hashed(dataset, monkeypatch):
+    # The startup already ran (dataset entered the app), so the fingerprint is stored
+    import init_db
+    calls = []
+    monkeypatch.setattr(init_db, "get_password_hash", lambda password: calls.append(password) or "x")
+    return calls
+
+
+def test_warm_start_skips_seeding_and_hashing(hashed, record_property):
+    import init_db
+    from app.database import SessionLocal
+    from app.main import prepare_database
+    db = SessionLocal()
+    try:
+        with statements() as seen:
+            started = time.perf_counter()
+            assert init_db.seed_on_startup(db, JSON_FILE, mode="fingerprint") is False
+            seeding = time.perf_counter() - started
+    finally:
+        db.close()
+    assert len(seen) == 2  # to_regclass and the stored fingerprint
+    assert hashed == []
+
+    started = time.perf_counter()
+    prepare_database()
+    startup = time.perf_counter() - started
+    record_property("seed_check_ms", round(seeding * 1000, 1))
+    record_property("prepare_database_ms", round(startup * 1000, 1))
+    assert hashed == []
+    assert startup < 2
+
+
+def test_startup_only_reports_missing_partitions(dataset, monkeypatch, caplog):
+    # Partition DDL is the maintenance job's; each worker's startup only reads the catalog
+    from datetime import date
+    from app import main
+    from app.services import partitions
+    monkeypatch.setattr(main, "missing_partitions",
+                        lambda db: partitions.missing_partitions(db, today=date(2031, 2, 10), ahead=1))
+    with statements() as seen, caplog.at_level("WARNING", logger="app.main"):
+        main.prepare_database()
+    assert not [s for s in seen if s.lstrip().upper().startswith(("CREATE", "ALTER", "LOCK"))]
+    assert not [s for s in seen if "advisory" in s]
+    assert "metric_records has no partition for 2031-02, 2031-03" in caplog.text
+
+
+def test_forced_seeding_hashes_nothing_for_existing_users(hashed):
+    import init_db
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        assert init_db.seed_on_startup(db, JSON_FILE, mode="always") is True
+    finally:
+        db.close()
+    assert hashed == []
+
+
+def test_changed_seed_inputs_seed_again_and_hash_only_new_users(hashed, monkeypatch):
+    import init_db
+    from app.database import SessionLocal
+    from app.models.models import AppMetadata, DepartmentRoleType, RoleType, User
+    original = init_db.seed_fingerprint(JSON_FILE)
+    newcomer = {
+        "username": "startup_newcomer", "email": "startup_newcomer@example.com", "password": "new123",
+        "first_name": "New", "last_name": "Comer", "role": RoleType.EMPLOYEE,
+        "department_role": DepartmentRoleType.USPS_MAIL_CARRIER, "department_id": 1, "role_id": 1,
+        "employee_id": "ST001", "is_active": True,
+    }
+    monkeypatch.setattr(init_db, "EMPLOYEES", init_db.EMPLOYEES + [newcomer])
+    db = SessionLocal()
+    try:
+        assert init_db.seed_fingerprint(JSON_FILE) != original
+        assert init_db.seed_on_startup(db, JSON_FILE) is True
+        assert hashed == ["new123"]
+        assert db.query(User).filter(User.username == "startup_newcomer").count() == 1
+        assert init_db.seed_on_startup(db, JSON_FILE) is False
+    finally:
+        db.rollback()
+        db.query(User).filter(User.username == "startup_newcomer").delete()
+        db.merge(AppMetadata(key=init_db.SEED_FINGERPRINT_KEY, value=original))
+        db.commit()
+        db.close()
+
+
+def test_a_failing_user_does_not_keep_the_others_out(hashed, monkeypatch):
+    import init_db
+    from app.database import SessionLocal
+    from app.models.models import AppMetadata, DepartmentRoleType, RoleType, User
+
+    def newcomer(name, email, employee_id):
+        return {"username": name, "email": email, "password": f"{name}123", "first_name": "New",
+                "last_name": "Comer", "role": RoleType.EMPLOYEE, "department_role": DepartmentRoleType.USPS_MAIL_CARRIER,
+                "department_id": 1, "role_id": 1, "employee_id": employee_id, "is_active": True}
+
+    # The second one takes the email of a seeded supervisor
+    monkeypatch.setattr(init_db, "EMPLOYEES", init_db.EMPLOYEES + [
+        newcomer("startup_first", "startup_first@example.com", "ST101"),
+        newcomer("startup_taken", init_db.SUPERVISORS[0]["email"], "ST102"),
+        newcomer("startup_last", "startup_last@example.com", "ST103"),
+    ])
+    db = SessionLocal()
+    original = init_db.stored_seed_fingerprint(db)
+    try:
+        assert init_db.seed_on_startup(db, JSON_FILE) is False
+        created = set(db.scalars(select(User.username).where(User.username.like("startup_%"))))
+        assert created == {"startup_first", "startup_last"}
+        # Not every user made it, so the next start tries again
+        assert init_db.stored_seed_fingerprint(db) == original
+    finally:
+        db.rollback()
+        db.query(User).filter(User.username.like("startup_%")).delete(synchronize_session=False)
+        db.merge(AppMetadata(key=init_db.SEED_FINGERPRINT_KEY, value=original))
+        db.commit()
+        db.close()
+
+
+def test_failed_seeding_step_leaves_the_fingerprint_unstored(hashed, monkeypatch):
+    import init_db
+    from app.database import SessionLocal
+    from app.models.models import AppMetadata
+
+    def broken_sync(db, *args, **kwargs):
+        raise RuntimeError("catalog unavailable")
+
+    db = SessionLocal()
+    original = init_db.stored_seed_fingerprint(db)
+    try:
+        db.merge(AppMetadata(key=init_db.SEED_FINGERPRINT_KEY, value="stale"))
+        db.commit()
+        with monkeypatch.context() as patch:
+            patch.setattr(init_db, "sync_catalog", broken_sync)
+            assert init_db.seed_on_startup(db, JSON_FILE) is False
+        assert init_db.stored_seed_fingerprint(db) == "stale"
+        # The next start tries again and, succeeding, stores the fingerprint
+        assert init_db.seed_on_startup(db, JSON_FILE) is True
+        assert init_db.stored_seed_fingerprint(db) == init_db.seed_fingerprint(JSON_FILE)
+    finally:
+        db.rollback()
+        db.merge(AppMetadata(key=init_db.SEED_FINGERPRINT_KEY, value=original))
+        db.commit()
+        db.close()
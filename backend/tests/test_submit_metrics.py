@@ -0,0 +1,263 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+from sqlalchemy import event, select
+
+SUBMIT = "/api/v1/metric-records/employee-submit-metrics"
+UPDATE = "/api/v1/metric-records/supervisor-update-metric"
+BATCH_UPDATE = "/api/v1/metric-records/supervisor-bulk-update-metrics"
+
+
+@pytest.fixture()
+def db(dataset):
+    # The routes run on this session and their commits only release a savepoint; the
+    # outer transaction is rolled back, leaving the shared dataset untouched
+    from sqlalchemy.orm import Session
+    from app.database import engine
+    from app.models.base import get_db
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    dataset["app"].dependency_overrides[get_db] = lambda: session
+    yield session
+    dataset["app"].dependency_overrides.pop(get_db, None)
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture()
+def inserts(db):
+    # Statements that write metric_records, as sent to the database
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO METRIC_RECORDS"):
+            statements.append(statement)
+
+    event.listen(db.connection(), "before_cursor_execute", record)
+    yield statements
+    event.remove(db.connection(), "before_cursor_execute", record)
+
+
+def _records(db, dataset, metric_index, day=None, user_id=None):
+    from app.models.models import MetricRecord
+    statement = select(MetricRecord).where(
+        MetricRecord.user_id == (user_id or dataset["ids"]["employee"]),
+        MetricRecord.metric_id == dataset["ids"]["metrics"][metric_index],
+    ).order_by(MetricRecord.recorded_at)
+    if day:
+        statement = statement.where(MetricRecord.recorded_date == day)
+    db.expire_all()
+    return db.execute(statement).scalars().all()
+
+
+def _daily(db, dataset, metric_index, day):
+    from app.models.models import MetricDailyRollup
+    return db.get(MetricDailyRollup, (dataset["ids"]["employee"], dataset["ids"]["metrics"][metric_index], day))
+
+
+def _submit(dataset, auth_headers, day, *metrics):
+    return dataset["client"].post(SUBMIT, headers=auth_headers["employee"], json={
+        "date": day.isoformat(),
+        "metrics": [{"metric_id": dataset["ids"]["metrics"][index], **values} for index, values in metrics],
+    })
+
+
+def test_new_day_is_one_insert_at_midnight_utc(dataset, auth_headers, db, inserts):
+    day = date(2025, 3, 5)
+    response = _submit(dataset, auth_headers, day, (0, {"value_numeric": 4.0}), (1, {"value_text": "fine"}))
+    assert response.status_code == 200
+    assert response.json() == {"message": f"Metrics submitted for {day}"}
+    # Both metrics in a single INSERT ... ON CONFLICT
+    assert len(inserts) == 1 and "ON CONFLICT" in inserts[0]
+
+    [first] = _records(db, dataset, 0, day)
+    [second] = _records(db, dataset, 1, day)
+    midnight = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    assert (first.recorded_at, first.recorded_date, first.value_numeric) == (midnight, day, 4.0)
+    assert (second.recorded_at, second.value_numeric, second.value_text) == (midnight, None, "fine")
+    assert _daily(db, dataset, 0, day).value_sum == 4.0
+
+
+def test_repeated_submissions_update_the_same_record(dataset, auth_headers, db):
+    day = date(2025, 3, 6)
+    assert _submit(dataset, auth_headers, day, (0, {"value_numeric": 1.0})).status_code == 200
+    [created] = _records(db, dataset, 0, day)
+    assert _submit(dataset, auth_headers, day, (0, {"value_numeric": 2.0})).status_code == 200
+    # A null value leaves the stored one alone; the text is added next to it
+    assert _submit(dataset, auth_headers, day, (0, {"value_text": "late"})).status_code == 200
+
+    [record] = _records(db, dataset, 0, day)
+    assert (record.id, record.value_numeric, record.value_text) == (created.id, 2.0, "late")
+    daily = _daily(db, dataset, 0, day)
+    assert (daily.record_count, daily.value_count, daily.value_sum) == (1, 1, 2.0)
+
+
+def test_repeated_metric_ids_are_merged_in_order(dataset, auth_headers, db, inserts):
+    day = date(2025, 3, 7)
+    response = _submit(dataset, auth_headers, day, (0, {"value_numeric": 1.0, "value_text": "first"}),
+                       (0, {"value_numeric": 3.0}), (0, {"value_text": "last"}))
+    assert response.status_code == 200
+    assert len(inserts) == 1
+    [record] = _records(db, dataset, 0, day)
+    assert (record.value_numeric, record.value_text) == (3.0, "last")
+
+
+def test_midnight_utc_records_keep_their_day(dataset, auth_headers, db):
+    # The fixture holds metric 0 at 2023-12-31 23:00 UTC and 2024-01-01 00:00 UTC
+    [evening] = _records(db, dataset, 0, date(2023, 12, 31))
+    [midnight] = _records(db, dataset, 0, date(2024, 1, 1))
+
+    assert _submit(dataset, auth_headers, date(2024, 1, 1), (0, {"value_numeric": 20.0})).status_code == 200
+    [updated] = _records(db, dataset, 0, date(2024, 1, 1))
+    assert (updated.id, updated.recorded_at, updated.value_numeric) == (midnight.id, midnight.recorded_at, 20.0)
+    assert _records(db, dataset, 0, date(2023, 12, 31))[0].value_numeric == 1.0
+
+    # The evening record is the one for its UTC day, and keeps its original time
+    assert _submit(dataset, auth_headers, date(2023, 12, 31), (0, {"value_numeric": 30.0})).status_code == 200
+    [updated] = _records(db, dataset, 0, date(2023, 12, 31))
+    assert (updated.id, updated.recorded_at, updated.value_numeric) == \
+        (evening.id, datetime(2023, 12, 31, 23, tzinfo=timezone.utc), 30.0)
+    assert _records(db, dataset, 0, date(2024, 1, 1))[0].value_numeric == 20.0
+
+    assert _daily(db, dataset, 0, date(2023, 12, 31)).value_sum == 30.0
+    assert _daily(db, dataset, 0, date(2024, 1, 1)).value_sum == 20.0
+    assert len(_records(db, dataset, 0)) == len([r for r in dataset["records"] if r[0].id == evening.metric_id])
+
+
+def test_unknown_metric_writes_nothing(dataset, auth_headers, db, inserts):
+    response = dataset["client"].post(SUBMIT, headers=auth_headers["employee"], json={
+        "date": "2025-03-08",
+        "metrics": [{"metric_id": dataset["ids"]["metrics"][0], "value_numeric": 1.0},
+                    {"metric_id": 999999, "value_numeric": 1.0}],
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Metric ID 999999 not found."
+    assert inserts == []
+    assert _records(db, dataset, 0, date(2025, 3, 8)) == []
+
+
+def test_supervisors_cannot_submit(dataset, auth_headers, db):
+    response = dataset["client"].post(SUBMIT, headers=auth_headers["supervisor"], json={
+        "date": "2025-03-09", "metrics": [{"metric_id": dataset["ids"]["metrics"][0], "value_numeric": 1.0}],
+    })
+    assert response.status_code == 403
+
+
+@pytest.fixture()
+def editable(dataset, monkeypatch):
+    # The dataset's department is a USPS one; let its supervisor edit both metrics
+    from app.routes import metric_records
+    monkeypatch.setitem(metric_records.SUPERVISOR_EDITABLE_METRICS, "USPS", list(dataset["ids"]["metrics"]))
+
+
+def _employee(db, department_id, name):
+    from app.models.models import DepartmentRoleType, RoleType, User
+    user = User(username=f"tw_{name}", email=f"tw_{name}@example.com", hashed_password="x", first_name=name,
+                last_name="Window", employee_id=f"TW{name.upper()}", role=RoleType.EMPLOYEE,
+                department_role=DepartmentRoleType.SUPERVISOR, department_id=department_id)
+    db.add(user)
+    db.flush()
+    return user.id
+
+
+@pytest.fixture()
+def outsider(db):
+    # An employee of another department, rolled back with the rest
+    from app.models.models import Department, DepartmentType
+    department = Department(name="other test department", type=DepartmentType.USPS, description="other")
+    db.add(department)
+    db.flush()
+    return _employee(db, department.id, "outsider")
+
+
+def _batch(dataset, auth_headers, *entries):
+    return dataset["client"].post(BATCH_UPDATE, headers=auth_headers["supervisor"], json={"entries": [
+        {"employee_id": employee_id, "metric_id": dataset["ids"]["metrics"][index], **values}
+        for employee_id, index, values in entries
+    ]})
+
+
+def test_batch_update_writes_every_employee_in_one_insert(dataset, auth_headers, db, inserts, editable):
+    employee, colleague = dataset["ids"]["employee"], _employee(db, dataset["ids"]["department"], "colleague")
+    today = datetime.now(timezone.utc).date()
+    response = _batch(dataset, auth_headers, (employee, 0, {"value_numeric": 7.0}),
+                      (colleague, 0, {"value_numeric": 8.0}), (colleague, 1, {"value_text": "great"}))
+    assert response.status_code == 200
+    assert response.json() == {"message": "Metrics updated successfully by Supervisor.", "updated": 3}
+    assert len(inserts) == 1
+
+    assert [r.value_numeric for r in _records(db, dataset, 0, today, employee)] == [7.0]
+    assert [r.value_numeric for r in _records(db, dataset, 0, today, colleague)] == [8.0]
+    assert [r.value_text for r in _records(db, dataset, 1, today, colleague)] == ["great"]
+    assert _daily(db, dataset, 0, today).value_sum == 7.0
+
+
+def test_batch_update_merges_repeated_entries(dataset, auth_headers, db, inserts, editable):
+    employee = dataset["ids"]["employee"]
+    today = datetime.now(timezone.utc).date()
+    response = _batch(dataset, auth_headers, (employee, 0, {"value_numeric": 1.0}),
+                      (employee, 0, {"value_numeric": 2.0}), (employee, 0, {"value_text": "kept"}))
+    assert response.json()["updated"] == 1
+    assert len(inserts) == 1
+    [record] = _records(db, dataset, 0, today, employee)
+    assert (record.value_numeric, record.value_text) == (2.0, "kept")
+
+
+@pytest.mark.parametrize("bad_employee", ["outsider", "missing"])
+def test_batch_update_rejects_other_departments(dataset, auth_headers, db, inserts, editable, outsider, bad_employee):
+    employee = dataset["ids"]["employee"]
+    bad_id = outsider if bad_employee == "outsider" else 999999
+    response = _batch(dataset, auth_headers, (employee, 0, {"value_numeric": 5.0}), (bad_id, 0, {"value_numeric": 5.0}))
+    assert response.status_code == 403
+    assert response.json()["detail"] == "You are not allowed to update metrics of employees outside your department."
+    # The valid entry is not written either
+    assert inserts == []
+    today = datetime.now(timezone.utc).date()
+    assert _records(db, dataset, 0, today, employee) == []
+    assert _records(db, dataset, 0, today, outsider) == []
+
+
+def test_batch_update_checks_every_metric(dataset, auth_headers, db, inserts, editable, monkeypatch):
+    from app.routes import metric_records
+    employee = dataset["ids"]["employee"]
+    first, second = dataset["ids"]["metrics"]
+    monkeypatch.setitem(metric_records.SUPERVISOR_EDITABLE_METRICS, "USPS", [first])
+    response = _batch(dataset, auth_headers, (employee, 0, {"value_numeric": 1.0}), (employee, 1, {"value_numeric": 1.0}))
+    assert response.status_code == 403
+    assert response.json()["detail"] == f"You are not allowed to edit metric_id {second}"
+
+    # Editable but not a definition of the department
+    monkeypatch.setitem(metric_records.SUPERVISOR_EDITABLE_METRICS, "USPS", [first, 999999])
+    response = dataset["client"].post(BATCH_UPDATE, headers=auth_headers["supervisor"], json={"entries": [
+        {"employee_id": employee, "metric_id": first, "value_numeric": 1.0},
+        {"employee_id": employee, "metric_id": 999999, "value_numeric": 1.0},
+    ]})
+    assert response.status_code == 404
+    assert inserts == []
+
+
+def test_single_employee_update_shares_the_checks(dataset, auth_headers, db, inserts, editable, outsider):
+    employee = dataset["ids"]["employee"]
+    metric = dataset["ids"]["metrics"][0]
+    response = dataset["client"].post(UPDATE, params={"employee_id": employee}, headers=auth_headers["supervisor"],
+                                      json={"metrics": [{"metric_id": metric, "value_numeric": 6.0}]})
+    assert response.status_code == 200
+    assert response.json() == {"message": "Metrics updated successfully by Supervisor."}
+    assert len(inserts) == 1
+    assert [r.value_numeric for r in _records(db, dataset, 0, datetime.now(timezone.utc).date())] == [6.0]
+
+    # Other departments are rejected, even without any metrics
+    for metrics in ([{"metric_id": metric, "value_numeric": 6.0}], []):
+        response = dataset["client"].post(UPDATE, params={"employee_id": outsider}, headers=auth_headers["supervisor"],
+                                          json={"metrics": metrics})
+        assert response.status_code == 403
+    assert len(inserts) == 1
+
+
+def test_employees_cannot_batch_update(dataset, auth_headers, db, editable):
+    response = dataset["client"].post(BATCH_UPDATE, headers=auth_headers["employee"], json={"entries": [
+        {"employee_id": dataset["ids"]["employee"], "metric_id": dataset["ids"]["metrics"][0], "value_numeric": 1.0},
+    ]})
+    assert response.status_code == 403
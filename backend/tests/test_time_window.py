@@ -0,0 +1,194 @@
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+from app.utils.time_window import TimeWindow, parse_time_window
+
+
+# ---------- window arithmetic (no database needed) ----------
+
+@pytest.mark.parametrize("value, start, end", [
+    ("2024-02-29", date(2024, 2, 29), date(2024, 3, 1)),
+    ("2024-W01", date(2024, 1, 1), date(2024, 1, 8)),
+    ("2020-W53", date(2020, 12, 28), date(2021, 1, 4)),
+    ("2024-02", date(2024, 2, 1), date(2024, 3, 1)),
+    ("2024-12", date(2024, 12, 1), date(2025, 1, 1)),
+    ("2024-Q1", date(2024, 1, 1), date(2024, 4, 1)),
+    ("2024-Q4", date(2024, 10, 1), date(2025, 1, 1)),
+    ("2024", date(2024, 1, 1), date(2025, 1, 1)),
+    ("2024-03-30..2024-04-02", date(2024, 3, 30), date(2024, 4, 3)),
+    (" 2024-05 ", date(2024, 5, 1), date(2024, 6, 1)),
+])
+def test_parse_time_window(value, start, end):
+    window = parse_time_window(value)
+    assert (window.start, window.end, window.month_of_year, window.empty) == (start, end, None, False)
+
+
+@pytest.mark.parametrize("value", [
+    "", "24", "2024-13", "2024-02-30", "2021-W53", "2024-Q5", "2024-Q0", "2024/05",
+    "2024-05-02..2024-05-01", "2024-05..2024-06", "yesterday",
+])
+def test_parse_time_window_rejects(value):
+    with pytest.raises(ValueError):
+        parse_time_window(value)
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({}, TimeWindow()),
+    ({"year": 2024}, TimeWindow(date(2024, 1, 1), date(2025, 1, 1))),
+    ({"year": 2024, "month": 2}, TimeWindow(date(2024, 2, 1), date(2024, 3, 1))),
+    ({"month": 2}, TimeWindow(month_of_year=2)),
+    ({"month": 13}, TimeWindow(empty=True)),
+    ({"month": 0}, TimeWindow(empty=True)),
+    ({"start_date": date(2024, 2, 10)}, TimeWindow(date(2024, 2, 10), None)),
+    ({"end_date": date(2024, 2, 10)}, TimeWindow(None, date(2024, 2, 11))),
+    ({"start_date": date(2024, 2, 10), "end_date": date(2024, 3, 5), "year": 2024, "month": 3},
+     TimeWindow(date(2024, 3, 1), date(2024, 3, 6))),
+    ({"start_date": date(2024, 2, 10), "year": 2023}, TimeWindow(empty=True)),
+    ({"start_date": date(2024, 2, 10), "month": 3}, TimeWindow(date(2024, 2, 10), None, 3)),
+])
+def test_window_from_params(params, expected):
+    assert TimeWindow.from_params(**params) == expected
+
+
+@pytest.mark.parametrize("window, aligned", [
+    (parse_time_window("2024-06"), True),
+    (parse_time_window("2024-Q2"), True),
+    (parse_time_window("2024"), True),
+    (TimeWindow(month_of_year=6), True),
+    (TimeWindow.from_params(start_date=date(2024, 6, 1)), True),
+    (parse_time_window("2024-06-01"), False),
+    (parse_time_window("2024-W23"), False),
+    (parse_time_window("2024-06-01..2024-06-30"), True),
+    (parse_time_window("2024-06-01..2024-06-29"), False),
+])
+def test_month_aligned(window, aligned):
+    assert window.month_aligned is aligned
+
+
+# ---------- routes against Postgres (fixtures in conftest.py) ----------
+
+PARAM_CASES = [
+    {},
+    {"year": 2024},
+    {"month": 1},
+    {"year": 2024, "month": 6},
+    {"year": 2024, "month": 13},
+    {"start_date": "2024-03-31"},
+    {"end_date": "2024-01-01"},
+    {"start_date": "2024-02-29", "end_date": "2024-06-09"},
+    {"start_date": "2024-01-01", "end_date": "2024-12-31", "month": 6},
+]
+
+WINDOW_CASES = [
+    "2024-01-01", "2024-06-10", "2024-W23", "2024-W24", "2024-02", "2024-03", "2024-Q1",
+    "2024-Q2", "2024", "2025", "2023-12-31..2024-01-01", "2024-02-29..2024-04-01",
+]
+
+
+def _expected(dataset, window):
+    def inside(day):
+        if window.empty:
+            return False
+        return ((window.start is None or day >= window.start)
+                and (window.end is None or day < window.end)
+                and (window.month_of_year is None or day.month == window.month_of_year))
+    return [record for record in dataset["records"] if inside(record[1])]
+
+
+def _params_window(params):
+    typed = {key: date.fromisoformat(value) if key.endswith("_date") else value for key, value in params.items()}
+    return TimeWindow.from_params(**typed)
+
+
+@pytest.mark.parametrize("params", PARAM_CASES)
+def test_my_metrics_window(dataset, as_role, params):
+    from app.models.models import RoleType
+    response = as_role(RoleType.EMPLOYEE).get("/api/v1/metrics/employee/my-metrics",
+                                               params={**params, "unpaginated": True})
+    assert response.status_code == 200
+    expected = _expected(dataset, _params_window(params))
+    assert sorted((m["metric_id"], m["recorded_at"], m["value_numeric"]) for m in response.json()) == \
+        sorted((metric.id, day.isoformat(), value) for metric, day, value in expected)
+
+
+@pytest.mark.parametrize("params", PARAM_CASES)
+def test_my_aggregated_metrics_window(dataset, as_role, params):
+    from app.models.models import RoleType
+    response = as_role(RoleType.EMPLOYEE).get("/api/v1/metrics/employee/my-aggregated-metrics", params=params)
+    assert response.status_code == 200
+    values = defaultdict(list)
+    for metric, day, value in _expected(dataset, _params_window(params)):
+        values[metric.id].append(value)
+    assert {m["metric_id"]: (m["count"], m["min_value"], m["max_value"], pytest.approx(m["avg_value"]))
+            for m in response.json()} == \
+        {metric_id: (len(v), min(v), max(v), sum(v) / len(v)) for metric_id, v in values.items()}
+
+
+@pytest.mark.parametrize("params", PARAM_CASES)
+def test_department_employee_metrics_window(dataset, as_role, params):
+    from app.models.models import RoleType
+    response = as_role(RoleType.SUPERVISOR).get("/api/v1/metric-records/department/employee-metrics",
+                                                 params={**params, "unpaginated": True})
+    assert response.status_code == 200
+    got = sorted((employee["employee_id"], m["metric_id"], m["recorded_at"])
+                 for employee in response.json() for m in employee["metrics"])
+    assert got == sorted((dataset["employee"], metric.id, day.isoformat())
+                         for metric, day, value in _expected(dataset, _params_window(params)))
+
+
+@pytest.mark.parametrize("date_filter", WINDOW_CASES)
+def test_dashboard_window(dataset, as_role, date_filter):
+    from app.models.models import RoleType
+    response = as_role(RoleType.SUPERVISOR).get("/api/v1/dashboard/view-aggregate-metrics",
+                                                 params={"date_filter": date_filter})
+    assert response.status_code == 200
+    totals = defaultdict(float)
+    for metric, day, value in _expected(dataset, parse_time_window(date_filter)):
+        totals[metric.metric_name] += value
+    assert {m["metric_name"]: pytest.approx(m["total"]) for m in response.json()} == dict(totals)
+
+
+def test_dashboard_rejects_bad_window(dataset, as_role):
+    from app.models.models import RoleType
+    response = as_role(RoleType.SUPERVISOR).get("/api/v1/dashboard/view-aggregate-metrics",
+                                                 params={"date_filter": "2024-W60"})
+    assert response.status_code == 400
+
+
+def _plan(statement):
+    from sqlalchemy import text
+    from app.database import engine
+    with engine.connect() as connection:
+        # Tiny test tables would always be seq-scanned; with seq scans disabled the plan
+        # shows whether the window predicates can be used as index conditions at all.
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+        # Plan against an empty, never-analyzed copy of metric_records (a temp table
+        # shadows it for this transaction): once autovacuum has recorded a handful of
+        # rows every one of its indexes costs the same and the choice becomes arbitrary.
+        connection.execute(text("CREATE TEMP TABLE metric_records (LIKE public.metric_records INCLUDING ALL)"))
+        compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        return "\n".join(connection.execute(text(f"EXPLAIN {compiled}")).scalars())
+
+
+@pytest.mark.parametrize("date_filter", WINDOW_CASES)
+def test_window_predicates_use_index(dataset, date_filter):
+    from sqlalchemy import select
+    from app.models.models import MetricRecord
+    window = parse_time_window(date_filter)
+    for key, column in [("employee", MetricRecord.user_id), ("metrics", MetricRecord.metric_id)]:
+        value = dataset["ids"][key] if key == "employee" else dataset["ids"][key][0]
+        plan = _plan(select(MetricRecord.id).where(column == value, *window.predicates()))
+        assert "Seq Scan" not in plan
+        index_condition = next(line for line in plan.splitlines() if "Index Cond" in line)
+        assert "recorded_date >=" in index_condition and "recorded_date <" in index_condition
+
+
+@pytest.mark.parametrize("date_filter", WINDOW_CASES)
+def test_dashboard_query_uses_rollup_index(dataset, date_filter):
+    from app.routes.dashboards import build_aggregated_metrics_query
+    plan = _plan(build_aggregated_metrics_query(dataset["ids"]["department"], None, date_filter))
+    assert "Seq Scan on metric_daily_rollups" not in plan
+    assert "Seq Scan on metric_monthly_rollups" not in plan
+    assert "ix_metric_daily_rollups_department_day" in plan or "ix_metric_monthly_rollups_department_month" in plan
@@ -151,7 +151,8 @@ class ApiService {
     start_date?: string;
     end_date?: string;
   } = {}) {
-    return this.get('/metric-records/department/employee-metrics', filters);
+    // The endpoint pages its results by default; this view needs every record
+    return this.get('/metric-records/department/employee-metrics', { ...filters, unpaginated: true });
   }
 
   /**
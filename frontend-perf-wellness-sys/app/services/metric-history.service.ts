@@ -57,6 +57,8 @@ class MetricHistoryService {
       if (filters.year) {
         params.append('year', filters.year.toString());
       }
+      // The endpoint pages its results by default; this view needs the full history
+      params.append('unpaginated', 'true');
       
       const response = await axios.get<MetricRecord[]>(
         `${API_URL}/metrics/employee/my-metrics?${params.toString()}`,